@@ -1,6 +1,7 @@
 from logging.config import fileConfig
 import os
-from sqlalchemy import engine_from_config, pool
+from sqlalchemy import create_engine, pool
+from sqlalchemy.engine import make_url
 from alembic import context
 
 # this is the Alembic Config object, which provides
@@ -14,26 +15,40 @@ fileConfig(config.config_file_name)
 import sys
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__) + '/..'))
 
-from database import Base
+from database import Base, is_async_url
+import models  # noqa: F401  (registers tables on Base.metadata)
 try:
     target_metadata = Base.metadata
 except Exception:
     target_metadata = None
 
+def include_object(obj, name, type_, reflected, compare_to):
+    """Keep autogenerate away from objects managed outside the models (search.py)."""
+    if type_ == 'table' and reflected and compare_to is None and name.startswith('tasks_fts'):
+        return False
+    if type_ == 'index' and name == 'ix_tasks_search':
+        return False
+    return True
+
+def get_url():
+    """DATABASE_URL with any async driver swapped for the dialect's sync default."""
+    url = make_url(os.getenv('DATABASE_URL', 'sqlite:///./app.db'))
+    if is_async_url(str(url)):
+        url = url.set(drivername=url.get_backend_name())
+    return url.render_as_string(hide_password=False)
+
 def run_migrations_offline():
-    url = os.getenv('DATABASE_URL', config.get_main_option('sqlalchemy.url'))
-    context.configure(url=url, target_metadata=target_metadata, literal_binds=True)
+    url = get_url()
+    context.configure(url=url, target_metadata=target_metadata, literal_binds=True,
+                      include_object=include_object)
     with context.begin_transaction():
         context.run_migrations()
 
 def run_migrations_online():
-    connectable = engine_from_config(
-        config.get_section(config.config_ini_section),
-        prefix='',
-        poolclass=pool.NullPool,
-    )
+    connectable = create_engine(get_url(), poolclass=pool.NullPool)
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        context.configure(connection=connection, target_metadata=target_metadata,
+                          include_object=include_object)
         with context.begin_transaction():
             context.run_migrations()
 
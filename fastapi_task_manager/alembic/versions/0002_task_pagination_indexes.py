@@ -0,0 +1,26 @@
+"""composite indexes for keyset pagination of tasks
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_tasks_owner_done_created_id', 'tasks', ['owner_id', 'is_done', 'created_at', 'id'])
+    op.create_index('ix_tasks_created_id', 'tasks', ['created_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_tasks_created_id', table_name='tasks')
+    op.drop_index('ix_tasks_owner_done_created_id', table_name='tasks')
@@ -0,0 +1,42 @@
+"""per-user task counters and the overdue count index
+
+Counters are backfilled from the tasks table; crud keeps them current from
+here on and jobs.py reconciles them periodically.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_tasks_owner_done_due', 'tasks', ['owner_id', 'is_done', 'due_date'])
+    op.create_table(
+        'user_task_stats',
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.Column('open_count', sa.Integer(), nullable=False),
+        sa.Column('done_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('owner_id'),
+    )
+    op.execute(
+        "INSERT INTO user_task_stats (owner_id, open_count, done_count) "
+        "SELECT owner_id, "
+        "SUM(CASE WHEN is_done THEN 0 ELSE 1 END), SUM(CASE WHEN is_done THEN 1 ELSE 0 END) "
+        "FROM tasks WHERE owner_id IS NOT NULL GROUP BY owner_id"
+    )
+
+
+def downgrade():
+    op.drop_table('user_task_stats')
+    op.drop_index('ix_tasks_owner_done_due', table_name='tasks')
@@ -0,0 +1,28 @@
+"""tasks.reminded_due: the due date a reminder was last queued for
+
+Existing overdue tasks are marked as reminded, so the upgrade does not
+send a burst of reminders for tasks the old due-date scan already covered.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tasks', sa.Column('reminded_due', sa.DateTime(), nullable=True))
+    op.execute("UPDATE tasks SET reminded_due = due_date WHERE due_date <= CURRENT_TIMESTAMP")
+
+
+def downgrade():
+    op.drop_column('tasks', 'reminded_due')
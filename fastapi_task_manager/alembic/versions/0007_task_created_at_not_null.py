@@ -0,0 +1,37 @@
+"""tasks.created_at NOT NULL: keyset cursors encode it for every page
+
+Legacy rows without one get the oldest created_at in the table, so they
+keep their place at the start of the (created_at, id) order, where SQLite
+already sorted NULLs.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import search
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("UPDATE tasks SET created_at = COALESCE((SELECT MIN(created_at) FROM tasks), CURRENT_TIMESTAMP) "
+               "WHERE created_at IS NULL")
+    with op.batch_alter_table('tasks') as batch:
+        batch.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+    # SQLite's batch mode rebuilds the table without its triggers; put the FTS ones back
+    search.install(op.get_bind())
+
+
+def downgrade():
+    with op.batch_alter_table('tasks') as batch:
+        batch.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
+    search.install(op.get_bind())
@@ -0,0 +1,113 @@
+"""Login throughput for one API worker at a given bcrypt cost.
+
+Each configuration runs in a subprocess (hashing settings are read at
+import) and fires concurrent POST /token requests at the in-process ASGI
+app for --duration seconds, with /health probes mixed in to show whether
+the event loop stays responsive. Reports logins/sec, 429s and latency.
+
+    python benchmarks/bench_login.py --rounds 12 --pool-workers 0 1 2 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT, summarize
+
+
+def seed(n_users, rounds):
+    from sqlalchemy import insert
+    from passlib.hash import bcrypt
+    from database import Base, engine
+    import models
+
+    Base.metadata.create_all(bind=engine)
+    hashed = bcrypt.using(rounds=rounds).hash("benchpass")
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"name": f"user {i}", "email": f"user{i}@bench.example", "hashed_password": hashed}
+            for i in range(n_users)
+        ])
+
+
+async def drive(app, duration, concurrency, n_users):
+    import httpx
+
+    results = {"login": [], "health": [], "status": {}}
+    deadline = time.perf_counter() + duration
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def login_worker(w):
+            i = w
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                res = await client.post("/token", data={"username": f"user{i % n_users}@bench.example",
+                                                         "password": "benchpass"})
+                results["login"].append(time.perf_counter() - start)
+                results["status"][res.status_code] = results["status"].get(res.status_code, 0) + 1
+                if res.status_code == 429:
+                    await asyncio.sleep(0.05)
+                i += concurrency
+
+        async def health_probe():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                await client.get("/health")
+                results["health"].append(time.perf_counter() - start)
+                await asyncio.sleep(0.05)
+
+        await asyncio.gather(health_probe(), *(login_worker(w) for w in range(concurrency)))
+    return results
+
+
+def run_child(args):
+    seed(args.users, args.rounds)
+    import main
+
+    results = asyncio.run(drive(main.app, args.duration, args.concurrency, args.users))
+    main.hashing.pool.shutdown()
+    print(json.dumps({
+        "logins_per_sec": round(results["status"].get(200, 0) / args.duration, 2),
+        "status_counts": results["status"],
+        "login": summarize(results["login"]),
+        "health": summarize(results["health"]),
+    }))
+
+
+def run_parent(args):
+    report = {}
+    for workers in args.pool_workers:
+        env = dict(os.environ,
+                   DATABASE_URL="sqlite:///" + os.path.join(tempfile.mkdtemp(), "login.db"),
+                   SECRET_KEY="bench", BCRYPT_ROUNDS=str(args.rounds),
+                   HASH_POOL_WORKERS=str(workers), HASH_QUEUE_SIZE=str(args.queue_size))
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", "--rounds", str(args.rounds),
+             "--duration", str(args.duration), "--concurrency", str(args.concurrency),
+             "--users", str(args.users)],
+            cwd=ROOT, env=env, check=True, capture_output=True, text=True,
+        )
+        report[f"pool_workers={workers}"] = json.loads(out.stdout.strip().splitlines()[-1])
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost")
+    parser.add_argument("--pool-workers", type=int, nargs="+", default=[0, 1, 2, 4],
+                        help="HASH_POOL_WORKERS values to compare (0 = hash inline)")
+    parser.add_argument("--queue-size", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    os.chdir(ROOT)
+    if args.child:
+        run_child(args)
+    else:
+        run_parent(args)
@@ -0,0 +1,185 @@
+"""Latency under overload, with and without rate limiting / admission control.
+
+Seeds --tasks tasks, then for each mode starts a uvicorn server and for
+--duration seconds runs
+
+    abusers  --abusers connections logged in as one user, sending an
+             expensive request back to back (--abuse): export is
+             GET /tasks/export?format=csv, deep_page is
+             GET /tasks?skip=<random>&limit=50 (OFFSET scans, different
+             every time so the response cache cannot help)
+    clients  --clients users each sending GET /tasks?limit=20 every
+             --interval seconds
+
+Modes (environment of the server):
+
+    off        RATE_LIMIT_ENABLED=0: everything is queued up behind the pool
+    admission  only the concurrency limit (--slots, huge token buckets)
+    limited    token buckets (--rate/--burst per user) plus the concurrency limit
+
+The report has status counts and p50/p95/p99 per group; in the limited
+modes the well-behaved clients' latency should stay bounded while the
+abusers get 429/503.
+
+    python benchmarks/bench_overload.py --duration 10 --abusers 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT, summarize
+
+PASSWORD = "overload"
+
+
+def free_port():
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def login(client, email):
+    # logins share the benchmark's IP bucket, so wait out any 429
+    while True:
+        res = await client.post("/token", data={"username": email, "password": PASSWORD})
+        if res.status_code != 429:
+            break
+        await asyncio.sleep(float(res.headers.get("Retry-After", "1")))
+    res.raise_for_status()
+    return {"Authorization": "Bearer " + res.json()["access_token"]}
+
+
+async def drive(base_url, args):
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.abusers + args.clients + 4)
+    groups = {"abusers": ([], {}), "clients": ([], {})}
+    rng = random.Random(1)
+    deadline = time.perf_counter() + args.duration
+
+    async def loop(client, group, headers, request, pause):
+        latencies, statuses = groups[group]
+        i = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                res = await request(client, headers, i)
+                status = res.status_code
+            except httpx.TimeoutException:
+                status = "timeout"
+            except httpx.TransportError:
+                status = "error"
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+            i += 1
+            if pause:
+                await asyncio.sleep(pause)
+
+    async def deep_page(client, headers, i):
+        return await client.get("/tasks", params={"skip": rng.randrange(args.tasks), "limit": 50}, headers=headers)
+
+    async def export(client, headers, i):
+        return await client.get("/tasks/export", params={"format": "csv"}, headers=headers)
+
+    abuse = export if args.abuse == "export" else deep_page
+
+    async def page(client, headers, i):
+        return await client.get("/tasks", params={"limit": 20}, headers=headers)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        abuser = await login(client, "seed0@example.com")
+        clients = [await login(client, f"seed{i + 1}@example.com") for i in range(args.clients)]
+        await asyncio.gather(
+            *(loop(client, "abusers", abuser, abuse, 0) for _ in range(args.abusers)),
+            *(loop(client, "clients", headers, page, args.interval) for headers in clients),
+        )
+    return {
+        group: {"statuses": {str(k): v for k, v in sorted(statuses.items(), key=str)}, "latency": summarize(lat)}
+        for group, (lat, statuses) in groups.items()
+    }
+
+
+async def run_mode(env, args):
+    import httpx
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=base_url) as probe:
+            for _ in range(300):
+                try:
+                    if (await probe.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None:
+                    raise RuntimeError("uvicorn exited during startup")
+                await asyncio.sleep(0.1)
+        return await drive(base_url, args)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:  # still draining overloaded streams
+            server.kill()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=["off", "admission", "limited"],
+                        default=["off", "admission", "limited"])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--abusers", type=int, default=32, help="concurrent request loops from one user")
+    parser.add_argument("--abuse", choices=["export", "deep_page"], default="export")
+    parser.add_argument("--clients", type=int, default=8, help="well-behaved users")
+    parser.add_argument("--interval", type=float, default=0.1, help="pause between a client's requests")
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--slots", type=int, default=8, help="ADMISSION_MAX_CONCURRENCY")
+    parser.add_argument("--queue", type=int, default=16, help="ADMISSION_QUEUE_SIZE")
+    parser.add_argument("--queue-timeout-ms", type=float, default=250)
+    parser.add_argument("--rate", type=float, default=20, help="RATE_LIMIT_PER_SECOND")
+    parser.add_argument("--burst", type=float, default=40, help="RATE_LIMIT_BURST")
+    parser.add_argument("--timeout", type=float, default=30, help="client timeout per request")
+    args = parser.parse_args()
+    os.chdir(ROOT)
+
+    url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "overload.db")
+    base_env = dict(os.environ, DATABASE_URL=url, SECRET_KEY="bench", BCRYPT_ROUNDS="4", JOBS_ENABLED="0",
+                    ADMISSION_MAX_CONCURRENCY=str(args.slots), ADMISSION_QUEUE_SIZE=str(args.queue),
+                    ADMISSION_QUEUE_TIMEOUT_MS=str(args.queue_timeout_ms))
+    seed = subprocess.run(
+        [sys.executable, "init_db.py", "--users", str(args.clients + 1), "--tasks", str(args.tasks),
+         "--password", PASSWORD],
+        cwd=ROOT, env=base_env, capture_output=True, text=True,
+    )
+    if seed.returncode != 0:
+        raise SystemExit(seed.stderr)
+
+    modes = {
+        "off": {"RATE_LIMIT_ENABLED": "0"},
+        "admission": {"RATE_LIMIT_ENABLED": "1", "RATE_LIMIT_PER_SECOND": "1e9", "RATE_LIMIT_BURST": "1e9"},
+        "limited": {"RATE_LIMIT_ENABLED": "1", "RATE_LIMIT_PER_SECOND": str(args.rate),
+                    "RATE_LIMIT_BURST": str(args.burst)},
+    }
+    report = {}
+    for mode in args.modes:
+        env = dict(base_env, **modes[mode])
+        report[mode] = asyncio.run(run_mode(env, args))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
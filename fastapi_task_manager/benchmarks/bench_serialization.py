@@ -0,0 +1,96 @@
+"""Rows/sec for a GET /tasks page: ORM + TaskOut validation vs row tuples.
+
+Seeds --rows tasks, then times fetching and encoding a --limit page with
+
+    orm_pydantic  get_tasks -> TaskOut per object -> jsonable_encoder -> json
+                  (what response_model=List[TaskOut] does)
+    rows_json     get_task_rows -> serialization.render_rows on stdlib json
+    rows_orjson   get_task_rows -> serialization.render_rows on orjson (if installed)
+
+Query and encode time are reported separately.
+
+    python benchmarks/bench_serialization.py --rows 20000 --limit 1000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from common import summarize
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+from database import Base
+import crud, models, schemas, serialization
+
+
+def seed(engine, rows):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT COUNT(*) FROM tasks")).scalar() >= rows:
+            return
+        conn.execute(insert(models.Task), [
+            {"title": f"task {i}", "description": "serialization benchmark row", "is_done": i % 2 == 0, "owner_id": 1}
+            for i in range(rows)
+        ])
+
+
+def orm_pydantic(db, limit):
+    start = time.perf_counter()
+    tasks = crud.get_tasks(db, limit=limit)
+    fetched = time.perf_counter()
+    data = jsonable_encoder([schemas.TaskOut(**{f: getattr(t, f) for f in serialization.TASK_FIELDS})
+                             for t in tasks])
+    json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    return fetched - start, time.perf_counter() - fetched
+
+
+def rows_encoded(db, limit):
+    start = time.perf_counter()
+    rows = crud.get_task_rows(db, limit=limit)
+    fetched = time.perf_counter()
+    serialization.render_rows(rows)
+    return fetched - start, time.perf_counter() - fetched
+
+
+def measure(fn, Session, limit, repeat):
+    query, encode = [], []
+    for _ in range(repeat):
+        with Session() as db:
+            q, e = fn(db, limit)
+        query.append(q)
+        encode.append(e)
+    total = [q + e for q, e in zip(query, encode)]
+    return {
+        "rows_per_sec": round(limit * len(total) / sum(total)),
+        "query": summarize(query),
+        "encode": summarize(encode),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=1000, help="page size")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--url", help="database URL (default: a temporary SQLite file)")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "serialize.db"))
+    seed(engine, args.rows)
+    Session = sessionmaker(bind=engine)
+
+    orjson = serialization.orjson
+    report = {"orm_pydantic": measure(orm_pydantic, Session, args.limit, args.repeat)}
+    serialization.orjson = None
+    report["rows_json"] = measure(rows_encoded, Session, args.limit, args.repeat)
+    serialization.orjson = orjson
+    if orjson is not None:
+        report["rows_orjson"] = measure(rows_encoded, Session, args.limit, args.repeat)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""SQLite write throughput under contention: plain vs tuned vs write queue.
+
+--processes worker processes (gunicorn-style) each run --threads threads
+that create --writes tasks apiece through crud.create_task, all against
+one SQLite file. Modes:
+
+    plain   default journal, no pragmas, one session per thread
+    pragmas WAL + synchronous=NORMAL + busy_timeout, one session per thread
+    queue   pragmas + writer.write_queue (one writer thread per process, group commit)
+
+Reports writes/sec across all processes, "database is locked" failures
+and commit-latency percentiles.
+
+    python benchmarks/bench_sqlite_writes.py --processes 3 --threads 16 --writes 200
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import ROOT, summarize
+
+MODES = {
+    "plain": {"SQLITE_PRAGMAS": "0", "SQLITE_WRITE_QUEUE": "0"},
+    "pragmas": {"SQLITE_PRAGMAS": "1", "SQLITE_WRITE_QUEUE": "0"},
+    "queue": {"SQLITE_PRAGMAS": "1", "SQLITE_WRITE_QUEUE": "1"},
+}
+
+
+def run_child(args):
+    from sqlalchemy.exc import OperationalError
+    from database import Base, SessionLocal, engine
+    import crud, schemas, writer
+
+    Base.metadata.create_all(bind=engine)
+    latencies, failures = [], []
+    lock = threading.Lock()
+
+    def one(db):
+        task = schemas.TaskCreate(title="contended write", description="bench")
+        if writer.write_queue is not None:
+            return writer.write_queue.submit(crud.create_task, None, task).result()
+        return crud.create_task(db, None, task)
+
+    def worker():
+        db = SessionLocal()
+        for _ in range(args.writes):
+            start = time.perf_counter()
+            try:
+                one(db)
+            except OperationalError as exc:
+                db.rollback()
+                with lock:
+                    failures.append(str(exc.orig))
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+        db.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    # line up with the other processes so they actually contend
+    time.sleep(max(0.0, args.start_at - time.time()))
+    started = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    finished = time.time()
+    if writer.write_queue is not None:
+        writer.write_queue.stop()
+    print(json.dumps({
+        "started": started, "finished": finished, "latencies": latencies,
+        "locked": sum("locked" in f for f in failures), "failed": len(failures),
+        "writer": writer.write_queue.stats() if writer.write_queue is not None else None,
+    }))
+
+
+def run_parent(args):
+    report = {}
+    for mode in args.modes:
+        path = os.path.join(tempfile.mkdtemp(), "writes.db")
+        env = dict(os.environ, DATABASE_URL="sqlite:///" + path, **MODES[mode])
+        subprocess.run([sys.executable, "-c", "import database, models; database.Base.metadata.create_all(bind=database.engine)"],
+                       cwd=ROOT, env=env, check=True)
+        start_at = time.time() + 3
+        children = [
+            subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--child", "--threads", str(args.threads),
+                 "--writes", str(args.writes), "--start-at", str(start_at)],
+                cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True,
+            )
+            for _ in range(args.processes)
+        ]
+        results = []
+        for child in children:
+            out, _ = child.communicate()
+            results.append(json.loads(out.strip().splitlines()[-1]))
+        wall = max(r["finished"] for r in results) - min(r["started"] for r in results)
+        latencies = [value for r in results for value in r["latencies"]]
+        report[mode] = {
+            "writes_per_sec": round(len(latencies) / wall, 1),
+            "committed": len(latencies),
+            "locked": sum(r["locked"] for r in results),
+            "failed": sum(r["failed"] for r in results),
+            "commit": summarize(latencies),
+            "writer": [r["writer"] for r in results] if mode == "queue" else None,
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--processes", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--writes", type=int, default=200, help="writes per thread")
+    parser.add_argument("--start-at", type=float, default=0.0, help=argparse.SUPPRESS)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    os.chdir(ROOT)
+    if args.child:
+        run_child(args)
+    else:
+        run_parent(args)
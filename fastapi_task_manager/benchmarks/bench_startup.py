@@ -0,0 +1,184 @@
+"""Cold start: import time of main and latency of the first requests.
+
+Each run is a fresh interpreter (nothing cached in sys.modules):
+
+    probe   imports main, then inside `with TestClient(app)` (startup hooks
+            run) times the first GET /health and the first authenticated
+            GET /tasks, which pays for everything deferred to it (jose,
+            the identity lookup, the first pooled connection); a second
+            GET /tasks for comparison. The schema is created after the
+            import, standing in for `alembic upgrade head`. The "warm"
+            probe calls main.warm_up() first, as a preloading gunicorn
+            master does before forking.
+    server  starts uvicorn (or gunicorn -c gunicorn.conf.py when installed)
+            and times launch -> first 200 from /health.
+
+Modes compare AUTO_CREATE_SCHEMA=1 (schema created on import) with 0, and
+gunicorn with and without preload_app. BUDGET is what
+tests/test_startup.py enforces for the probe; --check makes this script
+exit 1 when a median is over it.
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT
+
+# seconds, for the probe with AUTO_CREATE_SCHEMA=0; STARTUP_BUDGET_SCALE stretches it on slow machines
+BUDGET = {"import_s": 2.0, "first_health_s": 0.25, "first_tasks_s": 0.5}
+
+PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+import main
+import_s = time.perf_counter() - start
+loaded = sorted(name for name in ("jose", "passlib") if name in sys.modules)
+if sys.argv[1] == "import":
+    print(json.dumps({"import_s": import_s, "loaded_at_import": loaded}))
+    raise SystemExit
+import database, models, search
+from fastapi.testclient import TestClient
+if sys.argv[1] == "warm":
+    main.warm_up()
+database.Base.metadata.create_all(bind=database.engine)
+with database.engine.begin() as conn:
+    search.install(conn)
+with database.SessionLocal() as db:
+    db.add(models.User(name="Probe", email="probe@example.com", hashed_password="x"))
+    db.commit()
+headers = {"Authorization": "Bearer " + sys.argv[2]}
+out = {"import_s": import_s, "loaded_at_import": loaded}
+with TestClient(main.app) as client:
+    for key, path, kwargs in [("first_health_s", "/health", {}), ("first_tasks_s", "/tasks", {"headers": headers}),
+                              ("second_tasks_s", "/tasks", {"headers": headers})]:
+        start = time.perf_counter()
+        res = client.get(path, **kwargs)
+        out[key] = time.perf_counter() - start
+        assert res.status_code == 200, (path, res.status_code, res.text)
+print(json.dumps(out))
+"""
+
+
+def budget():
+    scale = float(os.getenv("STARTUP_BUDGET_SCALE", "1"))
+    return {key: limit * scale for key, limit in BUDGET.items()}
+
+
+def hs256_token(sub: str, secret: str) -> str:
+    """A JWT main accepts, made without importing jose into the probe."""
+    def b64(raw: bytes) -> bytes:
+        return base64.urlsafe_b64encode(raw).rstrip(b"=")
+
+    header = b64(json.dumps({"alg": "HS256", "typ": "JWT"}).encode())
+    payload = b64(json.dumps({"sub": sub, "exp": int(time.time()) + 3600}).encode())
+    signature = b64(hmac.new(secret.encode(), header + b"." + payload, hashlib.sha256).digest())
+    return (header + b"." + payload + b"." + signature).decode()
+
+
+def probe_env(**overrides) -> dict:
+    env = dict(os.environ, SECRET_KEY="bench", JOBS_ENABLED="0", RATE_LIMIT_ENABLED="0", AUTO_CREATE_SCHEMA="0",
+               DATABASE_URL="sqlite:///" + os.path.join(tempfile.mkdtemp(), "startup.db"))
+    env.update(overrides)
+    return env
+
+
+def probe(env: dict, what: str = "cold") -> dict:
+    """Run PROBE in a fresh interpreter; `what` is "import", "cold" or "warm"."""
+    res = subprocess.run([sys.executable, "-W", "ignore", "-c", PROBE, what, hs256_token("probe@example.com",
+                                                                                          env["SECRET_KEY"])],
+                         cwd=ROOT, env=env, capture_output=True, text=True)
+    if res.returncode != 0:
+        raise RuntimeError(res.stderr)
+    return json.loads(res.stdout.strip().splitlines()[-1])
+
+
+def time_to_first_response(cmd, env, timeout: float = 60) -> float:
+    import httpx
+
+    client = httpx.Client(base_url=env["BIND_URL"], timeout=1)  # built up front: it loads certifi
+    start = time.perf_counter()
+    server = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                if client.get("/health").status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.TransportError:
+                pass
+            if server.poll() is not None:
+                raise RuntimeError(f"{cmd[0]} exited during startup")
+            time.sleep(0.01)
+        raise RuntimeError("server did not come up")
+    finally:
+        client.close()
+        server.terminate()
+        server.wait()
+
+
+def free_port():
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def median_of(runs):
+    return {key: round(statistics.median(run[key] for run in runs) * 1000, 1) for key in runs[0]
+            if key.endswith("_s")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=3, help="gunicorn workers")
+    parser.add_argument("--check", action="store_true", help="exit 1 if the probe medians exceed BUDGET")
+    args = parser.parse_args()
+
+    report = {"budget_ms": {key: round(limit * 1000, 1) for key, limit in budget().items()}}
+    for schema, what in [("1", "cold"), ("0", "cold"), ("0", "warm")]:
+        runs = [probe(probe_env(AUTO_CREATE_SCHEMA=schema), what) for _ in range(args.runs)]
+        report[f"{what} probe_ms (AUTO_CREATE_SCHEMA={schema})"] = median_of(runs)
+
+    servers = {"uvicorn": [sys.executable, "-m", "uvicorn", "main:app", "--log-level", "warning"]}
+    if shutil.which("gunicorn"):
+        servers["gunicorn"] = ["gunicorn", "-c", "gunicorn.conf.py", "main:app"]
+    for name, cmd in servers.items():
+        for preload in (("0", "1") if name == "gunicorn" else ("1",)):
+            for schema in ("1", "0"):
+                samples = []
+                for _ in range(args.runs):
+                    port = free_port()
+                    env = probe_env(AUTO_CREATE_SCHEMA=schema, BIND_URL=f"http://127.0.0.1:{port}")
+                    if name == "gunicorn":  # uvicorn would take WEB_CONCURRENCY as its own --workers
+                        env.update(PRELOAD_APP=preload, WEB_CONCURRENCY=str(args.workers), BIND=f"127.0.0.1:{port}")
+                    if schema == "0":  # the deployment runs migrations first
+                        subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, env=env,
+                                       check=True, capture_output=True)
+                    full = cmd + (["--port", str(port)] if name == "uvicorn" else [])
+                    samples.append(time_to_first_response(full, env))
+                label = f"{name} first_response_ms (AUTO_CREATE_SCHEMA={schema}"
+                label += f", PRELOAD_APP={preload})" if name == "gunicorn" else ")"
+                report[label] = round(statistics.median(samples) * 1000, 1)
+    print(json.dumps(report, indent=2))
+
+    if args.check:
+        medians = report["cold probe_ms (AUTO_CREATE_SCHEMA=0)"]
+        over = {key: ms for key, ms in medians.items() if key in BUDGET and ms > report["budget_ms"][key]}
+        if over:
+            raise SystemExit(f"over budget: {over}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Helpers shared by the benchmark scripts."""
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[k]
+
+
+def summarize(latencies):
+    """p50/p95/p99/mean in milliseconds for a list of durations in seconds."""
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3) if latencies else 0.0,
+    }
+
+
+def timed(fn, repeat=20):
+    """Call fn() `repeat` times and return the list of durations."""
+    out = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - start)
+    return out
+
+
+def sync_url(url):
+    """Swap an async driver in `url` for the dialect's default sync driver."""
+    from sqlalchemy.engine import make_url
+
+    u = make_url(url)
+    return u.set(drivername=u.get_backend_name()).render_as_string(hide_password=False)
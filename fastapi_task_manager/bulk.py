@@ -0,0 +1,121 @@
+"""Request parsing and result reporting for the /tasks/bulk endpoints.
+
+Bodies are either a JSON array or NDJSON (Content-Type application/x-ndjson,
+one item per line). NDJSON is parsed line by line as it streams in, so a
+malformed line only fails that item. Each item gets a BulkItemResult with
+its position in the request; the database work itself happens in one
+transaction in crud.*_tasks_bulk.
+"""
+import json
+import os
+from typing import Any, List, Tuple
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+import schemas
+
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "50000"))
+# rows per executemany / IN (...) list
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonlines")
+
+
+class Unparseable:
+    """Placeholder for an NDJSON line that is not valid JSON."""
+
+    def __init__(self, error: str):
+        self.error = error
+
+
+def chunks(seq, size: int = BULK_CHUNK_SIZE):
+    for start in range(0, len(seq), size):
+        yield seq[start:start + size]
+
+
+def _too_many():
+    return HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} items per request")
+
+
+async def _read_ndjson(request: Request) -> List[Any]:
+    items, buffer = [], b""
+
+    def add(line: bytes):
+        if not line.strip():
+            return
+        if len(items) >= BULK_MAX_ITEMS:
+            raise _too_many()
+        try:
+            items.append(json.loads(line))
+        except ValueError as exc:
+            items.append(Unparseable(f"invalid JSON: {exc}"))
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            add(line)
+    add(buffer)
+    return items
+
+
+async def read_items(request: Request) -> List[Any]:
+    """Raw items from a JSON array or NDJSON body."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in NDJSON_TYPES:
+        return await _read_ndjson(request)
+    try:
+        items = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if len(items) > BULK_MAX_ITEMS:
+        raise _too_many()
+    return items
+
+
+def validate(items: List[Any], model) -> Tuple[List[Tuple[int, Any]], List[schemas.BulkItemResult]]:
+    """Split raw items into (index, model instance) pairs and 'invalid' results."""
+    valid, invalid = [], []
+    for index, raw in enumerate(items):
+        if isinstance(raw, Unparseable):
+            invalid.append(schemas.BulkItemResult(index=index, status="invalid", error=raw.error))
+            continue
+        try:
+            if not isinstance(raw, dict):
+                raise TypeError("item must be a JSON object")
+            valid.append((index, model(**raw)))
+        except (ValidationError, TypeError) as exc:
+            invalid.append(schemas.BulkItemResult(index=index, status="invalid", error=str(exc)))
+    return valid, invalid
+
+
+def task_ids(items: List[Any]) -> Tuple[List[Tuple[int, int]], List[schemas.BulkItemResult]]:
+    """DELETE bodies: each item is an id or an object with an "id" key."""
+    valid, invalid = [], []
+    for index, raw in enumerate(items):
+        task_id = raw.get("id") if isinstance(raw, dict) else raw
+        if isinstance(task_id, int) and not isinstance(task_id, bool):
+            valid.append((index, task_id))
+        else:
+            invalid.append(schemas.BulkItemResult(index=index, status="invalid", error="expected a task id"))
+    return valid, invalid
+
+
+def report(results: List[schemas.BulkItemResult]) -> schemas.BulkResult:
+    results = sorted(results, key=lambda r: r.index)
+    failed = sum(1 for r in results if r.status in ("invalid", "not_found"))
+    return schemas.BulkResult(succeeded=len(results) - failed, failed=failed, results=results)
+
+
+def openapi_body(item_schema: dict) -> dict:
+    """Request body docs for endpoints that read the body themselves."""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"type": "array", "items": item_schema}},
+                "application/x-ndjson": {"schema": {"type": "string", "description": "one JSON item per line"}},
+            },
+        }
+    }
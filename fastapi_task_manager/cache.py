@@ -0,0 +1,92 @@
+"""Key/value backends shared by the in-app caches.
+
+MemoryBackend is a per-process LRU with per-entry expiry. RedisBackend
+wraps any client with Redis' get/set(ex=)/delete/incr (redis-py, fakeredis
+or a test fake) so entries are shared between gunicorn workers.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class MemoryBackend:
+    """Bounded LRU with per-entry expiry."""
+    local = True
+
+    def __init__(self, maxsize: int = 10000, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires <= self.clock():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: float):
+        with self._lock:
+            self._data[key] = (value, self.clock() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    # counters live outside the LRU so they are never evicted
+    def counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisBackend:
+    """Any client with Redis' get/set(ex=)/delete/incr (redis-py, fakeredis, ...)."""
+    local = False
+
+    def __init__(self, client, prefix: str = ""):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = ""):
+        import redis
+
+        return cls(redis.Redis.from_url(url, socket_timeout=0.25, decode_responses=True), prefix)
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    def set(self, key: str, value: str, ttl: float):
+        self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def delete(self, *keys: str):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def counter(self, key: str) -> int:
+        return int(self.get(key) or 0)
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(self.prefix + key))
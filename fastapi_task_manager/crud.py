@@ -1,14 +1,32 @@
+import datetime
+from sqlalchemy import delete, func, insert, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-from typing import List, Optional
-import models, schemas
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import models, schemas, search, hashing
+from serialization import TASK_COLUMNS
+from pagination import decode_cursor
+from bulk import chunks
+from response_cache import response_cache
+from feed import feed
+
+def after_commit(db: Session, fn, *args):
+    """Run fn(*args) once db's changes are committed.
+
+    Sessions of the SQLite write queue (writer.py) commit a whole group of
+    writes at once and collect these until then; other sessions run fn now.
+    """
+    hooks = db.info.get("after_commit")
+    if hooks is None:
+        fn(*args)
+    else:
+        hooks.append((fn, args))
 
-# Password hashing setup
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def get_password_hash(password: str):
     """Return a securely hashed version of the password."""
-    return pwd_context.hash(password)
+    return hashing.hash_password(password)
 
 
 # ========================
@@ -34,6 +52,17 @@ def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
     return db.query(models.User).filter(models.User.email == email).first()
 
 
+def authenticate_user(db: Session, email: str, password: str) -> Optional[models.User]:
+    """Return the user if the password matches, upgrading a stale bcrypt cost."""
+    user = get_user_by_email(db, email)
+    if not user or not hashing.verify_password(password, user.hashed_password):
+        return None
+    if hashing.needs_rehash(user.hashed_password):
+        user.hashed_password = hashing.hash_password(password)
+        db.commit()
+    return user
+
+
 def get_user(db: Session, user_id: int) -> Optional[models.User]:
     """Fetch a user by ID."""
     return db.query(models.User).filter(models.User.id == user_id).first()
@@ -52,14 +81,60 @@ def create_task(db: Session, owner_id: int, task: schemas.TaskCreate):
     """Create a new task for a given owner."""
     db_task = models.Task(**task.dict(), owner_id=owner_id)
     db.add(db_task)
+    count_task_changes(db, owner_id, *done_split([db_task.is_done]))
     db.commit()
+    after_commit(db, response_cache.invalidate_tasks, owner_id)
     db.refresh(db_task)
+    after_commit(db, feed.task_saved, "created", db_task)
     return db_task
 
 
-def get_task(db: Session, task_id: int):
-    """Retrieve a single task by ID."""
-    return db.query(models.Task).filter(models.Task.id == task_id).first()
+def get_task(db: Session, task_id: int, for_update: bool = False):
+    """Retrieve a single task by ID.
+
+    for_update re-reads the row and locks it until the transaction ends, so a
+    write can trust the is_done it saw when it adjusts the task counters.
+    """
+    query = db.query(models.Task).filter(models.Task.id == task_id)
+    if for_update:
+        query = query.with_for_update().populate_existing()
+    return query.first()
+
+
+def tasks_select(
+    skip: int = 0,
+    limit: int = 100,
+    q: Optional[str] = None,
+    is_done: Optional[bool] = None,
+    owner_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    dialect: str = "sqlite"
+):
+    """
+    Build the SELECT behind get_tasks (shared with crud_async).
+    Rows are ordered by (created_at, id) so pages are stable; with a cursor the
+    page starts after that key instead of skipping rows, which lets the
+    (owner_id, is_done, created_at, id) index serve it as a range scan.
+    Searches (q) go through the dialect's search backend and come back
+    best match first, paginated with skip/limit.
+    """
+    query = select(models.Task)
+    if owner_id is not None:
+        query = query.where(models.Task.owner_id == owner_id)
+    if is_done is not None:
+        query = query.where(models.Task.is_done == is_done)
+    order_by = [models.Task.created_at, models.Task.id]
+    if q:
+        if cursor:
+            raise ValueError("cursor pagination is not supported with q")
+        query, rank = search.backend_for(dialect).apply(query, q)
+        order_by = rank + order_by
+    if cursor:
+        created_at, task_id = decode_cursor(cursor)
+        query = query.where(tuple_(models.Task.created_at, models.Task.id) > tuple_(created_at, task_id))
+    else:
+        query = query.offset(skip)
+    return query.order_by(*order_by).limit(limit)
 
 
 def get_tasks(
@@ -67,40 +142,254 @@ def get_tasks(
     skip: int = 0,
     limit: int = 100,
     q: Optional[str] = None,
-    is_done: Optional[bool] = None
+    is_done: Optional[bool] = None,
+    owner_id: Optional[int] = None,
+    cursor: Optional[str] = None
 ):
     """
-    Retrieve multiple tasks, optionally filtered by search term or completion status.
-    - q: search by task title (case-insensitive)
+    Retrieve multiple tasks, optionally filtered by search term, completion status or owner.
+    - q: full-text search over title and description (prefix match, ranked)
     - is_done: True / False filter
+    - cursor: keyset cursor from a previous page (skip is ignored when given)
     """
-    query = db.query(models.Task)
-    if q:
-        query = query.filter(models.Task.title.ilike(f"%{q}%"))
-    if is_done is not None:
-        query = query.filter(models.Task.is_done == is_done)
-    return query.offset(skip).limit(limit).all()
+    query = tasks_select(skip, limit, q, is_done, owner_id, cursor, dialect=db.get_bind().dialect.name)
+    return db.execute(query).scalars().all()
+
+
+def get_task_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    q: Optional[str] = None,
+    is_done: Optional[bool] = None,
+    owner_id: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    """
+    Same tasks as get_tasks, as row tuples of TaskOut's columns (serialization.TASK_FIELDS
+    order) instead of ORM objects; GET /tasks encodes these directly.
+    """
+    query = tasks_select(skip, limit, q, is_done, owner_id, cursor, dialect=db.get_bind().dialect.name)
+    return db.execute(query.with_only_columns(*TASK_COLUMNS)).all()
 
 
 def update_task(db: Session, task_id: int, task_in: schemas.TaskUpdate):
     """Update an existing task by ID."""
-    db_task = get_task(db, task_id)
+    db_task = get_task(db, task_id, for_update=True)
     if not db_task:
         return None
 
+    was_done = bool(db_task.is_done)
     for key, value in task_in.dict(exclude_unset=True).items():
         setattr(db_task, key, value)
 
+    owner_id = db_task.owner_id
+    if bool(db_task.is_done) != was_done:
+        flip = 1 if was_done else -1
+        count_task_changes(db, owner_id, open_count=flip, done=-flip)
     db.commit()
+    after_commit(db, response_cache.invalidate_tasks, owner_id)
     db.refresh(db_task)
+    after_commit(db, feed.task_saved, "updated", db_task)
     return db_task
 
 
 def delete_task(db: Session, task_id: int):
     """Delete a task by ID."""
-    db_task = get_task(db, task_id)
+    db_task = get_task(db, task_id, for_update=True)
     if not db_task:
         return False
+    owner_id = db_task.owner_id
+    open_count, done = done_split([db_task.is_done])
     db.delete(db_task)
+    count_task_changes(db, owner_id, -open_count, -done)
     db.commit()
+    after_commit(db, response_cache.invalidate_tasks, owner_id)
+    after_commit(db, feed.publish, "deleted", owner_id, {"id": task_id})
     return True
+
+
+# ========================
+# BULK TASK OPERATIONS
+# ========================
+# Each function runs as a single transaction: executemany in chunks, one
+# ownership query per chunk, one commit at the end.
+
+def create_tasks_bulk(db: Session, owner_id: int, tasks: List[schemas.TaskCreate]) -> List[int]:
+    """Insert tasks for owner_id; returns the new ids in input order."""
+    stmt = insert(models.Task).returning(models.Task.id, sort_by_parameter_order=True)
+    ids = []
+    for chunk in chunks(tasks):
+        rows = [dict(task.dict(), owner_id=owner_id) for task in chunk]
+        ids += db.execute(stmt, rows).scalars().all()
+    count_task_changes(db, owner_id, *done_split(task.is_done for task in tasks))
+    db.commit()
+    after_commit(db, response_cache.invalidate_tasks, owner_id)
+    after_commit(db, feed.publish, "changed", owner_id, {"ids": ids})
+    return ids
+
+
+def task_done_flags(db: Session, owner_id: int, task_ids: List[int], for_update: bool = False) -> Dict[int, bool]:
+    """is_done of the tasks among task_ids that exist and belong to owner_id.
+
+    for_update locks those rows until the transaction ends (see get_task).
+    """
+    flags = {}
+    for chunk in chunks(sorted(set(task_ids))):
+        query = select(models.Task.id, models.Task.is_done).where(
+            models.Task.id.in_(chunk), models.Task.owner_id == owner_id)
+        if for_update:
+            query = query.with_for_update()
+        flags.update((task_id, bool(is_done)) for task_id, is_done in db.execute(query))
+    return flags
+
+
+def update_tasks_bulk(db: Session, owner_id: int, patches: List[Tuple[int, Dict]]) -> Set[int]:
+    """Apply (task_id, values) patches to owner_id's tasks; returns the ids that were found."""
+    was_done = task_done_flags(db, owner_id, [task_id for task_id, _ in patches], for_update=True)
+    owned = set(was_done)
+    rows = [dict(values, id=task_id) for task_id, values in patches if task_id in owned and values]
+    for chunk in chunks(rows):
+        # ORM bulk UPDATE by primary key; rows with different columns are grouped
+        db.execute(update(models.Task), chunk)
+    count_task_changes(db, owner_id, *done_flips(was_done, patches))
+    db.commit()
+    after_commit(db, response_cache.invalidate_tasks, owner_id)
+    after_commit(db, feed.publish, "changed", owner_id, {"ids": sorted(owned)})
+    return owned
+
+
+def delete_tasks_bulk(db: Session, owner_id: int, task_ids: List[int]) -> Set[int]:
+    """Delete owner_id's tasks among task_ids; returns the ids actually deleted."""
+    deleted = {}
+    returning = db.get_bind().dialect.delete_returning
+    for chunk in chunks(list(set(task_ids))):
+        stmt = (
+            delete(models.Task)
+            .where(models.Task.id.in_(chunk), models.Task.owner_id == owner_id)
+            .execution_options(synchronize_session=False)
+        )
+        if returning:
+            deleted.update(db.execute(stmt.returning(models.Task.id, models.Task.is_done)).all())
+        else:
+            deleted.update(task_done_flags(db, owner_id, chunk, for_update=True))
+            db.execute(stmt)
+    open_count, done = done_split(deleted.values())
+    count_task_changes(db, owner_id, -open_count, -done)
+    db.commit()
+    after_commit(db, response_cache.invalidate_tasks, owner_id)
+    after_commit(db, feed.publish, "changed", owner_id, {"ids": sorted(deleted)})
+    return set(deleted)
+
+
+# ========================
+# PER-USER TASK COUNTERS
+# ========================
+# user_task_stats keeps each owner's open/done counts. Every task write above
+# adjusts them in its own transaction, so GET /users/me/stats reads one row
+# instead of counting tasks. reconcile_task_stats (a periodic job, see
+# jobs.py) repairs drift from writes that bypass crud, e.g. init_db.seed.
+# A NULL is_done counts as open.
+
+def done_split(flags: Iterable[Optional[bool]]) -> Tuple[int, int]:
+    """(open, done) counts of a sequence of is_done values."""
+    open_count = done = 0
+    for flag in flags:
+        if flag:
+            done += 1
+        else:
+            open_count += 1
+    return open_count, done
+
+
+def done_flips(was_done: Dict[int, bool], patches: List[Tuple[int, Dict]]) -> Tuple[int, int]:
+    """(open, done) deltas of applying patches (last one wins) to tasks with these is_done values."""
+    now_done = dict(was_done)
+    for task_id, values in patches:
+        if task_id in was_done and "is_done" in values:
+            now_done[task_id] = bool(values["is_done"])
+    to_done = sum(1 for task_id, flag in now_done.items() if flag and not was_done[task_id])
+    to_open = sum(1 for task_id, flag in now_done.items() if not flag and was_done[task_id])
+    return to_open - to_done, to_done - to_open
+
+
+def task_stats_upsert(dialect: str, owner_id: int, open_count: int, done: int):
+    """INSERT ... ON CONFLICT adding open/done to owner_id's counters (SQLite, PostgreSQL)."""
+    stats = models.UserTaskStats
+    dialect_insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+    stmt = dialect_insert(stats).values(owner_id=owner_id, open_count=open_count, done_count=done)
+    return stmt.on_conflict_do_update(index_elements=["owner_id"], set_={
+        "open_count": stats.open_count + stmt.excluded.open_count,
+        "done_count": stats.done_count + stmt.excluded.done_count,
+    })
+
+
+def task_stats_update(owner_id: int, open_count: int, done: int):
+    """UPDATE adding open/done to an existing counter row (dialects without ON CONFLICT)."""
+    stats = models.UserTaskStats
+    return (update(stats).where(stats.owner_id == owner_id)
+            .values(open_count=stats.open_count + open_count, done_count=stats.done_count + done))
+
+
+UPSERT_DIALECTS = {"sqlite", "postgresql"}
+
+
+def count_task_changes(db: Session, owner_id: Optional[int], open_count: int = 0, done: int = 0):
+    """Add open/done to owner_id's counters in db's current transaction."""
+    if owner_id is None or not (open_count or done):
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect in UPSERT_DIALECTS:
+        db.execute(task_stats_upsert(dialect, owner_id, open_count, done))
+    elif not db.execute(task_stats_update(owner_id, open_count, done)).rowcount:
+        db.execute(insert(models.UserTaskStats).values(owner_id=owner_id, open_count=open_count, done_count=done))
+
+
+def overdue_select(owner_id: int, now: datetime.datetime):
+    """COUNT of owner_id's open tasks due before now; a range scan of ix_tasks_owner_done_due."""
+    task = models.Task
+    return (select(func.count()).select_from(task)
+            .where(task.owner_id == owner_id, or_(task.is_done == False, task.is_done.is_(None)),  # noqa: E712
+                   task.due_date < now))
+
+
+def get_task_stats(db: Session, owner_id: int, now: Optional[datetime.datetime] = None) -> schemas.TaskStats:
+    """Open/done/total from the counter row, overdue counted from the index."""
+    row = db.get(models.UserTaskStats, owner_id)
+    open_count, done = (row.open_count, row.done_count) if row else (0, 0)
+    overdue = db.execute(overdue_select(owner_id, now or datetime.datetime.utcnow())).scalar()
+    return schemas.TaskStats(open=open_count, done=done, total=open_count + done, overdue=overdue)
+
+
+def count_tasks(db: Session, owner_id: Optional[int] = None) -> Dict[int, Tuple[int, int]]:
+    """Ground truth: (open, done) per owner straight from the tasks table."""
+    task = models.Task
+    query = select(task.owner_id, task.is_done, func.count()).where(task.owner_id.isnot(None))
+    if owner_id is not None:
+        query = query.where(task.owner_id == owner_id)
+    counts = {}
+    for owner, is_done, n in db.execute(query.group_by(task.owner_id, task.is_done)):
+        open_count, done = counts.get(owner, (0, 0))
+        counts[owner] = (open_count, done + n) if is_done else (open_count + n, done)
+    return counts
+
+
+def reconcile_task_stats(db: Session) -> int:
+    """Rewrite the counters that disagree with the tasks table; returns how many owners were off."""
+    stats = models.UserTaskStats
+    truth = count_tasks(db)
+    stored = {owner: (open_count, done) for owner, open_count, done in
+              db.execute(select(stats.owner_id, stats.open_count, stats.done_count))}
+    drifted = sorted(owner for owner in set(truth) | set(stored)
+                     if truth.get(owner, (0, 0)) != stored.get(owner, (0, 0)))
+    for owner_id in drifted:
+        # lock the row and recount just this owner, so writes that landed
+        # since the first pass are not overwritten
+        row = db.execute(select(stats).where(stats.owner_id == owner_id).with_for_update()).scalar_one_or_none()
+        open_count, done = count_tasks(db, owner_id).get(owner_id, (0, 0))
+        if row is None:
+            db.add(stats(owner_id=owner_id, open_count=open_count, done_count=done))
+        else:
+            row.open_count, row.done_count = open_count, done
+    db.commit()
+    return len(drifted)
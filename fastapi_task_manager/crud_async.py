@@ -0,0 +1,276 @@
+"""Async counterparts of crud.py for AsyncSession engines.
+
+Every function mirrors the sync version of the same name; `call` picks the
+right one for whichever session type the endpoint was given.
+"""
+import asyncio
+import datetime
+import sys
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, List, Optional, Set, Tuple
+import models, schemas, crud, hashing
+from bulk import chunks
+from serialization import TASK_COLUMNS
+from response_cache import response_cache
+from writer import WRITE_OPS, write_queue
+from routing import READ_OPS, current_user_id, router
+from feed import feed
+
+
+async def call(fn, db, *args, **kwargs):
+    """Run crud function `fn` against `db` without blocking the event loop.
+
+    AsyncSession -> await the async function with the same name in this module.
+    Session      -> run the sync function in the threadpool, or for task writes
+                    on the SQLite write queue (its own session, group commit).
+
+    Read-only functions may run on a replica instead of `db` (routing.py);
+    anything else pins the current user's reads to the primary for a while.
+    """
+    user_id = current_user_id.get()
+    is_async = isinstance(db, AsyncSession)
+    target = getattr(sys.modules[__name__], fn.__name__) if is_async else fn
+    if await router.ause_replica(fn, user_id):
+        if is_async:
+            return await router.run_async(target, db, *args, **kwargs)
+        return await run_in_threadpool(router.run, fn, db, *args, **kwargs)
+    if is_async:
+        result = await target(db, *args, **kwargs)
+    elif write_queue is not None and fn.__name__ in WRITE_OPS:
+        result = await asyncio.wrap_future(write_queue.submit(fn, *args, **kwargs))
+    else:
+        result = await run_in_threadpool(fn, db, *args, **kwargs)
+    if fn.__name__ not in READ_OPS:
+        await router.amark_write(user_id)
+    return result
+
+
+# ========================
+# USER CRUD OPERATIONS
+# ========================
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    """Create a new user with a hashed password."""
+    hashed = await hashing.hash_password_async(user.password)
+    db_user = models.User(
+        name=user.name,
+        email=user.email,
+        hashed_password=hashed
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[models.User]:
+    """Fetch a user by email."""
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    return result.scalars().first()
+
+
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[models.User]:
+    """Return the user if the password matches, upgrading a stale bcrypt cost."""
+    user = await get_user_by_email(db, email)
+    if not user or not await hashing.verify_password_async(password, user.hashed_password):
+        return None
+    if hashing.needs_rehash(user.hashed_password):
+        user.hashed_password = await hashing.hash_password_async(password)
+        await db.commit()
+    return user
+
+
+async def get_user(db: AsyncSession, user_id: int) -> Optional[models.User]:
+    """Fetch a user by ID."""
+    result = await db.execute(select(models.User).where(models.User.id == user_id))
+    return result.scalars().first()
+
+
+async def list_users(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[models.User]:
+    """Return a paginated list of users."""
+    result = await db.execute(select(models.User).offset(skip).limit(limit))
+    return result.scalars().all()
+
+
+# ========================
+# TASK CRUD OPERATIONS
+# ========================
+
+async def create_task(db: AsyncSession, owner_id: int, task: schemas.TaskCreate):
+    """Create a new task for a given owner."""
+    db_task = models.Task(**task.dict(), owner_id=owner_id)
+    db.add(db_task)
+    await count_task_changes(db, owner_id, *crud.done_split([db_task.is_done]))
+    await db.commit()
+    await response_cache.ainvalidate_tasks(owner_id)
+    await db.refresh(db_task)
+    await feed.atask_saved("created", db_task)
+    return db_task
+
+
+async def get_task(db: AsyncSession, task_id: int, for_update: bool = False):
+    """Retrieve a single task by ID; for_update as in crud.get_task."""
+    query = select(models.Task).where(models.Task.id == task_id)
+    if for_update:
+        query = query.with_for_update().execution_options(populate_existing=True)
+    result = await db.execute(query)
+    return result.scalars().first()
+
+
+async def get_tasks(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    q: Optional[str] = None,
+    is_done: Optional[bool] = None,
+    owner_id: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    """Async version of crud.get_tasks."""
+    query = crud.tasks_select(skip, limit, q, is_done, owner_id, cursor, dialect=db.get_bind().dialect.name)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+async def get_task_rows(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    q: Optional[str] = None,
+    is_done: Optional[bool] = None,
+    owner_id: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    """Async version of crud.get_task_rows."""
+    query = crud.tasks_select(skip, limit, q, is_done, owner_id, cursor, dialect=db.get_bind().dialect.name)
+    result = await db.execute(query.with_only_columns(*TASK_COLUMNS))
+    return result.all()
+
+
+async def update_task(db: AsyncSession, task_id: int, task_in: schemas.TaskUpdate):
+    """Update an existing task by ID."""
+    db_task = await get_task(db, task_id, for_update=True)
+    if not db_task:
+        return None
+
+    was_done = bool(db_task.is_done)
+    for key, value in task_in.dict(exclude_unset=True).items():
+        setattr(db_task, key, value)
+
+    owner_id = db_task.owner_id
+    if bool(db_task.is_done) != was_done:
+        flip = 1 if was_done else -1
+        await count_task_changes(db, owner_id, open_count=flip, done=-flip)
+    await db.commit()
+    await response_cache.ainvalidate_tasks(owner_id)
+    await db.refresh(db_task)
+    await feed.atask_saved("updated", db_task)
+    return db_task
+
+
+async def delete_task(db: AsyncSession, task_id: int):
+    """Delete a task by ID."""
+    db_task = await get_task(db, task_id, for_update=True)
+    if not db_task:
+        return False
+    owner_id = db_task.owner_id
+    open_count, done = crud.done_split([db_task.is_done])
+    await db.delete(db_task)
+    await count_task_changes(db, owner_id, -open_count, -done)
+    await db.commit()
+    await response_cache.ainvalidate_tasks(owner_id)
+    await feed.apublish("deleted", owner_id, {"id": task_id})
+    return True
+
+
+# ========================
+# BULK TASK OPERATIONS
+# ========================
+
+async def create_tasks_bulk(db: AsyncSession, owner_id: int, tasks: List[schemas.TaskCreate]) -> List[int]:
+    """Insert tasks for owner_id; returns the new ids in input order."""
+    stmt = insert(models.Task).returning(models.Task.id, sort_by_parameter_order=True)
+    ids = []
+    for chunk in chunks(tasks):
+        rows = [dict(task.dict(), owner_id=owner_id) for task in chunk]
+        ids += (await db.execute(stmt, rows)).scalars().all()
+    await count_task_changes(db, owner_id, *crud.done_split(task.is_done for task in tasks))
+    await db.commit()
+    await response_cache.ainvalidate_tasks(owner_id)
+    await feed.apublish("changed", owner_id, {"ids": ids})
+    return ids
+
+
+async def task_done_flags(db: AsyncSession, owner_id: int, task_ids: List[int],
+                          for_update: bool = False) -> Dict[int, bool]:
+    """is_done of the tasks among task_ids that exist and belong to owner_id; for_update locks them."""
+    flags = {}
+    for chunk in chunks(sorted(set(task_ids))):
+        query = select(models.Task.id, models.Task.is_done).where(
+            models.Task.id.in_(chunk), models.Task.owner_id == owner_id)
+        if for_update:
+            query = query.with_for_update()
+        flags.update((task_id, bool(is_done)) for task_id, is_done in (await db.execute(query)).all())
+    return flags
+
+
+async def update_tasks_bulk(db: AsyncSession, owner_id: int, patches: List[Tuple[int, Dict]]) -> Set[int]:
+    """Apply (task_id, values) patches to owner_id's tasks; returns the ids that were found."""
+    was_done = await task_done_flags(db, owner_id, [task_id for task_id, _ in patches], for_update=True)
+    owned = set(was_done)
+    rows = [dict(values, id=task_id) for task_id, values in patches if task_id in owned and values]
+    for chunk in chunks(rows):
+        await db.execute(update(models.Task), chunk)
+    await count_task_changes(db, owner_id, *crud.done_flips(was_done, patches))
+    await db.commit()
+    await response_cache.ainvalidate_tasks(owner_id)
+    await feed.apublish("changed", owner_id, {"ids": sorted(owned)})
+    return owned
+
+
+async def delete_tasks_bulk(db: AsyncSession, owner_id: int, task_ids: List[int]) -> Set[int]:
+    """Delete owner_id's tasks among task_ids; returns the ids actually deleted."""
+    deleted = {}
+    returning = db.get_bind().dialect.delete_returning
+    for chunk in chunks(list(set(task_ids))):
+        stmt = (
+            delete(models.Task)
+            .where(models.Task.id.in_(chunk), models.Task.owner_id == owner_id)
+            .execution_options(synchronize_session=False)
+        )
+        if returning:
+            deleted.update((await db.execute(stmt.returning(models.Task.id, models.Task.is_done))).all())
+        else:
+            deleted.update(await task_done_flags(db, owner_id, chunk, for_update=True))
+            await db.execute(stmt)
+    open_count, done = crud.done_split(deleted.values())
+    await count_task_changes(db, owner_id, -open_count, -done)
+    await db.commit()
+    await response_cache.ainvalidate_tasks(owner_id)
+    await feed.apublish("changed", owner_id, {"ids": sorted(deleted)})
+    return set(deleted)
+
+
+# ========================
+# PER-USER TASK COUNTERS
+# ========================
+
+async def count_task_changes(db: AsyncSession, owner_id: Optional[int], open_count: int = 0, done: int = 0):
+    """Async version of crud.count_task_changes."""
+    if owner_id is None or not (open_count or done):
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect in crud.UPSERT_DIALECTS:
+        await db.execute(crud.task_stats_upsert(dialect, owner_id, open_count, done))
+    elif not (await db.execute(crud.task_stats_update(owner_id, open_count, done))).rowcount:
+        await db.execute(insert(models.UserTaskStats).values(owner_id=owner_id, open_count=open_count, done_count=done))
+
+
+async def get_task_stats(db: AsyncSession, owner_id: int, now: Optional[datetime.datetime] = None) -> schemas.TaskStats:
+    """Async version of crud.get_task_stats."""
+    row = await db.get(models.UserTaskStats, owner_id)
+    open_count, done = (row.open_count, row.done_count) if row else (0, 0)
+    overdue = (await db.execute(crud.overdue_select(owner_id, now or datetime.datetime.utcnow()))).scalar()
+    return schemas.TaskStats(open=open_count, done=done, total=open_count + done, overdue=overdue)
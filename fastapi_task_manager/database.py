@@ -1,20 +1,188 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
+import metrics
 
 # Use SQLite by default. Change this to a PostgreSQL URL for production.
+# An async driver in the URL (sqlite+aiosqlite://, postgresql+asyncpg://)
+# switches the app to AsyncSession mode.
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-)
+# Connection pool settings (SQLite keeps its own pooling defaults)
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# SQLite tuning applied to every connection (file databases only)
+SQLITE_PRAGMAS = os.getenv("SQLITE_PRAGMAS", "1") == "1"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Route task writes through writer.write_queue (sync SQLite mode only)
+SQLITE_WRITE_QUEUE = os.getenv("SQLITE_WRITE_QUEUE", "1") == "1"
+
+# Create missing tables (and the search index) when the app starts. Fine for
+# development and tests; deployments run `alembic upgrade head` instead and
+# set 0 so booting a worker does not touch the database at all.
+AUTO_CREATE_SCHEMA = os.getenv("AUTO_CREATE_SCHEMA", "1") == "1"
+
+# Comma-separated read replicas of DATABASE_URL (same driver); see routing.py
+REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+
+ASYNC_DRIVERS = {"aiosqlite", "asyncpg", "psycopg_async", "aiomysql", "asyncmy"}
+
+
+def is_async_url(url: str) -> bool:
+    """True when the URL names an asyncio DBAPI driver."""
+    return make_url(url).get_driver_name() in ASYNC_DRIVERS
+
+
+def engine_options(url: str) -> dict:
+    """Keyword arguments for create_engine / create_async_engine."""
+    if url.startswith("sqlite"):
+        opts = {"pool_recycle": POOL_RECYCLE}
+        if not is_async_url(url):
+            opts["connect_args"] = {"check_same_thread": False}
+        return opts
+    return {
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+    }
+
+
+def is_sqlite_file(url: str) -> bool:
+    u = make_url(url)
+    return u.get_backend_name() == "sqlite" and u.database not in (None, "", ":memory:")
+
+
+def sqlite_pragmas(read_only: bool = False):
+    """PRAGMAs run on every new SQLite connection.
+
+    WAL lets readers run alongside the writer; synchronous=NORMAL is durable
+    across application crashes in WAL mode and only fsyncs at checkpoints;
+    busy_timeout makes writers from other workers wait instead of failing
+    with "database is locked".
+    """
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}",
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+
+def tune_sqlite(engine, read_only: bool = False):
+    """Apply sqlite_pragmas() to each connection `engine` opens."""
+    pragmas = sqlite_pragmas(read_only)
+
+    @event.listens_for(getattr(engine, "sync_engine", engine), "connect")
+    def _set_pragmas(dbapi_connection, _record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    return engine
+
+
+IS_ASYNC = is_async_url(DATABASE_URL)
+IS_SQLITE_FILE = is_sqlite_file(DATABASE_URL)
+
+if IS_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+    engine = None
+    async_engine = create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+    AsyncSessionLocal = sessionmaker(
+        async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+else:
+    engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+    async_engine = None
+    AsyncSessionLocal = None
+
+# Reads that never write (GET /tasks, exports) use their own pool; on SQLite
+# those connections are query_only so they cannot take the write lock.
+if IS_SQLITE_FILE and not IS_ASYNC:
+    read_engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+else:
+    read_engine = engine
+
+if IS_SQLITE_FILE and SQLITE_PRAGMAS:
+    tune_sqlite(engine or async_engine)
+    if read_engine is not engine:
+        tune_sqlite(read_engine, read_only=True)
+
+# per-request SQL counts/time and pooled connection use for /metrics
+metrics.instrument_engine(engine or async_engine)
+if read_engine is not engine:
+    metrics.instrument_engine(read_engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+
+def replica_sessionmaker(url: str):
+    """Session factory for one read replica, tuned and instrumented like the primary."""
+    if IS_ASYNC:
+        replica = create_async_engine(url, **engine_options(url))
+        factory = sessionmaker(replica, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    else:
+        replica = create_engine(url, **engine_options(url))
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=replica)
+    if is_sqlite_file(url) and SQLITE_PRAGMAS:
+        tune_sqlite(replica, read_only=True)
+    metrics.instrument_engine(replica)
+    return factory
+
+
+# Without configured replicas, SQLite still reads from its query_only pool
+if REPLICA_URLS:
+    ReplicaSessions = [replica_sessionmaker(url) for url in REPLICA_URLS]
+elif read_engine is not engine:
+    ReplicaSessions = [ReadSessionLocal]
+else:
+    ReplicaSessions = []
 
 Base = declarative_base()
 
+
+def after_fork():
+    """Forget pooled connections inherited from the parent process (gunicorn preload_app).
+
+    close=False leaves the sockets alone for the parent; the child opens its own.
+    """
+    for factory in [SessionLocal, ReadSessionLocal, AsyncSessionLocal, *ReplicaSessions]:
+        bind = factory.kw.get("bind") if factory is not None else None
+        if bind is not None:
+            getattr(bind, "sync_engine", bind).dispose(close=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def create_schema_async():
+    """Async-mode equivalent of Base.metadata.create_all(bind=engine)."""
+    import search
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(search.install)
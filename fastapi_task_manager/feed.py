@@ -0,0 +1,236 @@
+"""Task change feed behind GET /tasks/stream (SSE) and the /tasks/stream WebSocket.
+
+crud publishes an event after every task write commits:
+
+    created / updated  data is the task as TaskOut renders it
+    deleted            data is {"id": ...}
+    changed            data is {"ids": [...]}; bulk writes, clients reload the list
+    due                data is the task; its due date passed while open (jobs.py)
+    reset              the client missed events and must reload the list
+
+Each worker keeps the last FEED_BUFFER events in memory so a reconnecting
+client can resume after its Last-Event-ID; when that id has already left
+the buffer it gets a single reset instead. Subscribers that fall more than
+FEED_QUEUE_SIZE events behind are reset the same way rather than buffered
+without bound.
+
+Event ids come from a per-process counter, so with several workers set
+FEED_URL to a Redis instance: ids then come from a shared INCR and every
+worker relays the events published on the Redis channel to its own
+subscribers.
+"""
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from typing import AsyncIterator, List, NamedTuple, Optional, Tuple
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
+from serialization import TASK_FIELDS
+
+FEED_BUFFER = int(os.getenv("FEED_BUFFER", "1000"))
+FEED_QUEUE_SIZE = int(os.getenv("FEED_QUEUE_SIZE", "256"))
+FEED_KEEPALIVE = float(os.getenv("FEED_KEEPALIVE", "15"))
+FEED_URL = os.getenv("FEED_URL")
+
+
+class Event(NamedTuple):
+    id: int
+    type: str
+    owner_id: Optional[int]
+    data: dict
+
+    def to_json(self) -> str:
+        return json.dumps(self._asdict(), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, raw) -> "Event":
+        return cls(**json.loads(raw))
+
+
+def task_data(task) -> dict:
+    return jsonable_encoder({field: getattr(task, field) for field in TASK_FIELDS})
+
+
+def format_sse(event: Optional[Event]) -> str:
+    """One Server-Sent Events frame; None is a keepalive comment."""
+    if event is None:
+        return ": keepalive\n\n"
+    return f"id: {event.id}\nevent: {event.type}\ndata: {event.to_json()}\n\n"
+
+
+class Subscription:
+    def __init__(self, loop, owner_id: Optional[int], size: int = FEED_QUEUE_SIZE):
+        self.loop = loop
+        self.owner_id = owner_id
+        self.queue = asyncio.Queue(size)
+        self.lagged = False
+
+    def offer(self, event: Event):
+        """Runs on the subscriber's event loop."""
+        if self.owner_id is not None and event.owner_id != self.owner_id:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.lagged = True
+
+
+class RedisFeed:
+    """Publishes through a Redis channel; a listener thread relays it back into the feed."""
+    local = False
+
+    def __init__(self, client, channel: str = "feed:tasks"):
+        self.client = client
+        self.channel = channel
+        self._pubsub = None
+        self._thread = None
+
+    @classmethod
+    def from_url(cls, url: str):
+        import redis
+
+        return cls(redis.Redis.from_url(url, decode_responses=True))
+
+    def publish(self, type: str, owner_id: Optional[int], data: dict):
+        event_id = int(self.client.incr(self.channel + ":id"))
+        self.client.publish(self.channel, Event(event_id, type, owner_id, data).to_json())
+
+    def start(self, deliver):
+        if self._thread is not None:
+            return
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(self.channel)
+
+        def listen():
+            for message in self._pubsub.listen():
+                if message and message.get("type") == "message":
+                    deliver(Event.from_json(message["data"]))
+
+        self._thread = threading.Thread(target=listen, name="task-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._pubsub is not None:
+            self._pubsub.close()
+        self._pubsub = self._thread = None
+
+
+class ChangeFeed:
+    def __init__(self, backend=None, size: int = FEED_BUFFER):
+        self.backend = backend
+        self.published = 0
+        self.resets = 0
+        self._events = deque(maxlen=size)
+        self._subscribers = set()
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def local(self) -> bool:
+        return self.backend is None
+
+    def start(self):
+        if self.backend is not None:
+            self.backend.start(self.deliver)
+
+    def stop(self):
+        if self.backend is not None:
+            self.backend.stop()
+
+    def publish(self, type: str, owner_id: Optional[int], data: dict):
+        """Called by crud after a task write commits; safe from any thread."""
+        self.published += 1
+        if self.backend is not None:
+            self.backend.publish(type, owner_id, data)
+            return
+        with self._lock:
+            event = Event(self._last_id + 1, type, owner_id, data)
+            self._record(event)
+            subscribers = list(self._subscribers)
+        self._fan_out(event, subscribers)
+
+    async def apublish(self, type: str, owner_id: Optional[int], data: dict):
+        if self.local:
+            return self.publish(type, owner_id, data)
+        return await run_in_threadpool(self.publish, type, owner_id, data)
+
+    def deliver(self, event: Event):
+        """Entry point for events that already carry an id (cross-worker backend)."""
+        with self._lock:
+            self._record(event)
+            subscribers = list(self._subscribers)
+        self._fan_out(event, subscribers)
+
+    def _record(self, event: Event):
+        self._events.append(event)
+        self._last_id = max(self._last_id, event.id)
+
+    @staticmethod
+    def _fan_out(event: Event, subscribers):
+        for sub in subscribers:
+            sub.loop.call_soon_threadsafe(sub.offer, event)
+
+    # convenience wrappers used by crud / crud_async
+    def task_saved(self, type: str, task):
+        self.publish(type, task.owner_id, task_data(task))
+
+    async def atask_saved(self, type: str, task):
+        await self.apublish(type, task.owner_id, task_data(task))
+
+    def _reset(self) -> Event:
+        self.resets += 1
+        return Event(self._last_id, "reset", None, {})
+
+    def subscribe(self, owner_id: Optional[int] = None,
+                  last_event_id: Optional[int] = None) -> Tuple[Subscription, List[Event]]:
+        """Register a subscriber; returns it with the events it missed since last_event_id."""
+        sub = Subscription(asyncio.get_running_loop(), owner_id)
+        with self._lock:
+            self._subscribers.add(sub)
+            if last_event_id is None:
+                return sub, []
+            oldest = self._events[0].id if self._events else self._last_id + 1
+            # ids from before this buffer (or from a restarted counter) cannot be replayed
+            if last_event_id < oldest - 1 or last_event_id > self._last_id:
+                return sub, [self._reset()]
+            return sub, [e for e in self._events
+                         if e.id > last_event_id and (owner_id is None or e.owner_id == owner_id)]
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    async def events(self, owner_id: Optional[int] = None, last_event_id: Optional[int] = None,
+                     keepalive: float = FEED_KEEPALIVE) -> AsyncIterator[Optional[Event]]:
+        """Backlog first, then live events; yields None every `keepalive` idle seconds."""
+        sub, backlog = self.subscribe(owner_id, last_event_id)
+        try:
+            for event in backlog:
+                yield event
+            while True:
+                if sub.lagged:
+                    while not sub.queue.empty():
+                        sub.queue.get_nowait()
+                    sub.lagged = False
+                    yield self._reset()
+                    continue
+                try:
+                    yield await asyncio.wait_for(sub.queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self.unsubscribe(sub)
+
+    def stats(self) -> dict:
+        return {
+            "last_id": self._last_id,
+            "published": self.published,
+            "buffered": len(self._events),
+            "subscribers": len(self._subscribers),
+            "resets": self.resets,
+        }
+
+
+feed = ChangeFeed(RedisFeed.from_url(FEED_URL) if FEED_URL else None)
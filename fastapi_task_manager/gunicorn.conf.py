@@ -0,0 +1,33 @@
+"""gunicorn settings: gunicorn -c gunicorn.conf.py main:app
+
+With preload_app the master imports main once, runs main.warm_up() for
+the imports that are otherwise deferred to the first request, and forks
+the workers from that, so a new or restarted worker serves right away
+instead of importing FastAPI, SQLAlchemy and the models itself.
+
+Run migrations (alembic upgrade head) before starting and keep
+AUTO_CREATE_SCHEMA=0 so the import does not touch the database; anything
+the master did connect is dropped in each worker by post_fork. Code is
+only reloaded by a new master (kill -USR2), not by HUP.
+"""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "3"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("PRELOAD_APP", "1") == "1"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    # runs in the master after the preload and before the first fork
+    if preload_app:
+        import main
+
+        main.warm_up()
+
+
+def post_fork(server, worker):
+    import database
+
+    database.after_fork()
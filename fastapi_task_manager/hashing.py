@@ -0,0 +1,127 @@
+"""Password hashing on a bounded process pool.
+
+bcrypt burns ~250ms of CPU per call at the default cost, so hashing and
+verification run in a dedicated ProcessPoolExecutor instead of the event
+loop or the request threadpool. At most HASH_POOL_WORKERS jobs run and
+HASH_QUEUE_SIZE wait; anything beyond that raises HashingBusy, which the
+API turns into 429 Too Many Requests.
+
+BCRYPT_ROUNDS sets the cost for new hashes. Hashes made with a different
+cost are flagged by needs_rehash so a successful login can upgrade them.
+HASH_POOL_WORKERS=0 hashes inline (handy for scripts and debugging).
+
+passlib is imported on first use (see context()), not when the app is
+imported; gunicorn.conf.py warms it in the master before forking.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+import metrics
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", "2"))
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", "32"))
+
+_context = None
+
+
+def context():
+    """The bcrypt CryptContext, built on first use."""
+    global _context
+    if _context is None:
+        from passlib.context import CryptContext
+
+        _context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+    return _context
+
+
+class HashingBusy(Exception):
+    """The hashing pool and its queue are full."""
+
+
+def _hash(password: str) -> str:
+    return context().hash(password)
+
+
+def _verify(password: str, hashed: str) -> bool:
+    return context().verify(password, hashed)
+
+
+def rounds_of(hashed: str) -> int:
+    """Cost factor of a modular-crypt bcrypt hash ($2b$12$...)."""
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return -1
+
+
+def needs_rehash(hashed: str) -> bool:
+    return rounds_of(hashed) != BCRYPT_ROUNDS or context().needs_update(hashed)
+
+
+class HashPool:
+    def __init__(self, workers: int = HASH_POOL_WORKERS, queue_size: int = HASH_QUEUE_SIZE):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.in_flight = 0
+        self.rejected = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn: forking a process that already runs an event loop and threads is unsafe
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def submit(self, fn, *args) -> Future:
+        op = fn.__name__.strip("_")
+        start = time.perf_counter()
+        if self.workers <= 0:
+            future = Future()
+            future.set_result(fn(*args))
+            metrics.BCRYPT_SECONDS.observe(time.perf_counter() - start, op=op)
+            return future
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                self.rejected += 1
+                raise HashingBusy()
+            self.in_flight += 1
+            executor = self._get_executor()
+        future = executor.submit(fn, *args)
+        future.add_done_callback(self._done)
+        future.add_done_callback(lambda _: metrics.BCRYPT_SECONDS.observe(time.perf_counter() - start, op=op))
+        return future
+
+    def _done(self, _future):
+        with self._lock:
+            self.in_flight -= 1
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+pool = HashPool()
+
+
+def hash_password(password: str) -> str:
+    """Blocking hash; call from worker threads, not the event loop."""
+    return pool.submit(_hash, password).result()
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    return pool.submit(_verify, password, hashed).result()
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.wrap_future(pool.submit(_hash, password))
+
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await asyncio.wrap_future(pool.submit(_verify, password, hashed))
@@ -0,0 +1,115 @@
+"""Cache of authenticated users keyed by JWT subject (email).
+
+get_current_user checks here before querying the users table. Entries live
+for IDENTITY_CACHE_TTL seconds (0 disables the cache) and are dropped as
+soon as a User row is updated or deleted through the ORM.
+
+The default backend is a per-process LRU. Set IDENTITY_CACHE_URL to a
+redis:// URL (requires the `redis` package) to share entries, and
+invalidations, between gunicorn workers.
+"""
+import json
+import os
+from typing import Optional
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+import models, schemas
+from cache import MemoryBackend, RedisBackend
+
+IDENTITY_CACHE_TTL = float(os.getenv("IDENTITY_CACHE_TTL", "60"))
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", "10000"))
+IDENTITY_CACHE_URL = os.getenv("IDENTITY_CACHE_URL")
+
+
+class IdentityCache:
+    def __init__(self, backend, ttl: float = IDENTITY_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get(self, email: str) -> Optional[schemas.UserOut]:
+        if not self.enabled:
+            return None
+        raw = self.backend.get(email)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return schemas.UserOut(**json.loads(raw))
+
+    def set(self, user: schemas.UserOut):
+        if self.enabled:
+            self.backend.set(user.email, json.dumps(user.dict()), self.ttl)
+
+    def invalidate(self, *emails: str):
+        emails = [e for e in emails if e]
+        if emails:
+            self.invalidations += len(emails)
+            self.backend.delete(*emails)
+
+    async def aget(self, email: str) -> Optional[schemas.UserOut]:
+        """get() that keeps remote backends off the event loop."""
+        if self.backend.local:
+            return self.get(email)
+        return await run_in_threadpool(self.get, email)
+
+    async def aset(self, user: schemas.UserOut):
+        if self.backend.local:
+            return self.set(user)
+        return await run_in_threadpool(self.set, user)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": getattr(self.backend, "evictions", None),
+            "size": len(self.backend) if hasattr(self.backend, "__len__") else None,
+        }
+
+
+def _default_backend():
+    if IDENTITY_CACHE_URL:
+        return RedisBackend.from_url(IDENTITY_CACHE_URL, prefix="identity:")
+    return MemoryBackend(maxsize=IDENTITY_CACHE_SIZE)
+
+
+identity_cache = IdentityCache(_default_backend())
+
+
+# ========================
+# INVALIDATION
+# ========================
+# Emails of users updated/deleted in a flush are collected on the session and
+# dropped from the cache once the transaction commits.
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    stale = session.info.setdefault("stale_identities", set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.User):
+            history = inspect(obj).attrs.email.history
+            stale.update(e for e in (obj.email, *history.deleted) if e)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    stale = session.info.pop("stale_identities", None)
+    if stale:
+        identity_cache.invalidate(*stale)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session):
+    session.info.pop("stale_identities", None)
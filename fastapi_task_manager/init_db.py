@@ -1,9 +1,71 @@
+from sqlalchemy import func, insert, inspect, select
+from sqlalchemy.orm import Session
 from database import engine, Base, SessionLocal
-import models, crud, schemas
+import models, crud, schemas, hashing
+import argparse
 import datetime
+import os
+
+SEED_BATCH = 5000
+ALEMBIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic")
+
+def _indexes(insp, table):
+    return {ix["name"] for ix in insp.get_indexes(table)}
+
+def _columns(insp, table):
+    return {col["name"]: col for col in insp.get_columns(table)}
+
+def _has_search_index(insp):
+    if insp.dialect.name == "sqlite":
+        return insp.has_table("tasks_fts")
+    return insp.dialect.name != "postgresql" or "ix_tasks_search" in _indexes(insp, "tasks")
+
+# What each revision adds, as seen by an inspector; lets migrate() tell which
+# revisions a database made by create_all (no alembic_version) already has.
+SCHEMA_MARKERS = [
+    ("0001", lambda insp: insp.has_table("tasks")),
+    ("0002", lambda insp: "ix_tasks_created_id" in _indexes(insp, "tasks")),
+    ("0003", _has_search_index),
+    ("0004", lambda insp: insp.has_table("jobs")),
+    ("0005", lambda insp: insp.has_table("user_task_stats")),
+    ("0006", lambda insp: "reminded_due" in _columns(insp, "tasks")),
+    ("0007", lambda insp: not _columns(insp, "tasks")["created_at"]["nullable"]),
+]
+
+def migrate():
+    """`alembic upgrade head` on DATABASE_URL.
+
+    A database whose tables came from create_all (older init_db runs, or
+    main.py with AUTO_CREATE_SCHEMA=1) has no alembic_version. Its revisions
+    are walked one at a time instead: those whose changes are already there
+    are stamped, the rest are run. create_all adds no indexes to tables that
+    already existed and fills no counters, so after stamping the models'
+    missing indexes are created and the task counters reconciled.
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(os.path.dirname(ALEMBIC_DIR), "alembic.ini"))
+    config.set_main_option("script_location", ALEMBIC_DIR)
+    insp = inspect(engine)
+    stamped = False
+    if insp.has_table("tasks") and not insp.has_table("alembic_version"):
+        for revision, present in SCHEMA_MARKERS:
+            if present(inspect(engine)):
+                command.stamp(config, revision)
+                stamped = True
+            else:
+                command.upgrade(config, revision)
+    command.upgrade(config, "head")
+    if stamped:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
+        with Session(bind=engine) as db:
+            crud.reconcile_task_stats(db)
 
 def init():
-    Base.metadata.create_all(bind=engine)
+    migrate()
     db = SessionLocal()
     # create sample users
     alice = schemas.UserCreate(name="Alice Example", email="alice@example.com", password="alicepass")
@@ -24,5 +86,56 @@ def init():
     db.close()
     print("Initialized database with sample users and tasks.")
 
+def seed(users: int, tasks: int, password: str = "seedpass", bind=None):
+    """
+    Bulk-load `users` accounts (seed{i}@example.com, all sharing `password`) and
+    `tasks` tasks spread round-robin over them, in SEED_BATCH-row executemany
+    batches. The password is hashed once. Top-up only: rows already created
+    by an earlier seed run are kept. Task counters are reconciled afterwards.
+    Returns the seeded user ids.
+    """
+    if tasks and not users:
+        raise ValueError("tasks need at least one seeded user to own them")
+    bind = bind or engine
+    Base.metadata.create_all(bind=bind)
+    with bind.begin() as conn:
+        existing = conn.execute(select(func.count()).select_from(models.User)
+                                .where(models.User.email.like("seed%@example.com"))).scalar()
+        if existing < users:
+            hashed = hashing.hash_password(password)
+            for start in range(existing, users, SEED_BATCH):
+                conn.execute(insert(models.User), [
+                    {"name": f"Seed User {i}", "email": f"seed{i}@example.com", "hashed_password": hashed}
+                    for i in range(start, min(start + SEED_BATCH, users))
+                ])
+        owner_ids = conn.execute(select(models.User.id).where(models.User.email.like("seed%@example.com"))
+                                 .order_by(models.User.id).limit(users)).scalars().all()
+        have = conn.execute(select(func.count()).select_from(models.Task)
+                            .where(models.Task.owner_id.in_(owner_ids))).scalar() if owner_ids else 0
+        base = datetime.datetime.utcnow() - datetime.timedelta(seconds=tasks)
+        for start in range(have, tasks, SEED_BATCH):
+            conn.execute(insert(models.Task), [
+                {
+                    "title": f"Seeded task {i}",
+                    "description": "bulk seeded for load tests",
+                    "is_done": i % 4 == 0,
+                    "owner_id": owner_ids[i % len(owner_ids)],
+                    "created_at": base + datetime.timedelta(seconds=i),
+                }
+                for i in range(start, min(start + SEED_BATCH, tasks))
+            ])
+    # the inserts above bypass crud, so bring user_task_stats in line
+    with Session(bind=bind) as db:
+        crud.reconcile_task_stats(db)
+    return owner_ids
+
 if __name__ == "__main__":
-    init()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Migrate the schema to the latest revision and add sample data.")
+    parser.add_argument("--users", type=int, default=0, help="bulk-seed this many seed{i}@example.com users")
+    parser.add_argument("--tasks", type=int, default=0, help="bulk-seed this many tasks over the seeded users")
+    parser.add_argument("--password", default="seedpass", help="password of every seeded user")
+    args = parser.parse_args()
+    init()
+    if args.users:
+        seed(args.users, args.tasks, args.password)
+        print(f"Seeded {args.users} users and {args.tasks} tasks.")
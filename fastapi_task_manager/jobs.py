@@ -0,0 +1,436 @@
+"""Persistent background jobs: due-date reminders and other deferred work.
+
+Jobs are rows in the jobs table, so they survive restarts and are shared
+by every gunicorn worker. Request handlers enqueue with add_job (staged on
+their own session, committed with their writes) or job_queue.aenqueue,
+and return; the work happens later on the queue's worker coroutines.
+
+Each worker claims up to JOB_BATCH due jobs in one UPDATE, which stamps
+them with its lease token and locked_until = now + JOB_VISIBILITY_TIMEOUT
+(FOR UPDATE SKIP LOCKED on PostgreSQL; SQLite serializes the UPDATE). A
+handler that raises is retried with exponential backoff from
+JOB_RETRY_BASE_SECONDS until max_attempts, then the job is left as
+failed. A worker that dies mid-job just lets the lease expire and another
+one claims the job again; results are only recorded while the lease is
+still held, so a late finisher cannot overwrite the retry.
+
+Handlers are sync functions `fn(db, payload)` registered with @handler;
+they run in the threadpool with a fresh session.
+
+The scheduler coroutine scans for open tasks whose due_date has passed
+every JOB_SCAN_SECONDS, reading JOB_SCAN_BATCH rows at a time in
+(due_date, id) keyset order off the ix_tasks_done_due index, and queues
+one task_due job per task and due date. A task's reminded_due records
+the due date its reminder was queued for, so every scan picks up exactly
+the overdue tasks not yet reminded of their current due date, however
+late they were created or rescheduled into the past (within
+JOB_REMINDER_LOOKBACK); the dedupe key makes several workers scanning
+harmless. task_due publishes a
+"due" change-feed event to the task's owner. The same loop queues the
+PERIODIC jobs, such as the hourly user_task_stats reconciliation.
+"""
+import asyncio
+import datetime
+import json
+import logging
+import os
+import time
+import uuid
+from collections import Counter
+from typing import Callable, Dict, List, NamedTuple, Optional
+from sqlalchemy import and_, bindparam, create_engine, delete, func, insert, or_, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+import crud, database, metrics, models
+from feed import feed, task_data
+
+JOBS_ENABLED = os.getenv("JOBS_ENABLED", "1") == "1"
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_BATCH = int(os.getenv("JOB_BATCH", "10"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+# finished jobs are deleted after this long; failed ones are kept for inspection
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+JOB_SCAN_SECONDS = float(os.getenv("JOB_SCAN_SECONDS", "30"))
+JOB_SCAN_BATCH = int(os.getenv("JOB_SCAN_BATCH", "500"))
+# tasks that fell due longer ago than this are not reminded
+JOB_REMINDER_LOOKBACK = float(os.getenv("JOB_REMINDER_LOOKBACK", "86400"))
+STATS_RECONCILE_SECONDS = float(os.getenv("STATS_RECONCILE_SECONDS", "3600"))
+
+logger = logging.getLogger("jobs")
+
+HANDLERS: Dict[str, Callable] = {}
+# kind -> interval in seconds; queued once per interval by whichever worker scans first
+PERIODIC: Dict[str, float] = {"reconcile_task_stats": STATS_RECONCILE_SECONDS}
+
+
+def handler(kind: str):
+    """Register fn(db, payload) as the handler for jobs of `kind`."""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+class ClaimedJob(NamedTuple):
+    id: int
+    kind: str
+    payload: Optional[dict]
+    attempts: int
+    max_attempts: int
+    run_at: datetime.datetime
+    token: str
+
+
+def job_values(kind: str, payload=None, run_at: Optional[datetime.datetime] = None, key: Optional[str] = None,
+               max_attempts: int = JOB_MAX_ATTEMPTS) -> dict:
+    now = datetime.datetime.utcnow()
+    return {
+        "kind": kind,
+        "payload": None if payload is None else json.dumps(payload),
+        "key": key,
+        "status": "queued",
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "run_at": run_at or now,
+        "created_at": now,
+    }
+
+
+def add_job(db, kind: str, payload=None, run_at: Optional[datetime.datetime] = None, key: Optional[str] = None,
+            max_attempts: int = JOB_MAX_ATTEMPTS) -> models.Job:
+    """Stage a job on `db` (Session or AsyncSession); it is queued when the caller commits."""
+    job = models.Job(**job_values(kind, payload, run_at, key, max_attempts))
+    db.add(job)
+    metrics.JOBS_ENQUEUED.inc(kind=kind)
+    return job
+
+
+def insert_new(db, rows: List[dict]) -> int:
+    """Insert job rows, skipping those whose key is already queued; returns how many were added."""
+    if not rows:
+        return 0
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        dialect_insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = dialect_insert(models.Job).values(rows).on_conflict_do_nothing(index_elements=["key"])
+        return db.execute(stmt).rowcount
+    keys = [row["key"] for row in rows]
+    existing = set(db.scalars(select(models.Job.key).where(models.Job.key.in_(keys))))
+    fresh = [row for row in rows if row["key"] not in existing]
+    if fresh:
+        db.execute(insert(models.Job), fresh)
+    return len(fresh)
+
+
+def _ready(now):
+    Job = models.Job
+    return or_(and_(Job.status == "queued", Job.run_at <= now),
+               and_(Job.status == "running", Job.locked_until <= now))
+
+
+class JobQueue:
+    def __init__(self, session_factory, handlers: Optional[Dict[str, Callable]] = None,
+                 batch: int = JOB_BATCH, visibility_timeout: float = JOB_VISIBILITY_TIMEOUT,
+                 retry_base: float = JOB_RETRY_BASE_SECONDS, poll_seconds: float = JOB_POLL_SECONDS,
+                 scan_seconds: float = JOB_SCAN_SECONDS, scan_batch: int = JOB_SCAN_BATCH,
+                 lookback: float = JOB_REMINDER_LOOKBACK, clock=datetime.datetime.utcnow):
+        self.session_factory = session_factory
+        self.handlers = HANDLERS if handlers is None else handlers
+        self.batch = batch
+        self.visibility_timeout = visibility_timeout
+        self.retry_base = retry_base
+        self.poll_seconds = poll_seconds
+        self.scan_seconds = scan_seconds
+        self.scan_batch = scan_batch
+        self.lookback = lookback
+        self.clock = clock
+        self.outcomes = Counter()
+        self.lost_leases = 0
+        self.scanned = 0
+        self.reminders_queued = 0
+        self.last_scan_seconds = None
+        self._tasks = []
+        self._loop = None
+        self._wake = None
+        self._stopping = None
+
+    # ---- enqueue ----
+
+    def enqueue(self, kind: str, payload=None, delay: float = 0, key: Optional[str] = None,
+                max_attempts: int = JOB_MAX_ATTEMPTS) -> Optional[int]:
+        """Queue a job in its own transaction; returns its id, or None when `key` is already queued."""
+        run_at = self.clock() + datetime.timedelta(seconds=delay)
+        with self.session_factory() as db:
+            job = add_job(db, kind, payload, run_at, key, max_attempts)
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                return None
+            job_id = job.id
+        if not delay:
+            self.wake()
+        return job_id
+
+    async def aenqueue(self, kind: str, payload=None, delay: float = 0, key: Optional[str] = None,
+                       max_attempts: int = JOB_MAX_ATTEMPTS) -> Optional[int]:
+        return await run_in_threadpool(self.enqueue, kind, payload, delay, key, max_attempts)
+
+    # ---- claim / run ----
+
+    def claim(self, limit: Optional[int] = None) -> List[ClaimedJob]:
+        """Lease up to `limit` due jobs (including ones whose lease expired) to a new token."""
+        Job = models.Job
+        now = self.clock()
+        token = uuid.uuid4().hex
+        ids = (select(Job.id).where(_ready(now)).order_by(Job.run_at)
+               .limit(limit or self.batch).with_for_update(skip_locked=True))
+        with self.session_factory() as db:
+            db.execute(
+                update(Job).where(Job.id.in_(ids.scalar_subquery()), _ready(now))
+                .values(status="running", locked_by=token, attempts=Job.attempts + 1,
+                        locked_until=now + datetime.timedelta(seconds=self.visibility_timeout)),
+                execution_options={"synchronize_session": False},
+            )
+            rows = db.execute(
+                select(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts, Job.run_at)
+                .where(Job.locked_by == token).order_by(Job.run_at)
+            ).all()
+            db.commit()
+        return [ClaimedJob(id, kind, None if payload is None else json.loads(payload),
+                           attempts, max_attempts, run_at, token)
+                for id, kind, payload, attempts, max_attempts, run_at in rows]
+
+    def run_job(self, job: ClaimedJob) -> str:
+        """Run one claimed job's handler and record the outcome: done, retry or failed."""
+        metrics.JOB_LAG_SECONDS.observe(max((self.clock() - job.run_at).total_seconds(), 0.0), kind=job.kind)
+        if job.attempts > job.max_attempts:
+            # its last attempt timed out without reporting back
+            return self._finish(job, "failed", "visibility timeout expired")
+        fn = self.handlers.get(job.kind)
+        start = time.perf_counter()
+        try:
+            if fn is None:
+                raise LookupError(f"no handler for job kind {job.kind!r}")
+            with self.session_factory() as db:
+                fn(db, job.payload)
+        except Exception as exc:
+            logger.warning("job %s (%s) attempt %s/%s failed", job.id, job.kind, job.attempts, job.max_attempts,
+                           exc_info=True)
+            outcome = "failed" if job.attempts >= job.max_attempts else "retry"
+            return self._finish(job, outcome, f"{type(exc).__name__}: {exc}")
+        finally:
+            metrics.JOB_SECONDS.observe(time.perf_counter() - start, kind=job.kind)
+        return self._finish(job, "done")
+
+    def _finish(self, job: ClaimedJob, outcome: str, error: Optional[str] = None) -> str:
+        Job = models.Job
+        now = self.clock()
+        values = {"locked_by": None, "locked_until": None, "last_error": error}
+        if outcome == "retry":
+            values.update(status="queued",
+                          run_at=now + datetime.timedelta(seconds=self.retry_base * 2 ** (job.attempts - 1)))
+        else:
+            values.update(status=outcome, finished_at=now)
+        with self.session_factory() as db:
+            result = db.execute(update(Job).where(Job.id == job.id, Job.locked_by == job.token).values(**values),
+                                execution_options={"synchronize_session": False})
+            db.commit()
+        if result.rowcount == 0:
+            # the lease expired and another worker owns the job now
+            self.lost_leases += 1
+            logger.warning("job %s (%s) finished after its lease expired; result dropped", job.id, job.kind)
+        self.outcomes[outcome] += 1
+        metrics.JOBS_PROCESSED.inc(kind=job.kind, outcome=outcome)
+        return outcome
+
+    def run_pending(self) -> int:
+        """Claim and run due jobs until none are left; returns how many ran."""
+        ran = 0
+        while True:
+            claimed = self.claim()
+            if not claimed:
+                return ran
+            for job in claimed:
+                self.run_job(job)
+            ran += len(claimed)
+
+    # ---- scheduler ----
+
+    def scan_overdue(self) -> int:
+        """Queue a task_due job for open overdue tasks not yet reminded of their due date; returns how many."""
+        Task = models.Task
+        now = self.clock()
+        start = time.perf_counter()
+        after = (now - datetime.timedelta(seconds=self.lookback), 0)
+        mark = (Task.__table__.update()
+                .where(Task.id == bindparam("task_id"), Task.due_date == bindparam("due"))
+                .values(reminded_due=bindparam("due")))
+        queued = 0
+        with self.session_factory() as db:
+            while True:
+                rows = db.execute(
+                    select(Task.id, Task.due_date)
+                    .where(Task.is_done == False, Task.due_date <= now,  # noqa: E712  (index: is_done, due_date, id)
+                           tuple_(Task.due_date, Task.id) > tuple_(*after),
+                           or_(Task.reminded_due.is_(None), Task.reminded_due != Task.due_date))
+                    .order_by(Task.due_date, Task.id)
+                    .limit(self.scan_batch)
+                ).all()
+                if not rows:
+                    break
+                added = insert_new(db, [
+                    job_values("task_due", {"task_id": task_id, "due_date": due.isoformat()}, now,
+                               key=f"task_due:{task_id}:{due.isoformat()}")
+                    for task_id, due in rows
+                ])
+                # in the same transaction as the jobs; a task rescheduled meanwhile keeps its new date unreminded
+                db.connection().execute(mark, [{"task_id": task_id, "due": due} for task_id, due in rows])
+                db.commit()
+                metrics.JOBS_ENQUEUED.inc(added, kind="task_due")
+                queued += added
+                self.scanned += len(rows)
+                after = (rows[-1].due_date, rows[-1].id)
+                if len(rows) < self.scan_batch:
+                    break
+        self.reminders_queued += queued
+        self.last_scan_seconds = time.perf_counter() - start
+        if queued:
+            self.wake()
+        return queued
+
+    def enqueue_periodic(self) -> int:
+        """Queue each PERIODIC job once per interval (keyed by interval number, so workers agree)."""
+        now = self.clock()
+        epoch = (now - datetime.datetime(1970, 1, 1)).total_seconds()
+        rows = [job_values(kind, None, now, key=f"{kind}:{int(epoch // interval)}")
+                for kind, interval in PERIODIC.items() if interval > 0]
+        with self.session_factory() as db:
+            added = insert_new(db, rows)
+            db.commit()
+        if added:
+            self.wake()
+        return added
+
+    def purge(self) -> int:
+        """Delete jobs that finished more than JOB_RETENTION_SECONDS ago."""
+        Job = models.Job
+        cutoff = self.clock() - datetime.timedelta(seconds=JOB_RETENTION_SECONDS)
+        with self.session_factory() as db:
+            result = db.execute(delete(Job).where(Job.status == "done", Job.finished_at < cutoff),
+                                execution_options={"synchronize_session": False})
+            db.commit()
+        return result.rowcount
+
+    # ---- worker coroutines ----
+
+    def wake(self):
+        """Tell idle workers there is work now instead of at their next poll; safe from any thread."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _idle(self, seconds: float):
+        try:
+            await asyncio.wait_for(self._wake.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+    async def _work(self):
+        while not self._stopping.is_set():
+            try:
+                claimed = await run_in_threadpool(self.claim)
+                for job in claimed:
+                    await run_in_threadpool(self.run_job, job)
+            except Exception:
+                logger.exception("job worker error")
+                claimed = []
+            if not claimed:
+                await self._idle(self.poll_seconds)
+
+    async def _schedule(self):
+        while not self._stopping.is_set():
+            try:
+                await run_in_threadpool(self.scan_overdue)
+                await run_in_threadpool(self.enqueue_periodic)
+                await run_in_threadpool(self.purge)
+            except Exception:
+                logger.exception("job scheduler error")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.scan_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self, workers: int = JOB_WORKERS, scheduler: bool = True):
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(workers)]
+        if scheduler:
+            self._tasks.append(asyncio.create_task(self._schedule()))
+
+    async def stop(self, timeout: float = 5):
+        """Let running jobs finish (up to `timeout`); unfinished ones are retried after their lease expires."""
+        if not self._tasks:
+            return
+        self._stopping.set()
+        self._wake.set()
+        _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        self._tasks = []
+        self._loop = None
+
+    def stats(self) -> dict:
+        Job = models.Job
+        with self.session_factory() as db:
+            depth = dict(db.execute(select(Job.status, func.count()).group_by(Job.status)).all())
+        return {
+            "workers": len(self._tasks),
+            "depth": depth,
+            "outcomes": dict(self.outcomes),
+            "lost_leases": self.lost_leases,
+            "tasks_scanned": self.scanned,
+            "reminders_queued": self.reminders_queued,
+            "last_scan_ms": None if self.last_scan_seconds is None else round(self.last_scan_seconds * 1000, 2),
+        }
+
+
+@handler("task_due")
+def remind_due_task(db, payload):
+    task = db.get(models.Task, payload["task_id"])
+    if task is None or task.is_done or task.due_date is None or task.due_date.isoformat() != payload["due_date"]:
+        return  # deleted, finished or rescheduled since it was queued
+    feed.publish("due", task.owner_id, task_data(task))
+
+
+@handler("reconcile_task_stats")
+def reconcile_task_stats(db, payload):
+    drifted = crud.reconcile_task_stats(db)
+    if drifted:
+        logger.warning("user_task_stats: corrected counters for %s owners", drifted)
+
+
+def _sessions():
+    if not database.IS_ASYNC:
+        return database.SessionLocal
+    # Handlers run in the threadpool, so async mode gets a small sync engine
+    # on the same database (the dialect's default driver must be installed).
+    url = make_url(database.DATABASE_URL)
+    url = url.set(drivername=url.get_backend_name()).render_as_string(hide_password=False)
+    bind = create_engine(url, **database.engine_options(url))
+    if database.is_sqlite_file(url) and database.SQLITE_PRAGMAS:
+        database.tune_sqlite(bind)
+    metrics.instrument_engine(bind)
+    return sessionmaker(autocommit=False, autoflush=False, bind=bind)
+
+
+job_queue = JobQueue(_sessions()) if JOBS_ENABLED else None
@@ -1,16 +1,23 @@
 import logging
-from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Depends, Header, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-import models, schemas, crud
-from database import engine, Base, get_db
-from typing import List, Optional
+import models, schemas, crud, search, hashing, bulk, export, metrics, serialization, ratelimit
+from crud_async import call
+from pagination import next_cursor
+from identity_cache import identity_cache
+from response_cache import response_cache
+from feed import feed, format_sse
+from database import engine, Base, get_db, get_async_db, create_schema_async, IS_ASYNC, AUTO_CREATE_SCHEMA
+from writer import write_queue
+from routing import current_user_id, router
+from jobs import job_queue
+from starlette.concurrency import run_in_threadpool
+from typing import List, Literal, Optional
 import os
 from datetime import datetime, timedelta
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
-from jose import JWTError, jwt
 
 # simple settings (for demo); in production read from env vars / secrets manager
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -18,17 +25,100 @@ if os.getenv("ENV","development") == "production" and not SECRET_KEY:
     raise RuntimeError("SECRET_KEY environment variable is required in production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60*24*7  # 7 days
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend")
 
-Base.metadata.create_all(bind=engine)
+# With AUTO_CREATE_SCHEMA=0 importing this module does no I/O (Alembic owns the schema)
+if AUTO_CREATE_SCHEMA and not IS_ASYNC:
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        search.install(conn)
 
-app = FastAPI(title="FastAPI Task Manager (Portfolio-ready)")
+# Sessions come from the async engine when DATABASE_URL names an async driver
+get_session = get_async_db if IS_ASYNC else get_db
 
-# Serve static files from 'frontend' directory
-app.mount("/frontend", StaticFiles(directory="frontend"), name="frontend")
+app = FastAPI(title="FastAPI Task Manager (Portfolio-ready)", default_response_class=serialization.FastJSONResponse)
+
+def warm_up():
+    """Do the imports and setup that are otherwise deferred to the first request.
+
+    gunicorn.conf.py calls this in the master (preload_app) so forked workers
+    start warm; imports of main alone, in tests and scripts, skip the cost.
+    Finally everything allocated so far is frozen out of the cyclic GC: the
+    first full collection no longer stalls a request scanning it, and
+    workers do not copy those pages by touching their GC headers.
+    """
+    import gc
+    import jose.jwt  # noqa: F401
+
+    hashing.context()
+    gc.freeze()
+
+def rate_limit_key(scope) -> str:
+    """Bucket key for ratelimit.py: the token's user when it verifies, else the client IP."""
+    for name, value in scope["headers"]:
+        if name == b"authorization" and value[:7].lower() == b"bearer ":
+            from jose import JWTError, jwt
+
+            try:
+                email = jwt.decode(value[7:].decode("latin-1"), SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+            except JWTError:
+                break
+            if email:
+                return "user:" + email
+            break
+    return ratelimit.client_ip(scope)
+
+# added first so MetricsMiddleware (outermost) also counts the 429s/503s
+if ratelimit.RATE_LIMIT_ENABLED:
+    app.add_middleware(ratelimit.RateLimitMiddleware, key_func=rate_limit_key)
+app.add_middleware(metrics.MetricsMiddleware)
+
+@app.on_event("startup")
+async def create_async_schema():
+    if IS_ASYNC and AUTO_CREATE_SCHEMA:
+        await create_schema_async()
+
+@app.on_event("startup")
+def start_feed():
+    feed.start()
+
+@app.on_event("startup")
+async def start_jobs():
+    if job_queue is not None:
+        await job_queue.start()
+
+@app.on_event("shutdown")
+async def stop_jobs():
+    if job_queue is not None:
+        await job_queue.stop()
+
+@app.on_event("shutdown")
+def stop_hash_pool():
+    hashing.pool.shutdown()
+
+@app.on_event("shutdown")
+def stop_feed():
+    feed.stop()
+
+@app.on_event("shutdown")
+def stop_write_queue():
+    if write_queue is not None:
+        write_queue.stop()
+
+@app.exception_handler(hashing.HashingBusy)
+async def hashing_busy_handler(request: Request, exc: hashing.HashingBusy):
+    return JSONResponse(status_code=429, content={"detail": "Too many password operations, retry shortly"},
+                        headers={"Retry-After": "1"})
+
+# Serve static files from 'frontend' next to this file, whatever the working directory
+app.mount("/frontend", StaticFiles(directory=FRONTEND_DIR), name="frontend")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    from jose import jwt
+
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -37,7 +127,9 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_session)):
+    from jose import JWTError, jwt
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -50,54 +142,186 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = crud.get_user_by_email(db, email=email)
+    user = await identity_cache.aget(email)
     if user is None:
-        raise credentials_exception
+        db_user = await call(crud.get_user_by_email, db, email=email)
+        if db_user is None:
+            raise credentials_exception
+        user = schemas.UserOut(id=db_user.id, name=db_user.name, email=db_user.email)
+        await identity_cache.aset(user)
+    # lets routing keep this user's reads on the primary after their writes
+    current_user_id.set(user.id)
     return user
 
+# Public endpoints that still honour a valid token (read-your-writes routing)
+async def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme), db=Depends(get_session)):
+    if not token:
+        return None
+    try:
+        return await get_current_user(token, db)
+    except HTTPException:
+        return None
+
 @app.post("/register", response_model=schemas.UserOut, summary="Register a new user")
-def register(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
-    existing = crud.get_user_by_email(db, user_in.email)
+async def register(user_in: schemas.UserCreate, db=Depends(get_session)):
+    existing = await call(crud.get_user_by_email, db, user_in.email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
-    user = crud.create_user(db, user_in)
+    user = await call(crud.create_user, db, user_in)
     return user
 
 @app.post("/token", summary="Get access token")
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = crud.authenticate_user(db, form_data.username, form_data.password)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get_session)):
+    user = await call(crud.authenticate_user, db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
     access_token = create_access_token(data={"sub": user.email}, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     return {"access_token": access_token, "token_type": "bearer"}
 
 # Public: list tasks (with optional query)
+# Pages are ordered by (created_at, id). Pass the X-Next-Cursor header of a
+# response back as `cursor` to fetch the next page without OFFSET.
+# Searches (q) are ranked by relevance and paged with skip/limit.
+# Responses carry an ETag; send it back in If-None-Match to get 304 when nothing changed.
 @app.get("/tasks", response_model=List[schemas.TaskOut], summary="List tasks")
-def list_tasks(skip: int = 0, limit: int = 100, q: Optional[str] = None, db: Session = Depends(get_db)):
-    return crud.get_tasks(db, skip=skip, limit=limit, q=q)
+async def list_tasks(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    q: Optional[str] = None,
+    is_done: Optional[bool] = None,
+    owner_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db=Depends(get_session),
+    user: Optional[schemas.UserOut] = Depends(get_optional_user),
+):
+    # users inside their read-your-writes window must not get an entry read from a lagging replica
+    primary = bool(user) and await router.ais_sticky(user.id)
+    key = response_cache.key(skip=skip, limit=limit, q=q, is_done=is_done, owner_id=owner_id, cursor=cursor,
+                             primary=primary)
+    # read the version before querying so a concurrent write makes this entry stale
+    version = await response_cache.aversion(response_cache.scope(owner_id))
+    entry = response_cache.lookup(key, version)
+    if entry is None:
+        try:
+            # column tuples, encoded without building ORM objects or TaskOut models
+            rows = await call(crud.get_task_rows, db, skip=skip, limit=limit, q=q,
+                              is_done=is_done, owner_id=owner_id, cursor=cursor)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        nxt = None if q else next_cursor(rows, limit)
+        headers = {"X-Next-Cursor": nxt} if nxt else {}
+        entry = response_cache.store(key, version, serialization.render_rows(rows), headers)
+    return response_cache.respond(entry, request.headers.get("if-none-match"))
 
 # Protected: create task (assigns owner)
 @app.post("/tasks", response_model=schemas.TaskOut, summary="Create task")
-def create_task(task_in: schemas.TaskCreate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    return crud.create_task(db, task_in, owner_id=current_user.id)
+async def create_task(task_in: schemas.TaskCreate, current_user: schemas.UserOut = Depends(get_current_user), db=Depends(get_session)):
+    return await call(crud.create_task, db, current_user.id, task_in)
+
+@app.get("/tasks/export", summary="Export tasks as NDJSON or CSV")
+async def export_tasks(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    q: Optional[str] = None,
+    is_done: Optional[bool] = None,
+    owner_id: Optional[int] = None,
+    user: Optional[schemas.UserOut] = Depends(get_optional_user),
+):
+    filters = {"q": q, "is_done": is_done, "owner_id": owner_id}
+    user_id = user.id if user else None
+    sessions = router.read_sessionmaker(user_id, sticky=await router.ais_sticky(user_id))
+    if IS_ASYNC:
+        body = export.stream_async(sessions, format, **filters)
+    else:
+        body = export.stream_sync(sessions, format, **filters)
+    return StreamingResponse(body, media_type=export.MEDIA_TYPES[format],
+                             headers={"Content-Disposition": f'attachment; filename="tasks.{format}"'})
+
+# Change feed: created/updated/deleted/changed/reset events for task writes.
+# EventSource clients resume with Last-Event-ID (or ?last_event_id=); see feed.py.
+@app.get("/tasks/stream", summary="Stream task changes (Server-Sent Events)")
+async def stream_tasks(
+    owner_id: Optional[int] = None,
+    last_event_id: Optional[int] = None,
+    last_event_id_header: Optional[int] = Header(None, alias="Last-Event-ID"),
+):
+    resume = last_event_id_header if last_event_id_header is not None else last_event_id
+
+    async def frames():
+        yield "retry: 3000\n\n"
+        async for event in feed.events(owner_id, resume):
+            yield format_sse(event)
+
+    return StreamingResponse(frames(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/tasks/stream")
+async def stream_tasks_ws(websocket: WebSocket, owner_id: Optional[int] = None, last_event_id: Optional[int] = None):
+    await websocket.accept()
+    try:
+        async for event in feed.events(owner_id, last_event_id):
+            await websocket.send_text(event.to_json() if event else '{"type":"ping"}')
+    except WebSocketDisconnect:
+        pass
+
+# Bulk endpoints take a JSON array or NDJSON and report a result per item.
+# They are declared before /tasks/{task_id} so "bulk" is not read as an id.
+@app.post("/tasks/bulk", response_model=schemas.BulkResult, summary="Create many tasks",
+          openapi_extra=bulk.openapi_body({"$ref": "#/components/schemas/TaskCreate"}))
+async def create_tasks_bulk(request: Request, current_user: schemas.UserOut = Depends(get_current_user), db=Depends(get_session)):
+    valid, results = bulk.validate(await bulk.read_items(request), schemas.TaskCreate)
+    ids = await call(crud.create_tasks_bulk, db, current_user.id, [task for _, task in valid])
+    results += [schemas.BulkItemResult(index=i, id=task_id, status="created") for (i, _), task_id in zip(valid, ids)]
+    return bulk.report(results)
+
+@app.patch("/tasks/bulk", response_model=schemas.BulkResult, summary="Update many tasks",
+           openapi_extra=bulk.openapi_body({"type": "object", "description": "TaskPatch: id plus fields to change"}))
+async def update_tasks_bulk(request: Request, current_user: schemas.UserOut = Depends(get_current_user), db=Depends(get_session)):
+    valid, results = bulk.validate(await bulk.read_items(request), schemas.TaskPatch)
+    patches = []
+    for index, patch in valid:
+        values = patch.dict(exclude_unset=True)
+        values.pop("id")
+        if values.get("title", "") is None:
+            results.append(schemas.BulkItemResult(index=index, id=patch.id, status="invalid", error="title cannot be null"))
+        else:
+            patches.append((index, patch.id, values))
+    found = await call(crud.update_tasks_bulk, db, current_user.id, [(task_id, values) for _, task_id, values in patches])
+    results += [schemas.BulkItemResult(index=i, id=task_id, status="updated" if task_id in found else "not_found")
+                for i, task_id, _ in patches]
+    return bulk.report(results)
+
+@app.delete("/tasks/bulk", response_model=schemas.BulkResult, summary="Delete many tasks",
+            openapi_extra=bulk.openapi_body({"type": "integer"}))
+async def delete_tasks_bulk(request: Request, current_user: schemas.UserOut = Depends(get_current_user), db=Depends(get_session)):
+    valid, results = bulk.task_ids(await bulk.read_items(request))
+    deleted = await call(crud.delete_tasks_bulk, db, current_user.id, [task_id for _, task_id in valid])
+    results += [schemas.BulkItemResult(index=i, id=task_id, status="deleted" if task_id in deleted else "not_found")
+                for i, task_id in valid]
+    return bulk.report(results)
+
+# open/done come from the user_task_stats counters, overdue from an index range count
+@app.get("/users/me/stats", response_model=schemas.TaskStats, summary="Task counts for the current user")
+async def my_task_stats(current_user: schemas.UserOut = Depends(get_current_user), db=Depends(get_session)):
+    return await call(crud.get_task_stats, db, current_user.id)
 
 @app.put("/tasks/{task_id}", response_model=schemas.TaskOut, summary="Update a task")
-def update_task(task_id: int, task_in: schemas.TaskUpdate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def update_task(task_id: int, task_in: schemas.TaskUpdate, current_user: schemas.UserOut = Depends(get_current_user), db=Depends(get_session)):
     # ensure user owns the task
-    task = crud.get_task(db, task_id)
+    task = await call(crud.get_task, db, task_id)
     if not task or task.owner_id != current_user.id:
         raise HTTPException(status_code=404, detail="Task not found or not yours")
-    updated = crud.update_task(db, task_id, task_in)
+    updated = await call(crud.update_task, db, task_id, task_in)
     if not updated:
         raise HTTPException(status_code=404, detail="Task not found")
     return updated
 
 @app.delete("/tasks/{task_id}", summary="Delete a task")
-def delete_task(task_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    task = crud.get_task(db, task_id)
+async def delete_task(task_id: int, current_user: schemas.UserOut = Depends(get_current_user), db=Depends(get_session)):
+    task = await call(crud.get_task, db, task_id)
     if not task or task.owner_id != current_user.id:
         raise HTTPException(status_code=404, detail="Task not found or not yours")
-    ok = crud.delete_task(db, task_id)
+    ok = await call(crud.delete_task, db, task_id)
     if not ok:
         raise HTTPException(status_code=404, detail="Task not found")
     return {"detail": "Task deleted"}
@@ -105,7 +329,7 @@ def delete_task(task_id: int, current_user: models.User = Depends(get_current_us
 # keep a simple root that points to frontend index if present
 @app.get("/", include_in_schema=False)
 def root():
-    index = os.path.join("frontend", "index.html")
+    index = os.path.join(FRONTEND_DIR, "index.html")
     if os.path.exists(index):
         return FileResponse(index)
     return {"msg": "FastAPI Task Manager. Visit /docs for API"}
@@ -114,3 +338,51 @@ def root():
 @app.get('/health', tags=['health'])
 async def health():
     return {"status":"ok"}
+
+
+# per-worker counters for the authenticated-user cache
+@app.get('/health/identity-cache', tags=['health'])
+async def identity_cache_stats():
+    return identity_cache.stats()
+
+
+# per-worker counters for the GET /tasks response cache
+@app.get('/health/response-cache', tags=['health'])
+async def response_cache_stats():
+    return response_cache.stats()
+
+
+# per-worker counters for the task change feed
+@app.get('/health/feed', tags=['health'])
+async def feed_stats():
+    return feed.stats()
+
+
+# Prometheus text format; latency, SQL, pool and bcrypt metrics for this worker
+@app.get('/metrics', tags=['health'], response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# group-commit counters for the SQLite write queue (null when it is off)
+@app.get('/health/write-queue', tags=['health'])
+async def write_queue_stats():
+    return write_queue.stats() if write_queue is not None else None
+
+
+# replica/primary read counts for this worker
+@app.get('/health/replicas', tags=['health'])
+async def replica_stats():
+    return router.stats()
+
+
+# background job queue depth and outcomes (null when JOBS_ENABLED=0)
+@app.get('/health/jobs', tags=['health'])
+async def job_stats():
+    return await run_in_threadpool(job_queue.stats) if job_queue is not None else None
+
+
+# token-bucket and admission-control counters for this worker
+@app.get('/health/rate-limit', tags=['health'])
+async def rate_limit_stats():
+    return {"buckets": ratelimit.rate_limiter.stats(), "admission": ratelimit.admission_control.stats()}
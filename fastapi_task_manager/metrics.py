@@ -0,0 +1,311 @@
+"""Request, SQL, pool and bcrypt instrumentation exposed on GET /metrics.
+
+MetricsMiddleware times every HTTP request under its route template
+(/tasks/{task_id}, not /tasks/17) and keeps a per-request RequestStats in a
+context variable. The SQLAlchemy hooks installed by instrument_engine add
+each statement and its duration to it; contextvars follow run_in_threadpool
+and the async engine's greenlets, so sync and async sessions are both
+counted, and writer.py runs each queued write under the stats of the
+request that submitted it. Pooled connections in use and how long each
+checkout is held (pool checkout/checkin events), bcrypt calls (hashing.py)
+and background jobs (jobs.py) feed their own counters and histograms.
+SQLAlchemy has no event before a checkout starts waiting, so pool waits
+show as db_pool_connections_in_use sitting at the pool's size.
+
+Set SLOW_REQUEST_MS to log requests slower than that with their queries,
+identical statements grouped, so an N+1 (say a lazy-loaded Task.owner)
+shows up as one statement repeated N times.
+
+Metrics are per process, in the Prometheus text format; with several
+gunicorn workers each one is scraped (or aggregated) separately.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+SLOW_REQUEST_MAX_QUERIES = int(os.getenv("SLOW_REQUEST_MAX_QUERIES", "200"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+logger = logging.getLogger("metrics")
+
+REGISTRY = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labels
+        self._values: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels[name] for name in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, tuple(zip(self.labelnames, key)), value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, pairs, value in self.samples():
+            lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self, **labels) -> Optional[dict]:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return None if state is None else {"buckets": list(state[0]), "sum": state[1], "count": state[2]}
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._values.items()]
+        for key, (counts, total, count) in items:
+            pairs = tuple(zip(self.labelnames, key))
+            for bound, n in zip(self.buckets, counts):
+                yield self.name + "_bucket", pairs + (("le", _number(bound)),), n
+            yield self.name + "_sum", pairs, total
+            yield self.name + "_count", pairs, count
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route"))
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served.")
+REQUEST_QUERIES = Histogram("http_request_db_queries", "SQL statements per HTTP request.",
+                            ("method", "route"), buckets=COUNT_BUCKETS)
+REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", "Time in SQL per HTTP request.", ("method", "route"))
+QUERY_SECONDS = Histogram("db_query_duration_seconds", "SQL statement latency.", buckets=QUERY_BUCKETS)
+POOL_IN_USE = Gauge("db_pool_connections_in_use", "Pooled connections checked out.")
+POOL_HOLD_SECONDS = Histogram("db_pool_connection_hold_seconds", "Time a pooled connection stays checked out.",
+                              buckets=QUERY_BUCKETS + (0.5, 1.0, 2.5))
+BCRYPT_SECONDS = Histogram("bcrypt_duration_seconds", "bcrypt hash/verify time, including hash pool queueing.",
+                           ("op",))
+REQUESTS_REJECTED = Counter("http_requests_rejected_total",
+                            "Requests turned away by ratelimit.py (rate_limited=429, overloaded=503).", ("reason",))
+ADMISSION_WAIT_SECONDS = Histogram("http_admission_wait_seconds", "Time queued for an admission slot.",
+                                   buckets=QUERY_BUCKETS + (0.5, 1.0, 2.5))
+JOBS_ENQUEUED = Counter("jobs_enqueued_total", "Background jobs enqueued.", ("kind",))
+JOBS_PROCESSED = Counter("jobs_processed_total", "Background job attempts by outcome (done/retry/failed).",
+                         ("kind", "outcome"))
+JOB_SECONDS = Histogram("job_duration_seconds", "Background job handler time.", ("kind",))
+JOB_LAG_SECONDS = Histogram("job_lag_seconds", "Delay between a job becoming due and a worker starting it.",
+                            ("kind",))
+
+
+class RequestStats:
+    __slots__ = ("queries", "query_count", "db_seconds")
+
+    def __init__(self):
+        self.queries = []
+        self.query_count = 0
+        self.db_seconds = 0.0
+
+    def add(self, statement: str, seconds: float):
+        self.query_count += 1
+        self.db_seconds += seconds
+        if len(self.queries) < SLOW_REQUEST_MAX_QUERIES:
+            self.queries.append((statement, seconds))
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+# ========================
+# SQLALCHEMY HOOKS
+# ========================
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("metrics_started")
+    if not started:
+        return
+    seconds = time.perf_counter() - started.pop()
+    QUERY_SECONDS.observe(seconds)
+    stats = current_request.get()
+    if stats is not None:
+        stats.add(statement, seconds)
+
+
+def _on_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("metrics_started"):
+        conn.info["metrics_started"].pop()
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info["metrics_checkout"] = time.perf_counter()
+    POOL_IN_USE.inc()
+
+
+def _on_checkin(dbapi_connection, connection_record):
+    started = connection_record.info.pop("metrics_checkout", None)
+    if started is not None:
+        POOL_IN_USE.dec()
+        POOL_HOLD_SECONDS.observe(time.perf_counter() - started)
+
+
+def _on_detach(dbapi_connection, connection_record):
+    # a detached connection never comes back through checkin
+    if connection_record.info.pop("metrics_checkout", None) is not None:
+        POOL_IN_USE.dec()
+
+
+def instrument_engine(engine):
+    """Count statements and pooled connections for a sync Engine or an AsyncEngine."""
+    from sqlalchemy import event
+
+    engine = getattr(engine, "sync_engine", engine)
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+    event.listen(engine, "handle_error", _on_error)
+    event.listen(engine.pool, "checkout", _on_checkout)
+    event.listen(engine.pool, "checkin", _on_checkin)
+    event.listen(engine.pool, "detach", _on_detach)
+    return engine
+
+
+# ========================
+# ASGI MIDDLEWARE
+# ========================
+
+def route_template(scope) -> str:
+    route = scope.get("route")
+    if route is None:
+        from starlette.routing import Match
+
+        for candidate in getattr(scope.get("app"), "routes", ()):
+            if candidate.matches(scope)[0] == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+def _one_line(statement: str, width: int = 240) -> str:
+    text = re.sub(r"\s+", " ", statement).strip()
+    return text if len(text) <= width else text[:width - 3] + "..."
+
+
+def log_slow_request(method: str, route: str, seconds: float, stats: RequestStats):
+    totals: Dict[str, list] = {}
+    for statement, query_seconds in stats.queries:
+        entry = totals.setdefault(statement, [0, 0.0])
+        entry[0] += 1
+        entry[1] += query_seconds
+    lines = [f"slow request {method} {route} {seconds * 1000:.1f}ms, "
+             f"{stats.query_count} queries in {stats.db_seconds * 1000:.1f}ms"]
+    for statement, (count, query_seconds) in sorted(totals.items(), key=lambda kv: -kv[1][1]):
+        lines.append(f"  {count:>4}x {query_seconds * 1000:8.1f}ms  {_one_line(statement)}")
+    if stats.query_count > len(stats.queries):
+        lines.append(f"  ... {stats.query_count - len(stats.queries)} more not recorded")
+    logger.warning("\n".join(lines))
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            seconds = time.perf_counter() - start
+            IN_FLIGHT.dec()
+            current_request.reset(token)
+            method, route = scope["method"], route_template(scope)
+            REQUESTS.inc(method=method, route=route, status=status)
+            REQUEST_SECONDS.observe(seconds, method=method, route=route)
+            REQUEST_QUERIES.observe(stats.query_count, method=method, route=route)
+            REQUEST_DB_SECONDS.observe(stats.db_seconds, method=method, route=route)
+            if SLOW_REQUEST_MS and seconds * 1000 >= SLOW_REQUEST_MS:
+                log_slow_request(method, route, seconds, stats)
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
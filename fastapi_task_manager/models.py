@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from database import Base
 import datetime
@@ -19,6 +19,47 @@ class Task(Base):
     is_done = Column(Boolean, default=False)
     due_date = Column(DateTime, nullable=True)
     owner_id = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    # the due_date a task_due reminder was last queued for (jobs.py)
+    reminded_due = Column(DateTime, nullable=True)
+
+    owner = relationship("User", back_populates="tasks")
+
+    __table_args__ = (
+        # keyset pagination: filtered pages are range scans in (created_at, id) order
+        Index("ix_tasks_owner_done_created_id", "owner_id", "is_done", "created_at", "id"),
+        Index("ix_tasks_created_id", "created_at", "id"),
+        # due-date scan in jobs.py: open tasks in (due_date, id) order
+        Index("ix_tasks_done_due", "is_done", "due_date", "id"),
+        # overdue count for GET /users/me/stats
+        Index("ix_tasks_owner_done_due", "owner_id", "is_done", "due_date"),
+    )
+
+class UserTaskStats(Base):
+    """Per-owner task counters, kept in step with tasks by crud (see crud.count_task_changes)."""
+    __tablename__ = "user_task_stats"
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    open_count = Column(Integer, nullable=False, default=0)
+    done_count = Column(Integer, nullable=False, default=0)
+
+class Job(Base):
+    """Background job row; see jobs.py for the queue protocol."""
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    payload = Column(Text)  # JSON
+    key = Column(String(200))  # dedupe key; NULL for jobs that may repeat
+    status = Column(String(10), nullable=False, default="queued")  # queued / running / done / failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    locked_by = Column(String(32))
+    locked_until = Column(DateTime)
+    last_error = Column(Text)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    finished_at = Column(DateTime)
 
-    owner = relationship("User", back_populates="tasks")
\ No newline at end of file
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+        Index("ix_jobs_key", "key", unique=True),
+    )
@@ -0,0 +1,32 @@
+"""Opaque keyset cursors for GET /tasks.
+
+A cursor encodes the (created_at, id) of the last row on a page; the next
+page starts strictly after it, so deep pages cost the same as the first.
+"""
+import base64
+import datetime
+import json
+from typing import Tuple
+
+
+def encode_cursor(created_at: datetime.datetime, task_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), task_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    """Return (created_at, id); raises ValueError for anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, task_id = json.loads(raw)
+        return datetime.datetime.fromisoformat(created_at), int(task_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def next_cursor(tasks, limit: int):
+    """Cursor for the page after `tasks`, or None when this was the last page."""
+    if not tasks or len(tasks) < limit:
+        return None
+    last = tasks[-1]
+    return encode_cursor(last.created_at, last.id)
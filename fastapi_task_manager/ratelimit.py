@@ -0,0 +1,267 @@
+"""Per-client rate limiting and admission control (RateLimitMiddleware).
+
+Every API request spends tokens from its client's bucket: the user named
+in a valid bearer token, otherwise the client IP. Buckets hold
+RATE_LIMIT_BURST tokens and refill at RATE_LIMIT_PER_SECOND. Routes cost
+ROUTE_COSTS tokens (1 by default): bcrypt routes and exports cost the
+most, and a GET /tasks with ?q= costs SEARCH_COST. An empty bucket gets
+429 with Retry-After set to when enough tokens will be back.
+
+Admitted requests then take one of ADMISSION_MAX_CONCURRENCY slots in this
+worker (default: the DB pool size plus overflow). When all are busy, up to
+ADMISSION_QUEUE_SIZE requests wait for ADMISSION_QUEUE_TIMEOUT_MS; the rest,
+and those that time out, get 503 (ADMISSION_MAX_CONCURRENCY=0 turns this
+off). So under overload requests fail fast instead of piling up on the
+pool's checkout timeout. The change-feed stream holds no slot, and health,
+metrics, docs and static files are exempt.
+
+Buckets are per process unless RATE_LIMIT_URL points at Redis, where one
+Lua script per request keeps them shared (and atomic) across workers.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, NamedTuple, Optional
+from urllib.parse import parse_qs
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+import database, metrics
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "10"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "40"))
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL")
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY",
+                                          str(database.POOL_SIZE + database.MAX_OVERFLOW)))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "1000"))
+
+ROUTE_COSTS = {
+    ("POST", "/token"): 10,
+    ("POST", "/register"): 10,
+    ("GET", "/tasks/export"): 10,
+    ("POST", "/tasks/bulk"): 5,
+    ("PATCH", "/tasks/bulk"): 5,
+    ("DELETE", "/tasks/bulk"): 5,
+}
+SEARCH_COST = 5
+
+EXEMPT_ROUTES = {"/", "/health", "/metrics", "/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json",
+                 "/frontend"}
+# long-lived responses that would hold an admission slot for their whole life
+UNSLOTTED_ROUTES = {"/tasks/stream"}
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    remaining: float
+    retry_after: float  # seconds until `cost` tokens are available again
+
+
+def route_cost(method: str, route: str, query_string: bytes = b"") -> float:
+    if method == "GET" and route == "/tasks" and parse_qs(query_string.decode("latin-1")).get("q"):
+        return SEARCH_COST
+    return ROUTE_COSTS.get((method, route), 1)
+
+
+def client_ip(scope) -> str:
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+class MemoryBuckets:
+    """Token buckets in a bounded LRU; a dropped bucket just comes back full."""
+    local = True
+
+    def __init__(self, maxsize: int = 100000, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, cost: float, rate: float, burst: float) -> Decision:
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return Decision(allowed, tokens, 0.0 if allowed else (cost - tokens) / rate)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# KEYS[1] bucket hash; ARGV rate, burst, cost. Uses the server clock so all workers agree.
+TAKE_SCRIPT = """
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBuckets:
+    """Token buckets shared between workers; any client with Redis' register_script."""
+    local = False
+
+    def __init__(self, client, prefix: str = "ratelimit:"):
+        self.prefix = prefix
+        self._take = client.register_script(TAKE_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str):
+        import redis
+
+        return cls(redis.Redis.from_url(url, socket_timeout=0.25, decode_responses=True))
+
+    def take(self, key: str, cost: float, rate: float, burst: float) -> Decision:
+        allowed, tokens = self._take(keys=[self.prefix + key], args=[rate, burst, cost])
+        tokens = float(tokens)
+        return Decision(bool(int(allowed)), tokens, 0.0 if allowed else (cost - tokens) / rate)
+
+
+class RateLimiter:
+    def __init__(self, backend=None, rate: float = RATE_LIMIT_PER_SECOND, burst: float = RATE_LIMIT_BURST):
+        self.backend = backend if backend is not None else MemoryBuckets()
+        self.rate = rate
+        self.burst = burst
+        self.allowed = 0
+        self.limited = 0
+
+    def take(self, key: str, cost: float = 1) -> Decision:
+        decision = self.backend.take(key, cost, self.rate, self.burst)
+        if decision.allowed:
+            self.allowed += 1
+        else:
+            self.limited += 1
+        return decision
+
+    async def atake(self, key: str, cost: float = 1) -> Decision:
+        if self.backend.local:
+            return self.take(key, cost)
+        return await run_in_threadpool(self.take, key, cost)
+
+    def stats(self) -> dict:
+        return {"rate": self.rate, "burst": self.burst, "allowed": self.allowed, "limited": self.limited,
+                "shared": not self.backend.local}
+
+
+class ConcurrencyLimiter:
+    """At most `limit` requests at once, `queue_size` more waiting up to `timeout` seconds.
+
+    Used from one event loop; the waiters are plain futures so it is not
+    tied to the loop it was created on.
+    """
+
+    def __init__(self, limit: int = ADMISSION_MAX_CONCURRENCY, queue_size: int = ADMISSION_QUEUE_SIZE,
+                 timeout: float = ADMISSION_QUEUE_TIMEOUT_MS / 1000):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.in_flight = 0
+        self.shed = 0
+        self._waiters = deque()
+
+    async def acquire(self) -> bool:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return True
+        if len(self._waiters) >= self.queue_size:
+            self.shed += 1
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                waiter.cancel()
+                self.shed += 1
+                return False
+        except asyncio.CancelledError:
+            # client went away; give back a slot that was already handed over
+            if waiter.done():
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            metrics.ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start)
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        return True  # release() handed its slot over
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "in_flight": self.in_flight, "waiting": len(self._waiters),
+                "queue_size": self.queue_size, "shed": self.shed}
+
+
+def _reject(status: int, detail: str, retry_after: float, headers: Optional[dict] = None):
+    headers = dict(headers or {}, **{"Retry-After": str(max(1, math.ceil(retry_after)))})
+    return JSONResponse(status_code=status, content={"detail": detail}, headers=headers)
+
+
+class RateLimitMiddleware:
+    def __init__(self, app, limiter: Optional[RateLimiter] = None, admission: Optional[ConcurrencyLimiter] = None,
+                 key_func: Callable = client_ip):
+        self.app = app
+        self.limiter = limiter if limiter is not None else rate_limiter
+        self.admission = admission if admission is not None else admission_control
+        self.key_func = key_func
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        route = metrics.route_template(scope)
+        if route in EXEMPT_ROUTES or route.startswith("/health/"):
+            return await self.app(scope, receive, send)
+        method = scope["method"]
+        cost = route_cost(method, route, scope.get("query_string", b""))
+        decision = await self.limiter.atake(self.key_func(scope), cost)
+        if not decision.allowed:
+            metrics.REQUESTS_REJECTED.inc(reason="rate_limited")
+            response = _reject(429, "Rate limit exceeded, retry later", decision.retry_after,
+                               {"X-RateLimit-Limit": str(int(self.limiter.burst)),
+                                "X-RateLimit-Remaining": str(int(decision.remaining))})
+            return await response(scope, receive, send)
+        if route in UNSLOTTED_ROUTES or self.admission.limit <= 0:
+            return await self.app(scope, receive, send)
+        if not await self.admission.acquire():
+            metrics.REQUESTS_REJECTED.inc(reason="overloaded")
+            return await _reject(503, "Server busy, retry shortly", 1)(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.admission.release()
+
+
+rate_limiter = RateLimiter(RedisBuckets.from_url(RATE_LIMIT_URL) if RATE_LIMIT_URL else None)
+admission_control = ConcurrencyLimiter()
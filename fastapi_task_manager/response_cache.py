@@ -0,0 +1,119 @@
+"""Per-query response cache with ETags for GET /tasks.
+
+Every cached listing is stored with the version of its scope (one counter
+per owner plus one for "all tasks") read before the query ran. The
+create/update/delete paths in crud bump those counters after commit, so a
+stale entry simply stops matching. The ETag is a hash of the body, so a
+client revalidating with If-None-Match gets 304 Not Modified whenever the
+result is unchanged, even after its entry was evicted or went stale.
+
+Bodies live in a per-process LRU for RESPONSE_CACHE_TTL seconds. Versions
+are per process too unless RESPONSE_CACHE_URL points at Redis; with
+several workers and no Redis, the TTL bounds how stale another worker's
+cache can be, so keep it short.
+"""
+import hashlib
+import json
+import os
+from typing import NamedTuple, Optional
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from cache import MemoryBackend, RedisBackend
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "5"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL")
+
+class CachedResponse(NamedTuple):
+    version: int
+    etag: str
+    body: bytes
+    headers: dict
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+class ResponseCache:
+    def __init__(self, entries, versions, ttl: float = RESPONSE_CACHE_TTL):
+        self.entries = entries
+        self.versions = versions
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def scope(owner_id: Optional[int]) -> str:
+        return "all" if owner_id is None else f"owner:{owner_id}"
+
+    @staticmethod
+    def key(**params) -> str:
+        return json.dumps(params, sort_keys=True, default=str)
+
+    def version(self, scope: str) -> int:
+        return self.versions.counter("tasks:" + scope)
+
+    async def aversion(self, scope: str) -> int:
+        if self.versions.local:
+            return self.version(scope)
+        return await run_in_threadpool(self.version, scope)
+
+    def lookup(self, key: str, version: int) -> Optional[CachedResponse]:
+        entry = self.entries.get(key) if self.ttl > 0 else None
+        if entry is not None and entry.version == version:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key: str, version: int, body: bytes, headers: dict) -> CachedResponse:
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        entry = CachedResponse(version, etag, body, headers)
+        if self.ttl > 0:
+            self.entries.set(key, entry, self.ttl)
+        return entry
+
+    def respond(self, entry: CachedResponse, if_none_match: Optional[str]) -> Response:
+        headers = dict(entry.headers, ETag=entry.etag)
+        headers["Cache-Control"] = "no-cache"
+        if etag_matches(if_none_match, entry.etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(entry.body, media_type="application/json", headers=headers)
+
+    def invalidate_tasks(self, *owner_ids: Optional[int]):
+        """Called by crud after task writes commit."""
+        self.versions.incr("tasks:all")
+        for owner_id in set(owner_ids):
+            if owner_id is not None:
+                self.versions.incr("tasks:" + self.scope(owner_id))
+
+    async def ainvalidate_tasks(self, *owner_ids: Optional[int]):
+        if self.versions.local:
+            return self.invalidate_tasks(*owner_ids)
+        return await run_in_threadpool(self.invalidate_tasks, *owner_ids)
+
+    def stats(self) -> dict:
+        return {
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "size": len(self.entries),
+            "evictions": self.entries.evictions,
+        }
+
+
+def _build_cache():
+    entries = MemoryBackend(maxsize=RESPONSE_CACHE_SIZE)
+    if RESPONSE_CACHE_URL:
+        return ResponseCache(entries, RedisBackend.from_url(RESPONSE_CACHE_URL, prefix="response:"))
+    return ResponseCache(entries, entries)
+
+
+response_cache = _build_cache()
@@ -0,0 +1,158 @@
+"""Read-replica routing for crud calls.
+
+crud_async.call sends the read-only operations in READ_OPS to a replica
+session (round-robin over DATABASE_REPLICA_URLS, or SQLite's query_only
+pool when no replicas are configured) and everything else to the
+request's primary session.
+
+Replicas lag, so after a user's own write their reads stay on the primary
+for REPLICA_STICKY_SECONDS (read-your-writes). The user is whoever
+get_current_user / get_optional_user resolved for the request, kept in
+the current_user_id context variable. Single-row lookups that come back
+empty from a replica, and replica errors, are retried on the primary.
+
+The sticky markers are per process unless REPLICA_STICKY_URL points at
+Redis. With several gunicorn workers and no Redis, a write handled by one
+worker does not pin the reads another worker serves, so read-your-writes
+only holds when both requests land on the same worker.
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+import database
+from cache import MemoryBackend, RedisBackend
+
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+REPLICA_STICKY_URL = os.getenv("REPLICA_STICKY_URL")
+
+READ_OPS = {"get_task", "get_tasks", "get_task_rows", "get_task_stats", "get_user", "get_user_by_email",
+            "list_users"}
+# a miss on these may just be replication lag
+LOOKUP_OPS = {"get_task", "get_user", "get_user_by_email"}
+
+current_user_id: ContextVar[Optional[int]] = ContextVar("current_user_id", default=None)
+
+logger = logging.getLogger("routing")
+
+
+class ReplicaRouter:
+    def __init__(self, replicas, sticky_seconds: float = REPLICA_STICKY_SECONDS, clock=time.monotonic,
+                 backend=None):
+        self.replicas = list(replicas)
+        self.sticky_seconds = sticky_seconds
+        # user id -> marker that expires sticky_seconds after their last write
+        self.backend = backend or MemoryBackend(clock=clock)
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.fallbacks = 0
+        self._next = itertools.cycle(self.replicas) if self.replicas else None
+        self._lock = threading.Lock()
+
+    def mark_write(self, user_id: Optional[int]):
+        """Pin user_id's reads to the primary for sticky_seconds."""
+        if user_id is None or not self.replicas:
+            return
+        self.backend.set(str(user_id), "1", self.sticky_seconds)
+
+    def is_sticky(self, user_id: Optional[int]) -> bool:
+        if user_id is None or not self.replicas:
+            return False
+        return self.backend.get(str(user_id)) is not None
+
+    def use_replica(self, fn, user_id: Optional[int] = None) -> bool:
+        if not self.replicas or fn.__name__ not in READ_OPS:
+            return False
+        if self.is_sticky(user_id):
+            self.primary_reads += 1
+            return False
+        return True
+
+    # the a* variants keep a remote backend off the event loop
+    async def amark_write(self, user_id: Optional[int]):
+        if self.backend.local or user_id is None or not self.replicas:
+            return self.mark_write(user_id)
+        return await run_in_threadpool(self.mark_write, user_id)
+
+    async def ais_sticky(self, user_id: Optional[int]) -> bool:
+        if self.backend.local or user_id is None or not self.replicas:
+            return self.is_sticky(user_id)
+        return await run_in_threadpool(self.is_sticky, user_id)
+
+    async def ause_replica(self, fn, user_id: Optional[int] = None) -> bool:
+        if self.backend.local or not self.replicas or fn.__name__ not in READ_OPS:
+            return self.use_replica(fn, user_id)
+        return await run_in_threadpool(self.use_replica, fn, user_id)
+
+    def replica(self):
+        with self._lock:
+            return next(self._next)
+
+    def read_sessionmaker(self, user_id: Optional[int] = None, sticky: Optional[bool] = None):
+        """Factory for sessions opened outside crud calls (e.g. exports).
+
+        Pass `sticky` when the caller already knows (from ais_sticky).
+        """
+        if sticky is None:
+            sticky = self.is_sticky(user_id)
+        if self.replicas and not sticky:
+            return self.replica()
+        return database.AsyncSessionLocal if database.IS_ASYNC else database.SessionLocal
+
+    def _retry_on_primary(self, fn, result) -> bool:
+        return result is None and fn.__name__ in LOOKUP_OPS
+
+    def run(self, fn, db, *args, **kwargs):
+        """Sync: run a read op on a replica, falling back to `db` (the primary)."""
+        try:
+            with self.replica()() as replica:
+                result = fn(replica, *args, **kwargs)
+        except DBAPIError:
+            logger.warning("replica read %s failed, using the primary", fn.__name__, exc_info=True)
+            result = None
+        else:
+            if not self._retry_on_primary(fn, result):
+                self.replica_reads += 1
+                return result
+        self.fallbacks += 1
+        return fn(db, *args, **kwargs)
+
+    async def run_async(self, afn, db: AsyncSession, *args, **kwargs):
+        try:
+            async with self.replica()() as replica:
+                result = await afn(replica, *args, **kwargs)
+        except DBAPIError:
+            logger.warning("replica read %s failed, using the primary", afn.__name__, exc_info=True)
+            result = None
+        else:
+            if not self._retry_on_primary(afn, result):
+                self.replica_reads += 1
+                return result
+        self.fallbacks += 1
+        return await afn(db, *args, **kwargs)
+
+    def stats(self) -> dict:
+        return {
+            "replicas": len(self.replicas),
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "fallbacks": self.fallbacks,
+            # markers may include expired ones not yet evicted; unknown when shared
+            "sticky_users": len(self.backend) if self.backend.local else None,
+            "shared": not self.backend.local,
+        }
+
+
+def _default_backend():
+    if REPLICA_STICKY_URL:
+        return RedisBackend.from_url(REPLICA_STICKY_URL, prefix="replica-sticky:")
+    return MemoryBackend()
+
+
+router = ReplicaRouter(database.ReplicaSessions, backend=_default_backend())
@@ -2,5 +2,7 @@
 python -m venv venv
 source venv/bin/activate
 pip install -r requirements.txt
+# migrates app.db to the latest revision (stamping one made by create_all) and adds sample data
 python init_db.py
-uvicorn main:app --reload
\ No newline at end of file
+# alembic owns the schema; create_all would not add new columns to existing tables
+AUTO_CREATE_SCHEMA=0 uvicorn main:app --reload
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 import datetime
 
 class UserCreate(BaseModel):
@@ -33,4 +33,29 @@ class TaskOut(TaskBase):
     created_at: datetime.datetime
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class TaskStats(BaseModel):
+    open: int
+    done: int
+    total: int
+    overdue: int
+
+class TaskPatch(BaseModel):
+    """One item of PATCH /tasks/bulk: the task id plus the fields to change."""
+    id: int
+    title: Optional[str] = None
+    description: Optional[str] = None
+    is_done: Optional[bool] = None
+    due_date: Optional[datetime.datetime] = None
+
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    status: str  # created | updated | deleted | not_found | invalid
+    error: Optional[str] = None
+
+class BulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
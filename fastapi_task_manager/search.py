@@ -0,0 +1,136 @@
+"""Pluggable full-text search behind crud.get_tasks(q=...).
+
+Backends turn the user's query into a WHERE clause plus a relevance ordering:
+
+- sqlite_fts5:       external-content FTS5 table kept in sync by triggers, bm25 ranking
+- postgres_tsvector: GIN expression index on title + description, ts_rank ranking
+- like:              ILIKE over title and description (no index, no ranking)
+
+Every search term is matched as a prefix, and all terms must match.
+SEARCH_BACKEND=auto (default) picks the index-backed backend for the dialect.
+"""
+import os
+import re
+from sqlalchemy import Float, Integer, event, false, func, literal_column, or_, text
+import models
+
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def terms(q: str):
+    return _TOKEN.findall(q.lower())
+
+
+class LikeSearch:
+    name = "like"
+
+    def apply(self, query, q):
+        """Return (query, order_by clauses) for search string `q`."""
+        words = terms(q)
+        if not words:
+            return query.where(false()), []
+        for word in words:
+            pattern = f"%{word}%"
+            query = query.where(or_(models.Task.title.ilike(pattern), models.Task.description.ilike(pattern)))
+        return query, []
+
+
+class SqliteFtsSearch:
+    name = "sqlite_fts5"
+
+    # title matches weigh 10x description matches
+    RANK_SQL = (
+        "SELECT rowid AS task_id, bm25(tasks_fts, 10.0, 1.0) AS score "
+        "FROM tasks_fts WHERE tasks_fts MATCH :match"
+    )
+
+    def match_expression(self, q):
+        return " ".join(f'"{word}"*' for word in terms(q))
+
+    def apply(self, query, q):
+        match = self.match_expression(q)
+        if not match:
+            return query.where(false()), []
+        hits = (
+            text(self.RANK_SQL)
+            .bindparams(match=match)
+            .columns(task_id=Integer, score=Float)
+            .subquery("fts")
+        )
+        query = query.join(hits, hits.c.task_id == models.Task.id)
+        return query, [hits.c.score]
+
+
+class PostgresFtsSearch:
+    name = "postgres_tsvector"
+
+    # must match the GIN index expression exactly for the planner to use it
+    VECTOR_SQL = "to_tsvector('simple', coalesce(tasks.title, '') || ' ' || coalesce(tasks.description, ''))"
+
+    def apply(self, query, q):
+        words = terms(q)
+        if not words:
+            return query.where(false()), []
+        tsquery = func.to_tsquery(literal_column("'simple'"), " & ".join(f"{word}:*" for word in words))
+        vector = literal_column(self.VECTOR_SQL)
+        query = query.where(vector.op("@@")(tsquery))
+        return query, [func.ts_rank(vector, tsquery).desc()]
+
+
+BACKENDS = {b.name: b for b in (LikeSearch(), SqliteFtsSearch(), PostgresFtsSearch())}
+DIALECT_DEFAULTS = {"sqlite": "sqlite_fts5", "postgresql": "postgres_tsvector"}
+
+
+def backend_for(dialect_name: str):
+    name = SEARCH_BACKEND
+    if name == "auto":
+        name = DIALECT_DEFAULTS.get(dialect_name, "like")
+    return BACKENDS[name]
+
+
+# ========================
+# SCHEMA
+# ========================
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+    "title, description, content='tasks', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN "
+    "INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE OF title, description ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+]
+
+POSTGRES_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_tasks_search ON tasks USING gin ({PostgresFtsSearch.VECTOR_SQL})",
+]
+
+
+def install(conn):
+    """Create the search index on connection `conn` (idempotent).
+
+    Runs automatically after `tasks` is created; main.py also calls it so a
+    database whose tables predate the search index gets one on startup.
+    """
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        existed = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'")).first()
+        for stmt in SQLITE_DDL:
+            conn.execute(text(stmt))
+        if not existed:
+            conn.execute(text("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')"))
+    elif dialect == "postgresql":
+        for stmt in POSTGRES_DDL:
+            conn.execute(text(stmt))
+
+
+@event.listens_for(models.Task.__table__, "after_create")
+def _install_after_create(target, connection, **kw):
+    install(connection)
@@ -0,0 +1,50 @@
+"""Fast JSON encoding for task listings and API responses.
+
+GET /tasks selects TaskOut's columns as plain row tuples (crud.get_task_rows)
+and encodes them here directly: rows straight from the database are
+trusted, so the per-object pydantic validation and jsonable_encoder walk of
+the response_model path are skipped. The endpoint keeps
+response_model=List[TaskOut], so the OpenAPI schema is unchanged, and the
+bytes match what that path produces.
+
+orjson is used when installed (optional; stdlib json otherwise). Both
+emit naive datetimes as isoformat() strings, like jsonable_encoder.
+"""
+import datetime
+import json
+from starlette.responses import JSONResponse
+import models
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+# schemas.TaskOut field order
+TASK_FIELDS = ("title", "description", "is_done", "due_date", "id", "owner_id", "created_at")
+TASK_COLUMNS = [getattr(models.Task, field) for field in TASK_FIELDS]
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+                      default=_default).encode("utf-8")
+
+
+def render_rows(rows, fields=TASK_FIELDS) -> bytes:
+    """JSON array of objects from row tuples whose columns are in `fields` order."""
+    return dumps([dict(zip(fields, row)) for row in rows])
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that encodes with orjson when available (still a JSONResponse for OpenAPI)."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
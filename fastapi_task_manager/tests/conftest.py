@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# Point the app at a throwaway database before main/database are imported
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db"))
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+# every test client shares one IP; test_ratelimit.py builds its own limited app
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
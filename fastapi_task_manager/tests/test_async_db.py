@@ -0,0 +1,59 @@
+import asyncio
+import os
+import tempfile
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+import crud, crud_async, schemas
+from database import Base, is_async_url, engine_options
+
+
+def test_is_async_url():
+    assert is_async_url("sqlite+aiosqlite:///./app.db")
+    assert is_async_url("postgresql+asyncpg://app:pw@db/appdb")
+    assert not is_async_url("sqlite:///./app.db")
+    assert not is_async_url("postgresql://app:pw@db/appdb")
+
+
+def test_engine_options_pool_settings():
+    opts = engine_options("postgresql+asyncpg://app:pw@db/appdb")
+    assert {"pool_size", "max_overflow", "pool_timeout", "pool_recycle"} <= set(opts)
+    assert "pool_size" not in engine_options("sqlite:///./app.db")
+
+
+def test_async_crud_roundtrip():
+    async def run():
+        url = "sqlite+aiosqlite:///" + os.path.join(tempfile.mkdtemp(), "async.db")
+        engine = create_async_engine(url, **engine_options(url))
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with Session() as db:
+            user = await crud_async.call(crud.create_user, db, schemas.UserCreate(name="A", email="a@example.com", password="pw"))
+            assert (await crud_async.get_user_by_email(db, "a@example.com")).id == user.id
+            task = await crud_async.create_task(db, user.id, schemas.TaskCreate(title="Write report"))
+            assert [t.id for t in await crud_async.get_tasks(db, q="report")] == [task.id]
+            updated = await crud_async.update_task(db, task.id, schemas.TaskUpdate(title="Write report", is_done=True))
+            assert updated.is_done
+            assert await crud_async.delete_task(db, task.id)
+            assert await crud_async.get_task(db, task.id) is None
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_async_bulk_operations():
+    async def run():
+        url = "sqlite+aiosqlite:///" + os.path.join(tempfile.mkdtemp(), "bulk.db")
+        engine = create_async_engine(url)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with Session() as db:
+            ids = await crud_async.create_tasks_bulk(db, 1, [schemas.TaskCreate(title=f"t{i}") for i in range(3)])
+            assert len(ids) == 3
+            assert await crud_async.update_tasks_bulk(db, 1, [(ids[0], {"is_done": True}), (999, {})]) == {ids[0]}
+            assert await crud_async.delete_tasks_bulk(db, 2, ids) == set()
+            assert await crud_async.delete_tasks_bulk(db, 1, ids) == set(ids)
+        await engine.dispose()
+
+    asyncio.run(run())
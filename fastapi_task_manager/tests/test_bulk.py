@@ -0,0 +1,55 @@
+import json
+from fastapi.testclient import TestClient
+from main import app, create_access_token
+from database import SessionLocal
+import models
+
+client = TestClient(app)
+
+
+def auth(email):
+    db = SessionLocal()
+    if not db.query(models.User).filter(models.User.email == email).first():
+        db.add(models.User(name="Bulk", email=email, hashed_password="x"))
+        db.commit()
+    db.close()
+    return {"Authorization": "Bearer " + create_access_token({"sub": email})}
+
+
+def test_bulk_create_json_and_ndjson():
+    headers = auth("bulk@example.com")
+    res = client.post("/tasks/bulk", json=[{"title": "a"}, {"description": "no title"}, {"title": "c"}], headers=headers)
+    body = res.json()
+    assert res.status_code == 200 and body["succeeded"] == 2 and body["failed"] == 1
+    assert [r["status"] for r in body["results"]] == ["created", "invalid", "created"]
+
+    lines = "\n".join([json.dumps({"title": f"nd {i}"}) for i in range(5)] + ["{broken"])
+    res = client.post("/tasks/bulk", content=lines, headers=dict(headers, **{"Content-Type": "application/x-ndjson"}))
+    body = res.json()
+    assert body["succeeded"] == 5 and body["results"][-1]["status"] == "invalid"
+    ids = [r["id"] for r in body["results"][:5]]
+    assert ids == sorted(ids)
+
+
+def test_bulk_update_and_delete_respect_ownership():
+    mine = auth("bulk-owner@example.com")
+    other = auth("bulk-other@example.com")
+    my_ids = [r["id"] for r in client.post("/tasks/bulk", json=[{"title": "m1"}, {"title": "m2"}], headers=mine).json()["results"]]
+    their_id = client.post("/tasks/bulk", json=[{"title": "t1"}], headers=other).json()["results"][0]["id"]
+
+    res = client.patch("/tasks/bulk", json=[{"id": my_ids[0], "is_done": True}, {"id": my_ids[1], "title": None},
+                                            {"id": their_id, "is_done": True}], headers=mine).json()
+    assert [r["status"] for r in res["results"]] == ["updated", "invalid", "not_found"]
+
+    res = client.request("DELETE", "/tasks/bulk", json=my_ids + [their_id, "x"], headers=mine).json()
+    assert [r["status"] for r in res["results"]] == ["deleted", "deleted", "not_found", "invalid"]
+
+    db = SessionLocal()
+    assert db.get(models.Task, my_ids[0]) is None
+    assert db.get(models.Task, their_id).is_done is False
+    db.close()
+
+
+def test_bulk_rejects_non_array():
+    res = client.post("/tasks/bulk", json={"title": "x"}, headers=auth("bulk@example.com"))
+    assert res.status_code == 400
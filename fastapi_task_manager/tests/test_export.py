@@ -0,0 +1,68 @@
+import csv
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from main import app
+from database import Base, SessionLocal
+import crud, export, schemas
+
+client = TestClient(app)
+
+EXPORT_ROWS = 1_000_000
+
+
+def test_export_ndjson_and_csv():
+    db = SessionLocal()
+    task = crud.create_task(db, None, schemas.TaskCreate(title="export me, \"quoted\"", description="line\nbreak"))
+    db.close()
+
+    res = client.get("/tasks/export", params={"format": "ndjson"})
+    assert res.status_code == 200 and res.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in res.text.splitlines()]
+    assert any(r["id"] == task.id and r["description"] == "line\nbreak" for r in rows)
+
+    res = client.get("/tasks/export", params={"format": "csv"})
+    parsed = list(csv.DictReader(io.StringIO(res.text)))
+    assert list(parsed[0]) == export.FIELDS
+    assert any(r["title"] == 'export me, "quoted"' for r in parsed)
+    assert len(parsed) == len(rows)
+
+
+def rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="needs /proc to read RSS")
+def test_export_memory_stays_flat():
+    path = os.path.join(tempfile.mkdtemp(), "export.db")
+    engine = create_engine("sqlite:///" + path)
+    Base.metadata.create_all(bind=engine)
+    conn = sqlite3.connect(path)
+    # search triggers only slow the seeding down here
+    for trigger in ("tasks_fts_ai", "tasks_fts_au", "tasks_fts_ad"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.executemany(
+        "INSERT INTO tasks (title, description, is_done, owner_id, created_at) VALUES (?, ?, 0, 1, ?)",
+        ((f"task {i}", "x" * 40, f"2024-01-01 00:00:00.{i % 1000000:06d}") for i in range(EXPORT_ROWS)),
+    )
+    conn.commit()
+    conn.close()
+
+    stream = export.stream_sync(sessionmaker(bind=engine), "ndjson")
+    samples, lines = [], 0
+    for i, chunk in enumerate(stream):
+        lines += chunk.count("\n")
+        if i % 50 == 0:
+            samples.append(rss_bytes())
+    engine.dispose()
+
+    assert lines == EXPORT_ROWS
+    warm = samples[len(samples) // 10]
+    assert max(samples) - warm < 32 * 1024 * 1024
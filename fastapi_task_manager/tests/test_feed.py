@@ -0,0 +1,94 @@
+import asyncio
+from fastapi.testclient import TestClient
+from main import app, create_access_token
+from database import SessionLocal
+from feed import ChangeFeed, Event, format_sse
+import models
+
+client = TestClient(app)
+
+
+def owner(email):
+    db = SessionLocal()
+    user = models.User(name="Feed", email=email, hashed_password="x")
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.close()
+    return user_id, {"Authorization": "Bearer " + create_access_token({"sub": email})}
+
+
+def collect(feed, n, **kwargs):
+    async def run():
+        events = feed.events(keepalive=0.05, **kwargs)
+        return [await events.__anext__() for _ in range(n)]
+
+    return asyncio.run(run())
+
+
+def test_resume_replays_missed_events_for_owner():
+    feed = ChangeFeed(size=10)
+    for i in range(4):
+        feed.publish("created", i % 2, {"id": i})
+    assert [e.data["id"] for e in collect(feed, 2, last_event_id=1)] == [1, 2]
+    assert [e.data["id"] for e in collect(feed, 1, owner_id=1, last_event_id=2)] == [3]
+    assert collect(feed, 1)[0] is None  # no resume point: live events only, keepalive when idle
+    assert feed.stats()["subscribers"] == 0
+
+
+def test_resume_outside_buffer_resets():
+    feed = ChangeFeed(size=2)
+    for i in range(5):
+        feed.publish("updated", None, {"id": i})
+    reset = collect(feed, 1, last_event_id=1)[0]
+    assert reset.type == "reset" and reset.id == 5
+    assert collect(feed, 1, last_event_id=99)[0].type == "reset"
+
+
+def test_live_events_and_lagging_subscriber():
+    feed = ChangeFeed()
+
+    async def run():
+        events = feed.events(keepalive=1)
+        pending = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0)
+        feed.publish("deleted", 3, {"id": 9})
+        first = await pending
+        sub = next(iter(feed._subscribers))
+        sub.queue = asyncio.Queue(1)
+        for i in range(3):
+            feed.publish("created", 3, {"id": i})
+        await asyncio.sleep(0)
+        second = await events.__anext__()
+        await events.aclose()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first.type == "deleted" and first.data == {"id": 9}
+    assert second.type == "reset"
+
+
+def test_format_sse():
+    event = Event(7, "deleted", 1, {"id": 3})
+    assert format_sse(event) == 'id: 7\nevent: deleted\ndata: {"id":7,"type":"deleted","owner_id":1,"data":{"id":3}}\n\n'
+    assert format_sse(None).startswith(":")
+    assert Event.from_json(event.to_json()) == event
+
+
+def test_websocket_receives_owner_writes():
+    owner_id, headers = owner("feed@example.com")
+    _, other_headers = owner("feed-other@example.com")
+    with client.websocket_connect(f"/tasks/stream?owner_id={owner_id}") as ws:
+        client.post("/tasks", json={"title": "not mine"}, headers=other_headers)
+        task = client.post("/tasks", json={"title": "streamed"}, headers=headers).json()
+        created = ws.receive_json()
+        assert created["type"] == "created" and created["data"] == task
+
+        client.put(f"/tasks/{task['id']}", json={"title": "streamed", "is_done": True}, headers=headers)
+        assert ws.receive_json()["data"]["is_done"] is True
+        client.delete(f"/tasks/{task['id']}", headers=headers)
+        deleted = ws.receive_json()
+        assert deleted["type"] == "deleted" and deleted["data"] == {"id": task["id"]}
+
+        client.post("/tasks/bulk", json=[{"title": "a"}, {"title": "b"}], headers=headers)
+        assert len(ws.receive_json()["data"]["ids"]) == 2
@@ -0,0 +1,48 @@
+import time
+import pytest
+from fastapi.testclient import TestClient
+from passlib.hash import bcrypt
+from main import app
+from database import SessionLocal
+import crud, hashing, models
+
+client = TestClient(app)
+
+
+def test_needs_rehash_on_cost_change():
+    assert not hashing.needs_rehash(bcrypt.using(rounds=hashing.BCRYPT_ROUNDS).hash("pw"))
+    assert hashing.needs_rehash(bcrypt.using(rounds=hashing.BCRYPT_ROUNDS + 1).hash("pw"))
+
+
+def test_pool_rejects_when_full():
+    pool = hashing.HashPool(workers=1, queue_size=0)
+    try:
+        running = pool.submit(time.sleep, 0.5)
+        with pytest.raises(hashing.HashingBusy):
+            pool.submit(time.sleep, 0)
+        running.result()
+        assert pool.rejected == 1 and pool.in_flight == 0
+    finally:
+        pool.shutdown()
+
+
+def test_login_rehashes_stale_cost():
+    db = SessionLocal()
+    stale = bcrypt.using(rounds=hashing.BCRYPT_ROUNDS + 1).hash("oldcost")
+    db.add(models.User(name="Stale", email="stale@example.com", hashed_password=stale))
+    db.commit()
+    assert crud.authenticate_user(db, "stale@example.com", "wrong") is None
+    user = crud.authenticate_user(db, "stale@example.com", "oldcost")
+    assert hashing.rounds_of(user.hashed_password) == hashing.BCRYPT_ROUNDS
+    assert crud.authenticate_user(db, "stale@example.com", "oldcost").id == user.id
+    db.close()
+
+
+def test_token_returns_429_when_pool_is_saturated(monkeypatch):
+    db = SessionLocal()
+    db.add(models.User(name="Busy", email="busy@example.com", hashed_password=bcrypt.using(rounds=4).hash("pw")))
+    db.commit()
+    db.close()
+    monkeypatch.setattr(hashing.pool, "capacity", 0)
+    res = client.post("/token", data={"username": "busy@example.com", "password": "pw"})
+    assert res.status_code == 429 and res.headers["Retry-After"] == "1"
@@ -0,0 +1,73 @@
+from fastapi.testclient import TestClient
+from main import app, create_access_token
+from database import SessionLocal
+from identity_cache import IdentityCache, MemoryBackend, RedisBackend, identity_cache
+import models, schemas
+
+client = TestClient(app)
+
+
+class FakeRedis:
+    """In-process stand-in for the handful of Redis commands the backend uses."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+def user(email, id=1):
+    return schemas.UserOut(id=id, name="Cached", email=email)
+
+
+def test_memory_backend_lru_and_ttl():
+    now = [0.0]
+    cache = IdentityCache(MemoryBackend(maxsize=2, clock=lambda: now[0]), ttl=10)
+    cache.set(user("a@example.com"))
+    cache.set(user("b@example.com"))
+    assert cache.get("a@example.com").email == "a@example.com"
+    cache.set(user("c@example.com"))  # evicts b, the least recently used
+    assert cache.get("b@example.com") is None
+    now[0] = 11
+    assert cache.get("a@example.com") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["evictions"] == 1
+
+
+def test_redis_backend_with_fake_client():
+    fake = FakeRedis()
+    cache = IdentityCache(RedisBackend(fake, prefix="identity:"), ttl=30)
+    cache.set(user("r@example.com", id=7))
+    assert "identity:r@example.com" in fake.data
+    assert cache.get("r@example.com").id == 7
+    cache.invalidate("r@example.com")
+    assert cache.get("r@example.com") is None
+
+
+def test_current_user_served_from_cache_and_invalidated():
+    db = SessionLocal()
+    db_user = models.User(name="Cache Me", email="cache-me@example.com", hashed_password="x")
+    db.add(db_user)
+    db.commit()
+    headers = {"Authorization": "Bearer " + create_access_token({"sub": db_user.email})}
+
+    hits = identity_cache.hits
+    assert client.post("/tasks", json={"title": "one"}, headers=headers).status_code == 200
+    assert client.post("/tasks", json={"title": "two"}, headers=headers).status_code == 200
+    assert identity_cache.hits == hits + 1
+
+    db_user.email = "renamed@example.com"
+    db.commit()
+    assert identity_cache.get("cache-me@example.com") is None
+    assert client.post("/tasks", json={"title": "three"}, headers=headers).status_code == 401
+    db.close()
+
+    stats = client.get("/health/identity-cache").json()
+    assert stats["hits"] >= 1 and stats["invalidations"] >= 1
@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+import tempfile
+from sqlalchemy import create_engine, func, select
+import init_db, models
+
+
+def test_seed_bulk_loads_and_tops_up():
+    engine = create_engine("sqlite:///" + os.path.join(tempfile.mkdtemp(), "seed.db"))
+    owner_ids = init_db.seed(3, 10, bind=engine)
+    assert len(owner_ids) == 3
+    init_db.seed(4, 12, bind=engine)
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(models.User)).scalar() == 4
+        per_owner = conn.execute(select(models.Task.owner_id, func.count()).group_by(models.Task.owner_id)).all()
+    assert sum(n for _, n in per_owner) == 12 and len(per_owner) == 4
+    engine.dispose()
+
+
+def test_init_migrates_a_create_all_database(tmp_path):
+    # a database from before Alembic: the initial tables, no alembic_version
+    url = "sqlite:///" + str(tmp_path / "legacy.db")
+    root = os.path.join(os.path.dirname(__file__), "..")
+    env = dict(os.environ, DATABASE_URL=url)
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "0001"], cwd=root, env=env, check=True,
+                   capture_output=True)
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE alembic_version")
+        conn.exec_driver_sql("INSERT INTO tasks (title, is_done, created_at) VALUES ('legacy', 0, NULL)")
+    subprocess.run([sys.executable, "init_db.py"], cwd=root, env=env, check=True, capture_output=True)
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT version_num FROM alembic_version").scalar() == "0007"
+        assert conn.exec_driver_sql("SELECT reminded_due FROM tasks WHERE title = 'legacy'").all() == [(None,)]
+        assert conn.exec_driver_sql("SELECT COUNT(*) FROM tasks WHERE created_at IS NULL").scalar() == 0
+    engine.dispose()
@@ -0,0 +1,123 @@
+import asyncio
+import datetime
+import os
+import tempfile
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from jobs import HANDLERS, JobQueue
+import jobs, models
+
+
+def sessions():
+    engine = create_engine("sqlite:///" + os.path.join(tempfile.mkdtemp(), "jobs.db"))
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def job_row(Session, job_id):
+    with Session() as db:
+        return db.get(models.Job, job_id)
+
+
+def test_retries_with_backoff_and_expired_leases():
+    Session = sessions()
+    now = [datetime.datetime(2026, 1, 1)]
+    calls = []
+
+    def flaky(db, payload):
+        calls.append(payload["n"])
+        if len(calls) == 1:
+            raise RuntimeError("try again")
+
+    queue = JobQueue(Session, handlers={"flaky": flaky, "slow": lambda db, payload: None},
+                     visibility_timeout=30, retry_base=10, clock=lambda: now[0])
+    job_id = queue.enqueue("flaky", {"n": 1}, max_attempts=3)
+    assert queue.enqueue("flaky", {"n": 2}, key="once") and queue.enqueue("flaky", {"n": 3}, key="once") is None
+
+    assert queue.run_pending() == 2
+    row = job_row(Session, job_id)
+    assert (row.status, row.attempts, row.last_error) == ("queued", 1, "RuntimeError: try again")
+    assert row.run_at == now[0] + datetime.timedelta(seconds=10)
+    assert queue.run_pending() == 0  # not due yet
+    now[0] += datetime.timedelta(seconds=10)
+    assert queue.run_pending() == 1
+    assert job_row(Session, job_id).status == "done"
+
+    # a worker that claims and never reports back: the job reappears after the timeout
+    slow_id = queue.enqueue("slow", max_attempts=2)
+    [stalled] = queue.claim()
+    assert queue.claim() == []
+    now[0] += datetime.timedelta(seconds=31)
+    [again] = queue.claim()
+    assert again.id == slow_id and again.attempts == 2
+    assert queue.run_job(stalled) == "done" and queue.lost_leases == 1  # late result is dropped
+    assert job_row(Session, slow_id).status == "running"
+    now[0] += datetime.timedelta(seconds=31)
+    [last] = queue.claim()
+    assert queue.run_job(last) == "failed"  # out of attempts
+    assert job_row(Session, slow_id).last_error == "visibility timeout expired"
+
+
+def test_overdue_scan_uses_index_and_queues_each_reminder_once(monkeypatch):
+    Session = sessions()
+    now = datetime.datetime(2026, 1, 2)
+    hour = datetime.timedelta(hours=1)
+    with Session() as db:
+        db.add_all([
+            models.Task(title="overdue", owner_id=1, due_date=now - hour),
+            models.Task(title="overdue too", owner_id=2, due_date=now - 2 * hour),
+            models.Task(title="done", owner_id=1, due_date=now - hour, is_done=True),
+            models.Task(title="later", owner_id=1, due_date=now + hour),
+            models.Task(title="no due date", owner_id=1),
+        ])
+        db.commit()
+        plan = db.connection().exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT id, due_date FROM tasks WHERE is_done = 0 AND due_date <= ? "
+            "ORDER BY due_date, id", (now,)).all()
+    assert "ix_tasks_done_due" in " ".join(str(step) for step in plan)
+
+    published = []
+    monkeypatch.setattr(jobs.feed, "publish", lambda *event: published.append(event))
+    queue = JobQueue(Session, scan_batch=1, clock=lambda: now)
+    assert queue.scan_overdue() == 2
+    assert queue.scan_overdue() == 0  # each task is reminded once per due date
+    with Session() as db:
+        db.execute(models.Task.__table__.update().where(models.Task.title == "overdue too").values(is_done=True))
+        db.commit()
+    assert queue.run_pending() == 2
+    assert [(type, owner, data["title"]) for type, owner, data in published] == [("due", 1, "overdue")]
+    with Session() as db:
+        assert set(db.scalars(select(models.Job.status))) == {"done"}
+    assert queue.stats()["reminders_queued"] == 2
+
+    # due dates behind everything scanned so far still get their reminder
+    with Session() as db:
+        db.add(models.Task(title="created late", owner_id=2, due_date=now - 3 * hour))
+        db.execute(models.Task.__table__.update().where(models.Task.title == "later").values(due_date=now - 4 * hour))
+        db.commit()
+    assert queue.scan_overdue() == 2
+    assert queue.scan_overdue() == 0
+    assert queue.run_pending() == 2
+    assert sorted(data["title"] for _, _, data in published[1:]) == ["created late", "later"]
+
+
+def test_worker_coroutines_drain_the_queue():
+    Session = sessions()
+    done = []
+    queue = JobQueue(Session, handlers=dict(HANDLERS, note=lambda db, payload: done.append(payload)),
+                     poll_seconds=5)
+
+    async def run():
+        await queue.start(workers=3, scheduler=False)
+        for i in range(20):
+            await queue.aenqueue("note", i)
+        for _ in range(200):
+            if len(done) == 20:
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+
+    asyncio.run(run())
+    assert sorted(done) == list(range(20))
+    assert queue.stats()["depth"] == {"done": 20}
@@ -0,0 +1,44 @@
+import logging
+from fastapi.testclient import TestClient
+from main import app
+from metrics import Histogram, REGISTRY
+import metrics
+
+client = TestClient(app)
+
+
+def sample(text, line_start):
+    return [line for line in text.splitlines() if line.startswith(line_start)]
+
+
+def test_metrics_endpoint_reports_route_templates_and_sql():
+    client.get("/tasks", params={"limit": 5, "owner_id": 424242})
+    client.put("/tasks/999999", json={"title": "x"})
+    res = client.get("/metrics")
+    assert res.status_code == 200 and res.headers["content-type"].startswith("text/plain")
+    text = res.text
+    assert sample(text, 'http_requests_total{method="GET",route="/tasks",status="200"}')
+    assert sample(text, 'http_requests_total{method="PUT",route="/tasks/{task_id}",status="401"}')
+    assert sample(text, 'http_request_duration_seconds_bucket{method="GET",route="/tasks",le="+Inf"}')
+    assert sample(text, "db_pool_connection_hold_seconds_count")
+    assert sample(text, "db_pool_connections_in_use 0")
+    assert sample(text, "http_requests_in_flight")
+    queries = metrics.REQUEST_QUERIES.snapshot(method="GET", route="/tasks")
+    assert queries["count"] >= 1 and queries["sum"] >= 1
+
+
+def test_histogram_buckets_are_cumulative():
+    hist = Histogram("test_seconds", "test", buckets=(0.1, 1.0))
+    REGISTRY.remove(hist)
+    for value in (0.05, 0.5, 5):
+        hist.observe(value)
+    assert hist.snapshot() == {"buckets": [1, 2, 3], "sum": 5.55, "count": 3}
+    assert 'test_seconds_bucket{le="+Inf"} 3' in hist.render()
+
+
+def test_slow_request_log_lists_queries(caplog, monkeypatch):
+    monkeypatch.setattr(metrics, "SLOW_REQUEST_MS", 0.001)
+    with caplog.at_level(logging.WARNING, logger="metrics"):
+        client.get("/tasks", params={"owner_id": 424242, "is_done": True, "limit": 3})
+    record = [r.getMessage() for r in caplog.records if r.getMessage().startswith("slow request GET /tasks")]
+    assert record and "FROM tasks" in record[-1]
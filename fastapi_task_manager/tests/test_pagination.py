@@ -0,0 +1,57 @@
+from fastapi.testclient import TestClient
+from main import app
+from database import SessionLocal
+import crud, models, schemas
+from pagination import encode_cursor, decode_cursor
+
+client = TestClient(app)
+
+
+def seed_owner(email, n):
+    db = SessionLocal()
+    owner = models.User(name="Pager", email=email, hashed_password="x")
+    db.add(owner)
+    db.commit()
+    for i in range(n):
+        crud.create_task(db, owner.id, schemas.TaskCreate(title=f"page task {i}", is_done=i % 2 == 0))
+    owner_id = owner.id
+    db.close()
+    return owner_id
+
+
+def test_cursor_roundtrip():
+    db = SessionLocal()
+    task = crud.create_task(db, None, schemas.TaskCreate(title="cursor"))
+    assert decode_cursor(encode_cursor(task.created_at, task.id)) == (task.created_at, task.id)
+    db.close()
+
+
+def test_cursor_pages_cover_all_rows_once():
+    owner_id = seed_owner("pager@example.com", 25)
+    seen, cursor = [], None
+    while True:
+        params = {"owner_id": owner_id, "limit": 10}
+        if cursor:
+            params["cursor"] = cursor
+        res = client.get("/tasks", params=params)
+        assert res.status_code == 200
+        seen += [t["id"] for t in res.json()]
+        cursor = res.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert len(seen) == 25 and seen == sorted(set(seen))
+
+
+def test_cursor_with_filter():
+    owner_id = seed_owner("pager-done@example.com", 12)
+    first = client.get("/tasks", params={"owner_id": owner_id, "is_done": True, "limit": 4})
+    second = client.get("/tasks", params={"owner_id": owner_id, "is_done": True, "limit": 4,
+                                          "cursor": first.headers["X-Next-Cursor"]})
+    tasks = first.json() + second.json()
+    assert len(tasks) == 6 and all(t["is_done"] for t in tasks)
+    assert "X-Next-Cursor" not in second.headers
+
+
+def test_invalid_cursor():
+    res = client.get("/tasks", params={"cursor": "not-a-cursor"})
+    assert res.status_code == 400
@@ -0,0 +1,85 @@
+import asyncio
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from ratelimit import ConcurrencyLimiter, MemoryBuckets, RateLimiter, RateLimitMiddleware
+import main
+
+
+def limited_app(limiter, admission, gate=None):
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, limiter=limiter, admission=admission,
+                       key_func=lambda scope: dict(scope["headers"]).get(b"x-client", b"anon").decode())
+
+    @app.get("/tasks")
+    async def tasks():
+        if gate is not None:
+            await gate.wait()
+        return []
+
+    @app.post("/token")
+    async def token():
+        return {}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    return app
+
+
+def test_token_buckets_charge_route_costs_per_client():
+    clock = [0.0]
+    limiter = RateLimiter(MemoryBuckets(clock=lambda: clock[0]), rate=2, burst=12)
+    client = TestClient(limited_app(limiter, ConcurrencyLimiter(limit=10)))
+    a = {"x-client": "a"}
+
+    assert client.post("/token", headers=a).status_code == 200  # costs 10
+    assert client.get("/tasks", params={"q": "x"}, headers=a).status_code == 429  # search costs 5, 2 left
+    assert client.get("/tasks", headers=a).status_code == 200
+    res = client.post("/token", headers=a)
+    assert res.status_code == 429 and res.headers["Retry-After"] == "5"  # 1 token, 9 short at 2/s
+    assert client.post("/token", headers={"x-client": "b"}).status_code == 200  # other clients unaffected
+    assert all(client.get("/health", headers=a).status_code == 200 for _ in range(20))  # exempt
+
+    clock[0] += 5
+    assert client.post("/token", headers=a).status_code == 200
+    assert limiter.stats()["limited"] == 2
+
+
+def test_admission_queues_briefly_then_sheds():
+    limiter = RateLimiter(rate=1000, burst=1000)
+    admission = ConcurrencyLimiter(limit=1, queue_size=1, timeout=0.2)
+
+    async def run():
+        gate = asyncio.Event()
+        transport = httpx.ASGITransport(app=limited_app(limiter, admission, gate))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = asyncio.create_task(client.get("/tasks"))
+            queued = asyncio.create_task(client.get("/tasks"))
+            await asyncio.sleep(0.05)
+            assert (admission.in_flight, admission.stats()["waiting"]) == (1, 1)
+            shed = await client.get("/tasks")  # queue full: rejected at once
+            gate.set()
+            statuses = [(await first).status_code, (await queued).status_code, shed.status_code]
+
+            gate.clear()
+            blocker = asyncio.create_task(client.get("/tasks"))
+            await asyncio.sleep(0.05)
+            timed_out = await client.get("/tasks")  # waits 0.2s for the slot, then gives up
+            gate.set()
+            await blocker
+        return statuses, timed_out
+
+    statuses, timed_out = asyncio.run(run())
+    assert statuses == [200, 200, 503]
+    assert timed_out.status_code == 503 and timed_out.headers["Retry-After"] == "1"
+    assert admission.stats() == {"limit": 1, "in_flight": 0, "waiting": 0, "queue_size": 1, "shed": 2}
+
+
+def test_buckets_are_keyed_by_token_user_or_ip():
+    token = main.create_access_token({"sub": "limits@example.com"})
+    scope = {"client": ("10.0.0.7", 5000), "headers": [(b"authorization", b"Bearer " + token.encode())]}
+    assert main.rate_limit_key(scope) == "user:limits@example.com"
+    scope["headers"] = [(b"authorization", b"Bearer forged")]
+    assert main.rate_limit_key(scope) == "ip:10.0.0.7"
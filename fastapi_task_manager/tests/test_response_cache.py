@@ -0,0 +1,52 @@
+from fastapi.testclient import TestClient
+from main import app, create_access_token
+from database import SessionLocal
+from response_cache import response_cache, etag_matches
+import models
+
+client = TestClient(app)
+
+
+def owner(email):
+    db = SessionLocal()
+    user = models.User(name="Etag", email=email, hashed_password="x")
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.close()
+    return user_id, {"Authorization": "Bearer " + create_access_token({"sub": email})}
+
+
+def test_etag_and_304_until_a_write():
+    owner_id, headers = owner("etag@example.com")
+    client.post("/tasks", json={"title": "first"}, headers=headers)
+
+    first = client.get("/tasks", params={"owner_id": owner_id})
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and first.headers["Cache-Control"] == "no-cache"
+    assert list(first.json()[0]) == ["title", "description", "is_done", "due_date", "id", "owner_id", "created_at"]
+
+    hits = response_cache.hits
+    again = client.get("/tasks", params={"owner_id": owner_id}, headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b"" and response_cache.hits == hits + 1
+
+    client.post("/tasks/bulk", json=[{"title": "second"}], headers=headers)
+    changed = client.get("/tasks", params={"owner_id": owner_id}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    assert [t["title"] for t in changed.json()] == ["first", "second"]
+
+
+def test_other_owner_writes_keep_entry_fresh():
+    owner_id, _ = owner("etag-quiet@example.com")
+    _, other_headers = owner("etag-busy@example.com")
+    client.get("/tasks", params={"owner_id": owner_id})
+    client.post("/tasks", json={"title": "elsewhere"}, headers=other_headers)
+    hits = response_cache.hits
+    client.get("/tasks", params={"owner_id": owner_id})
+    assert response_cache.hits == hits + 1
+
+
+def test_etag_matching():
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches(None, '"abc"')
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import tempfile
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from cache import RedisBackend
+from routing import ReplicaRouter, current_user_id
+import crud, crud_async, models, schemas
+
+
+def sqlite_sessions(name, *titles):
+    engine = create_engine("sqlite:///" + os.path.join(tempfile.mkdtemp(), name))
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add_all(models.Task(title=title, owner_id=7) for title in titles)
+        db.commit()
+    return Session
+
+
+def titles(tasks):
+    return sorted(task.title for task in tasks)
+
+
+def test_reads_go_to_replica_with_fallback_and_stickiness(monkeypatch):
+    Primary = sqlite_sessions("primary.db", "shared", "only on primary")
+    Replica = sqlite_sessions("replica.db", "shared")  # lagging copy
+    clock = [0.0]
+    router = ReplicaRouter([Replica], sticky_seconds=5, clock=lambda: clock[0])
+    monkeypatch.setattr(crud_async, "router", router)
+    monkeypatch.setattr(crud_async, "write_queue", None)
+
+    async def run():
+        current_user_id.set(7)
+        with Primary() as db:
+            before = await crud_async.call(crud.get_tasks, db, owner_id=7)
+            missing = await crud_async.call(crud.get_task, db, 2)  # not replicated yet
+            await crud_async.call(crud.create_task, db, 7, schemas.TaskCreate(title="mine"))
+            after = await crud_async.call(crud.get_tasks, db, owner_id=7)
+            clock[0] += 6
+            expired = await crud_async.call(crud.get_tasks, db, owner_id=7)
+        return before, missing, after, expired
+
+    before, missing, after, expired = asyncio.run(run())
+    assert titles(before) == ["shared"]
+    assert missing.title == "only on primary" and router.fallbacks == 1
+    assert titles(after) == ["mine", "only on primary", "shared"]
+    assert titles(expired) == ["shared"]
+    assert router.stats()["primary_reads"] == 1
+
+
+def test_other_users_are_not_pinned():
+    router = ReplicaRouter([object()], sticky_seconds=5)
+    router.mark_write(1)
+    assert not router.use_replica(crud.get_tasks, 1)
+    assert router.use_replica(crud.get_tasks, 2)
+    assert router.use_replica(crud.get_tasks, None)
+    assert not router.use_replica(crud.create_task, 2)
+    assert not ReplicaRouter([]).use_replica(crud.get_tasks, 2)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+
+def test_sticky_markers_shared_between_workers():
+    shared = FakeRedis()
+    worker_a = ReplicaRouter([object()], sticky_seconds=5, backend=RedisBackend(shared, prefix="replica-sticky:"))
+    worker_b = ReplicaRouter([object()], sticky_seconds=5, backend=RedisBackend(shared, prefix="replica-sticky:"))
+    worker_a.mark_write(1)
+    assert "replica-sticky:1" in shared.data
+    assert not worker_b.use_replica(crud.get_tasks, 1)
+    assert asyncio.run(worker_b.ais_sticky(1)) and not asyncio.run(worker_b.ause_replica(crud.get_tasks, 1))
+    assert worker_b.use_replica(crud.get_tasks, 2) and worker_b.stats()["shared"]
@@ -0,0 +1,50 @@
+from fastapi.testclient import TestClient
+from main import app
+from database import SessionLocal
+import crud, schemas, search
+
+client = TestClient(app)
+
+
+def make(db, title, description=None):
+    return crud.create_task(db, None, schemas.TaskCreate(title=title, description=description))
+
+
+def test_fts_prefix_and_ranking():
+    db = SessionLocal()
+    in_desc = make(db, "Weekly sync", "discuss zephyrine rollout")
+    in_title = make(db, "Zephyrine rollout plan", "owners and dates")
+    make(db, "Unrelated", "nothing here")
+    ids = [t.id for t in crud.get_tasks(db, q="zephyr")]
+    assert ids == [in_title.id, in_desc.id]
+    assert [t.id for t in crud.get_tasks(db, q="zephyr plan")] == [in_title.id]
+    db.close()
+
+
+def test_fts_follows_updates_and_deletes():
+    db = SessionLocal()
+    task = make(db, "Quillwort inventory")
+    crud.update_task(db, task.id, schemas.TaskUpdate(title="Bramblefinch inventory"))
+    assert crud.get_tasks(db, q="quillwort") == []
+    assert [t.id for t in crud.get_tasks(db, q="bramble")] == [task.id]
+    crud.delete_task(db, task.id)
+    assert crud.get_tasks(db, q="bramble") == []
+    db.close()
+
+
+def test_like_backend_matches_description():
+    db = SessionLocal()
+    task = make(db, "Misc", "contains marmalade notes")
+    query, rank = search.BACKENDS["like"].apply(crud.tasks_select(), "marmal")
+    assert [t.id for t in db.execute(query).scalars()] == [task.id] and rank == []
+    db.close()
+
+
+def test_search_ignores_query_syntax():
+    res = client.get("/tasks", params={"q": '"zzqx" (* OR'})
+    assert res.status_code == 200 and res.json() == []
+
+
+def test_search_rejects_cursor():
+    res = client.get("/tasks", params={"q": "x", "cursor": "abc"})
+    assert res.status_code == 400
@@ -0,0 +1,31 @@
+import datetime
+import json
+import pytest
+from fastapi.encoders import jsonable_encoder
+from database import SessionLocal
+from main import app
+import crud, schemas, serialization
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_rows_render_like_task_out(monkeypatch, use_orjson):
+    if use_orjson and serialization.orjson is None:
+        pytest.skip("orjson not installed")
+    if not use_orjson:
+        monkeypatch.setattr(serialization, "orjson", None)
+    db = SessionLocal()
+    crud.create_task(db, None, schemas.TaskCreate(title="ünïcode \"quoted\"", description=None,
+                                                  due_date=datetime.datetime(2030, 1, 2, 3, 4, 5, 678)))
+    rows = crud.get_task_rows(db, limit=1000)
+    tasks = crud.get_tasks(db, limit=1000)
+    db.close()
+
+    expected = jsonable_encoder([schemas.TaskOut(**{f: getattr(t, f) for f in serialization.TASK_FIELDS})
+                                 for t in tasks])
+    assert serialization.render_rows(rows) == json.dumps(
+        expected, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def test_list_tasks_keeps_task_out_schema():
+    schema = app.openapi()["paths"]["/tasks"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    assert schema["items"]["$ref"].endswith("/TaskOut")
@@ -0,0 +1,33 @@
+import os
+import sys
+import pytest
+from fastapi.testclient import TestClient
+import database, main
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+from bench_startup import budget, probe, probe_env  # noqa: E402
+
+
+def test_import_does_no_io_and_defers_auth_libraries(tmp_path):
+    unreachable = "sqlite:///" + str(tmp_path / "missing" / "app.db")  # any connection attempt fails
+    result = probe(probe_env(DATABASE_URL=unreachable), "import")
+    assert result["loaded_at_import"] == []
+    assert result["import_s"] <= budget()["import_s"]
+    with pytest.raises(RuntimeError):
+        probe(probe_env(DATABASE_URL=unreachable, AUTO_CREATE_SCHEMA="1"), "import")
+
+
+def test_cold_start_within_budget():
+    result = probe(probe_env())
+    over = {key: round(result[key], 3) for key, limit in budget().items() if result[key] > limit}
+    assert not over, f"over the startup budget (benchmarks/bench_startup.py): {over}"
+
+
+def test_static_files_and_pools_survive_cwd_and_fork(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = TestClient(main.app)
+    assert client.get("/frontend/index.html").status_code == 200
+    assert client.get("/").headers["content-type"].startswith("text/html")
+    database.after_fork()
+    with database.SessionLocal() as db:
+        assert db.connection().exec_driver_sql("select 1").scalar() == 1
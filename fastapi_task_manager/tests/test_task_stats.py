@@ -0,0 +1,132 @@
+import asyncio
+import datetime
+import os
+import random
+import tempfile
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base, engine_options
+from main import app
+import crud, crud_async, models, schemas
+
+client = TestClient(app)
+OWNERS = (1, 2, 3)
+
+
+def stored(db):
+    rows = db.execute(select(models.UserTaskStats.owner_id, models.UserTaskStats.open_count,
+                             models.UserTaskStats.done_count)).all()
+    return {owner: (open_count, done) for owner, open_count, done in rows if open_count or done}
+
+
+def random_step(rng, task_ids):
+    """One random crud call as (name, args) over the given task ids (some stale)."""
+    owner = rng.choice(OWNERS)
+    pick = lambda: rng.choice(task_ids) if task_ids and rng.random() < 0.9 else 10 ** 6
+    kind = rng.choice(["create", "create", "update", "delete", "bulk_create", "bulk_update", "bulk_delete"])
+    if kind == "create":
+        return "create_task", (owner, schemas.TaskCreate(title="t", is_done=rng.random() < 0.3))
+    if kind == "update":
+        return "update_task", (pick(), schemas.TaskUpdate(title="t", is_done=rng.random() < 0.5))
+    if kind == "delete":
+        return "delete_task", (pick(),)
+    if kind == "bulk_create":
+        return "create_tasks_bulk", (owner, [schemas.TaskCreate(title="b", is_done=rng.random() < 0.5)
+                                             for _ in range(rng.randrange(1, 5))])
+    if kind == "bulk_update":
+        # repeated ids: the last patch for a task wins
+        return "update_tasks_bulk", (owner, [(pick(), {"is_done": rng.random() < 0.5})
+                                             for _ in range(rng.randrange(1, 6))])
+    return "delete_tasks_bulk", (owner, [pick() for _ in range(rng.randrange(1, 4))])
+
+
+def task_ids(db):
+    return list(db.scalars(select(models.Task.id)))
+
+
+def test_counters_match_ground_truth_after_random_writes():
+    engine = create_engine("sqlite:///" + os.path.join(tempfile.mkdtemp(), "stats.db"))
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    for seed in range(5):
+        rng = random.Random(seed)
+        with Session() as db:
+            for _ in range(60):
+                name, args = random_step(rng, task_ids(db))
+                getattr(crud, name)(db, *args)
+                assert stored(db) == crud.count_tasks(db), (seed, name)
+
+
+def test_async_counters_match_ground_truth():
+    async def run():
+        url = "sqlite+aiosqlite:///" + os.path.join(tempfile.mkdtemp(), "stats_async.db")
+        engine = create_async_engine(url, **engine_options(url))
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        rng = random.Random(42)
+        async with Session() as db:
+            for _ in range(80):
+                ids = list((await db.scalars(select(models.Task.id))).all())
+                name, args = random_step(rng, ids)
+                await getattr(crud_async, name)(db, *args)
+                truth = await db.run_sync(lambda s: (stored(s), crud.count_tasks(s)))
+                assert truth[0] == truth[1], name
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_reconcile_repairs_drift_and_overdue_uses_index():
+    engine = create_engine("sqlite:///" + os.path.join(tempfile.mkdtemp(), "drift.db"))
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    now = datetime.datetime(2026, 3, 1)
+    with Session() as db:
+        for i in range(4):
+            crud.create_task(db, 1, schemas.TaskCreate(title=f"t{i}", due_date=now - datetime.timedelta(days=i - 1)))
+        crud.create_task(db, 1, schemas.TaskCreate(title="done", is_done=True, due_date=now - datetime.timedelta(days=9)))
+        # writes behind crud's back
+        db.execute(update(models.Task).where(models.Task.title == "t0").values(is_done=True))
+        db.add(models.Task(title="raw", owner_id=2))
+        db.commit()
+        assert stored(db) != crud.count_tasks(db)
+        assert crud.reconcile_task_stats(db) == 2
+        assert stored(db) == crud.count_tasks(db) == {1: (3, 2), 2: (1, 0)}
+        assert crud.reconcile_task_stats(db) == 0
+        assert crud.get_task_stats(db, 1, now=now) == schemas.TaskStats(open=3, done=2, total=5, overdue=2)
+        plan = " ".join(str(step) for step in db.connection().exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT count(*) FROM tasks WHERE owner_id = 1 AND is_done = 0 AND due_date < ?",
+            (now,)).all())
+    assert "ix_tasks_owner_done_due" in plan
+
+
+def test_stats_endpoint():
+    client.post("/register", json={"name": "Stats", "email": "stats@example.com", "password": "pw"})
+    token = client.post("/token", data={"username": "stats@example.com", "password": "pw"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    yesterday = (datetime.datetime.utcnow() - datetime.timedelta(days=1)).isoformat()
+    first = client.post("/tasks", json={"title": "late", "due_date": yesterday}, headers=headers).json()
+    client.post("/tasks", json={"title": "later"}, headers=headers)
+    client.put(f"/tasks/{first['id']}", json={"title": "late", "is_done": True, "due_date": yesterday},
+               headers=headers)
+    assert client.get("/users/me/stats", headers=headers).json() == {"open": 1, "done": 1, "total": 2, "overdue": 0}
+    assert client.get("/users/me/stats").status_code == 401
+
+
+def test_update_reads_the_current_is_done_before_adjusting_counters():
+    # the session already holds the task, from before another writer marked it done
+    engine = create_engine("sqlite:///" + os.path.join(tempfile.mkdtemp(), "stale.db"))
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+    with Session() as setup:
+        task_id = crud.create_task(setup, 1, schemas.TaskCreate(title="t")).id
+    with Session() as first, Session() as second:
+        stale = crud.get_task(first, task_id)
+        assert stale.is_done is False
+        crud.update_task(second, task_id, schemas.TaskUpdate(title="t", is_done=True))
+        crud.update_task(first, task_id, schemas.TaskUpdate(title="t", is_done=True))
+        assert stored(first) == {1: (0, 1)}
+    engine.dispose()
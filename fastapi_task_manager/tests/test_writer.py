@@ -0,0 +1,86 @@
+import os
+import tempfile
+import threading
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from database import Base, tune_sqlite
+from writer import WriteQueue
+import crud, metrics, schemas
+
+
+def sqlite_engine(read_only=False, path=None):
+    path = path or os.path.join(tempfile.mkdtemp(), "writer.db")
+    return tune_sqlite(create_engine("sqlite:///" + path), read_only=read_only), path
+
+
+def test_pragmas_and_read_only_pool():
+    engine, path = sqlite_engine()
+    Base.metadata.create_all(bind=engine)
+    reader, _ = sqlite_engine(read_only=True, path=path)
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() > 0
+    with reader.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("INSERT INTO tasks (title) VALUES ('nope')"))
+    engine.dispose()
+    reader.dispose()
+
+
+def test_group_commit_runs_hooks_after_commit_and_isolates_failures():
+    engine, _ = sqlite_engine()
+    Base.metadata.create_all(bind=engine)
+    writes = WriteQueue(engine, batch_wait_ms=50)
+    seen = []
+
+    def create(db, title):
+        task = crud.create_task(db, None, schemas.TaskCreate(title=title))
+        crud.after_commit(db, seen.append, title)
+        return task.id
+
+    def broken(db):
+        crud.create_task(db, None, schemas.TaskCreate(title="rolled back"))
+        raise RuntimeError("bad write")
+
+    gate = threading.Event()
+    futures = [writes.submit(lambda db: gate.wait(5))]  # hold the writer so the rest queue up
+    futures += [writes.submit(create, f"t{i}") for i in range(10)]
+    gate.set()
+    ids = [f.result(timeout=10) for f in futures[1:]]
+    grouped = writes.stats()
+    assert grouped["groups"] < grouped["jobs"] == 11 and sorted(seen) == sorted(f"t{i}" for i in range(10))
+
+    failed = writes.submit(broken)
+    ids.append(writes.submit(create, "after").result(timeout=10))
+    with pytest.raises(RuntimeError):
+        failed.result(timeout=10)
+    writes.stop()
+    assert len(set(ids)) == 11 and seen[-1] == "after"
+    assert writes.stats()["replays"] == 1
+
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        titles = {t.title for t in crud.get_tasks(db, limit=100)}
+    assert "rolled back" not in titles and "after" in titles
+    engine.dispose()
+
+
+def test_queued_writes_count_towards_the_submitting_request():
+    engine, _ = sqlite_engine()
+    Base.metadata.create_all(bind=engine)
+    metrics.instrument_engine(engine)
+    writes = WriteQueue(engine)
+    stats = metrics.RequestStats()
+    token = metrics.current_request.set(stats)
+    try:
+        writes.submit(lambda db: crud.create_task(db, None, schemas.TaskCreate(title="counted")).id).result(timeout=10)
+    finally:
+        metrics.current_request.reset(token)
+    writes.stop()
+    statements = [statement for statement, _ in stats.queries]
+    assert "BEGIN IMMEDIATE" in statements and any(s.startswith("INSERT INTO tasks") for s in statements)
+    assert stats.query_count == len(statements) and stats.db_seconds > 0
+    engine.dispose()
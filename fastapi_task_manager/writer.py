@@ -0,0 +1,182 @@
+"""Single-writer queue with group commit for SQLite.
+
+SQLite allows one writer at a time, so concurrent request threads that each
+open a write transaction mostly wait on each other (or fail with "database
+is locked"). With the queue enabled, crud_async.call hands the task write
+functions in WRITE_OPS to one writer thread instead. The thread takes every
+job that is already waiting (up to WRITE_BATCH_SIZE, lingering
+WRITE_BATCH_WAIT_MS for stragglers), runs them in one BEGIN IMMEDIATE
+transaction and commits once.
+
+Inside a group, the session's commit() only flushes; crud's post-commit
+work (cache invalidation, change-feed events) is registered with
+crud.after_commit and runs after the real COMMIT. If any job in a group
+raises, the group is rolled back and its jobs are replayed one per
+transaction, so a bad write fails alone.
+
+Each job carries the metrics.RequestStats of the request that submitted it
+and runs under them, so a request's SQL count and time include its queued
+write. The group's BEGIN IMMEDIATE, where the write lock is waited for, is
+added to every request in the group.
+
+Each gunicorn worker has its own writer; busy_timeout and BEGIN IMMEDIATE
+make the workers queue for the lock instead of erroring.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, NamedTuple, Optional
+from sqlalchemy.orm import Session, sessionmaker
+import database
+import metrics
+
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "64"))
+WRITE_BATCH_WAIT_MS = float(os.getenv("WRITE_BATCH_WAIT_MS", "1"))
+
+WRITE_OPS = {"create_task", "update_task", "delete_task",
+             "create_tasks_bulk", "update_tasks_bulk", "delete_tasks_bulk"}
+
+logger = logging.getLogger("writer")
+
+
+class GroupCommitSession(Session):
+    """Session whose commit() defers to the writer while a group is open."""
+
+    def commit(self):
+        if "after_commit" in self.info:
+            self.flush()
+        else:
+            super().commit()
+
+
+class Job(NamedTuple):
+    fn: object
+    args: tuple
+    kwargs: dict
+    future: Future
+    stats: Optional[metrics.RequestStats]
+
+
+class WriteQueue:
+    def __init__(self, bind, batch_size: int = WRITE_BATCH_SIZE, batch_wait_ms: float = WRITE_BATCH_WAIT_MS):
+        # expire_on_commit=False: results are handed to other threads after the commit
+        self.session_factory = sessionmaker(bind=bind, class_=GroupCommitSession,
+                                            autoflush=False, expire_on_commit=False)
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000.0
+        self.groups = 0
+        self.jobs = 0
+        self.replays = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Queue fn(session, *args, **kwargs); the future resolves after its group commits."""
+        future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                self._thread.start()
+        self._queue.put(Job(fn, args, kwargs, future, metrics.current_request.get()))
+        return future
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _next_group(self, first: Job) -> List[Job]:
+        group = [first]
+        deadline = time.monotonic() + self.batch_wait
+        while len(group) < self.batch_size:
+            try:
+                job = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if job is None:
+                self._queue.put(None)
+                break
+            group.append(job)
+        return group
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            group = [job for job in self._next_group(first) if job.future.set_running_or_notify_cancel()]
+            if not group:
+                continue
+            try:
+                self._commit(group)
+            except Exception:
+                if len(group) == 1:
+                    continue
+                self.replays += 1
+                for job in group:
+                    try:
+                        self._commit([job])
+                    except Exception:
+                        pass
+
+    def _commit(self, group: List[Job]):
+        """Run `group` in one transaction; on error fail (single job) or re-raise for a replay."""
+        db = self.session_factory()
+        hooks = db.info["after_commit"] = []
+        results = []
+        shared = metrics.RequestStats()
+        try:
+            token = metrics.current_request.set(shared)
+            try:
+                db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+            finally:
+                metrics.current_request.reset(token)
+            for job in group:
+                if job.stats is not None:
+                    for statement, seconds in shared.queries:
+                        job.stats.add(statement, seconds)
+                token = metrics.current_request.set(job.stats)
+                try:
+                    results.append(job.fn(db, *job.args, **job.kwargs))
+                finally:
+                    metrics.current_request.reset(token)
+            del db.info["after_commit"]
+            db.commit()
+        except Exception as exc:
+            db.rollback()
+            if len(group) == 1:
+                group[0].future.set_exception(exc)
+            raise
+        finally:
+            db.close()
+        self.groups += 1
+        self.jobs += len(group)
+        for fn, args in hooks:
+            try:
+                fn(*args)
+            except Exception:
+                logger.exception("post-commit hook %r failed", fn)
+        for job, result in zip(group, results):
+            job.future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "groups": self.groups,
+            "jobs": self.jobs,
+            "avg_group_size": round(self.jobs / self.groups, 2) if self.groups else 0.0,
+            "replays": self.replays,
+            "queued": self._queue.qsize(),
+        }
+
+
+def enabled() -> bool:
+    return database.SQLITE_WRITE_QUEUE and database.IS_SQLITE_FILE and not database.IS_ASYNC
+
+
+write_queue = WriteQueue(database.engine) if enabled() else None
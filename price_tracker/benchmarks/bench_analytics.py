@@ -0,0 +1,77 @@
+"""Cost of keeping price analytics current as history grows.
+
+Simulates hourly scrapes of --products products and, at each history size
+in --sizes (rows), times
+
+    groupby_rolling  rolling min/mean/max/std the obvious way:
+                     df.groupby(title).rolling(window, on=scrape_ts), all history
+    compute          analytics.compute over all history (one rolling pass
+                     over every product)
+    update           PriceAnalytics.update with one new scrape, continuing
+                     from the state left by the history before it
+
+update should stay flat as history grows; the other two grow with it.
+
+    python benchmarks/bench_analytics.py --products 2000 --sizes 1000000 5000000 10000000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import analytics  # noqa: E402
+
+
+def history(products, scrapes, seed=0):
+    rng = np.random.default_rng(seed)
+    walk = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (scrapes, products)), axis=0))
+    return pd.DataFrame({
+        "title": np.tile(np.array([f"Product {i:05d}" for i in range(products)], dtype=object), scrapes),
+        "scrape_ts": np.repeat(pd.Timestamp("2025-01-01") + pd.to_timedelta(np.arange(scrapes), unit="h"), products),
+        "price": np.round(walk.ravel(), 2),
+    })
+
+
+def groupby_rolling(df, window):
+    df = df.sort_values(["title", "scrape_ts"])
+    rolling = df.groupby("title", sort=False).rolling(window, on="scrape_ts")["price"]
+    return [rolling.min(), rolling.mean(), rolling.max(), rolling.std()]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return round(time.perf_counter() - start, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 5_000_000, 10_000_000])
+    parser.add_argument("--window", default=analytics.WINDOW)
+    args = parser.parse_args()
+
+    report = {}
+    for size in args.sizes:
+        scrapes = max(2, size // args.products)
+        df = history(args.products, scrapes)
+        past, last = df.iloc[:-args.products], df.iloc[-args.products:]
+        engine = analytics.PriceAnalytics(args.window)
+        engine.update(past, emit=False)
+        report[len(df)] = {
+            "groupby_rolling_s": timed(lambda: groupby_rolling(df, args.window)),
+            "compute_s": timed(lambda: analytics.compute(df, args.window)),
+            "update_one_scrape_s": timed(lambda: engine.update(last)),
+            "state_rows": len(engine.tail),
+        }
+        print(json.dumps({len(df): report[len(df)]}), file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
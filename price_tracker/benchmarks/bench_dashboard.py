@@ -0,0 +1,85 @@
+"""What one Streamlit interaction costs on a large price history, before and after the dashboard data layer.
+
+Builds hourly prices for --products products, --rows rows in all (already
+normalized, so the CSV read and cleaning the old app repeated on every
+rerun are left out of "old"), and times one interaction (select products,
+change the time range) for --select products and for all of them:
+
+    old       what the app did per rerun: describe(include="all"),
+              df[product].isin(selected), groupby(date) mean/min/max and
+              every selected price sent to the box plot
+    prepare   dashboard.PriceData(df): sort, product index, aggregates,
+              summary. Paid once per file version (st.cache_resource)
+    new       PriceData.trend and box_stats for the selection and range
+
+and reports how many points each chart would send to the browser.
+
+    python benchmarks/bench_dashboard.py --rows 10000000 --products 2000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import dashboard  # noqa: E402
+
+
+def history(products, scrapes, seed=0):
+    rng = np.random.default_rng(seed)
+    walk = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (scrapes, products)), axis=0))
+    names = np.array([f"Product {i:05d}" for i in range(products)], dtype=object)
+    return pd.DataFrame({
+        "product": pd.Categorical(np.tile(names, scrapes)),
+        "date": np.repeat(pd.Timestamp("2025-01-01") + pd.to_timedelta(np.arange(scrapes), unit="h"), products),
+        "price": np.round(walk.ravel(), 2).astype("float32"),
+    })
+
+
+def old_interaction(df, selected, start, end):
+    df.describe(include="all")
+    plot_df = df[df["product"].isin(selected) & df["date"].between(start, end)]
+    agg = plot_df.groupby("date")["price"].agg(["mean", "min", "max"])
+    return len(agg) + len(plot_df)
+
+
+def new_interaction(data, selected, start, end):
+    trend = data.trend(selected, start, end)
+    box = data.box_stats(selected, start, end)
+    return len(trend) + (len(box["outliers"]) + 5 if box else 0)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return round(time.perf_counter() - start, 3), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--select", type=int, default=3, help="products in the small selection")
+    args = parser.parse_args()
+
+    df = history(args.products, max(2, args.rows // args.products))
+    seconds, data = timed(lambda: dashboard.PriceData(df))
+    out = {"rows": len(df), "prepare_s": seconds, "levels": [len(level.times) for level in data.levels[1:]]}
+    first, last = data.time_range
+    ranges = {"all_time": (first, last), "last_10pct": (last - (last - first) / 10, last)}
+    for name, selected in [(f"{args.select}_products", data.products[:args.select]), ("all_products", data.products)]:
+        for span, (start, end) in ranges.items():
+            old_s, old_points = timed(lambda: old_interaction(df, selected, start, end))
+            new_s, new_points = timed(lambda: new_interaction(data, selected, start, end))
+            out[f"{name}/{span}"] = {"old_s": old_s, "new_s": new_s, "old_points": old_points,
+                                     "new_points": new_points}
+            print(json.dumps({f"{name}/{span}": out[f"{name}/{span}"]}), file=sys.stderr)
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
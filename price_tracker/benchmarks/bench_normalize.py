@@ -0,0 +1,104 @@
+"""Rows/s of price parsing: per-row functions vs the column pipeline in src/normalize.py.
+
+Builds --rows raw price strings drawn from --distinct distinct prices in
+mixed formats ("$1,249.00", "1.249,00 €", "CHF 1'249.50", "£12.99 ",
+"12,50 EUR", ...) and times
+
+    old_per_row     the old bs_scraper.clean_price over every row ($/USD
+                    only, so most non-dollar prices come out missing)
+    per_row         normalize.parse_price (same rules as the column path)
+                    over every row
+    parse_prices    normalize.parse_prices on the whole column
+    normalize       normalize.normalize on a scraped frame (title, price_raw,
+                    price, link, scrape_ts), reporting memory before/after
+
+The per-row modes stop at --row-rows rows and are scaled up to --rows.
+
+    python benchmarks/bench_normalize.py --rows 10000000 --distinct 50000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import normalize  # noqa: E402
+
+FORMATS = [
+    lambda whole, cents: f"${whole:,}.{cents:02d}",
+    lambda whole, cents: f"{whole:,}.{cents:02d} USD".replace(",", "'"),
+    lambda whole, cents: f"{whole:,}".replace(",", ".") + f",{cents:02d} €",
+    lambda whole, cents: f"£{whole}.{cents:02d} ",
+    lambda whole, cents: f"CHF {whole:,}.{cents:02d}".replace(",", "'"),
+    lambda whole, cents: f"{whole},{cents:02d} EUR",
+    lambda whole, cents: f"¥{whole * 100:,}",
+]
+
+
+def old_clean_price(price_raw):
+    """bs_scraper.clean_price as it was."""
+    if not price_raw:
+        return None
+    cleaned = price_raw.replace(",", "").replace("$", "").replace("USD", "").strip()
+    try:
+        return float(cleaned)
+    except:  # noqa: E722
+        return None
+
+
+def raw_prices(rows, distinct, seed=0):
+    rng = np.random.default_rng(seed)
+    wholes, cents = rng.integers(1, 20000, distinct), rng.integers(0, 100, distinct)
+    vocab = np.array([FORMATS[i % len(FORMATS)](int(w), int(c)) for i, (w, c) in enumerate(zip(wholes, cents))],
+                     dtype=object)
+    return pd.Series(vocab[rng.integers(0, distinct, rows)])
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--distinct", type=int, default=50_000, help="distinct raw price strings")
+    parser.add_argument("--row-rows", type=int, default=2_000_000, help="row cap for the per-row modes")
+    args = parser.parse_args()
+
+    raw = raw_prices(args.rows, args.distinct)
+    sample = raw.iloc[:args.row_rows]
+    out = {"rows": args.rows, "distinct": args.distinct}
+    for name, fn in [("old_per_row", lambda: sample.map(old_clean_price)),
+                     ("per_row", lambda: sample.map(lambda text: normalize.parse_price(text)[0]))]:
+        seconds, prices = timed(fn)
+        seconds *= args.rows / len(sample)
+        out[name] = {"seconds": round(seconds, 2), "rows_per_s": round(args.rows / seconds),
+                     "missing_pct": round(100 * prices.isna().mean(), 1)}
+    seconds, parsed = timed(lambda: normalize.parse_prices(raw))
+    out["parse_prices"] = {"seconds": round(seconds, 2), "rows_per_s": round(args.rows / seconds),
+                           "missing_pct": round(100 * parsed["price"].isna().mean(), 1),
+                           "currencies": parsed["currency"].value_counts().to_dict()}
+
+    frame = pd.DataFrame({
+        "title": pd.Series([f"Product {i % 5000:05d} " for i in range(args.rows)], dtype=object),
+        "price_raw": raw,
+        "price": np.nan,
+        "link": "https://example.com/p",
+        "scrape_ts": "2025-01-01T00:00:00.000000",
+    })
+    seconds, cleaned = timed(lambda: normalize.normalize(frame))
+    out["normalize"] = {"seconds": round(seconds, 2), "rows_per_s": round(args.rows / seconds),
+                        "memory_mb_before": round(frame.memory_usage(deep=True).sum() / 2 ** 20),
+                        "memory_mb_after": round(cleaned.memory_usage(deep=True).sum() / 2 ** 20)}
+    out["speedup_vs_per_row"] = round(out["per_row"]["seconds"] / out["parse_prices"]["seconds"], 1)
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
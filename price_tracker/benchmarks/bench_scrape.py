@@ -0,0 +1,110 @@
+"""Crawl time for the catalog: sequential requests + sleep vs the async engine.
+
+Serves --pages canned listing pages (--cards products each) from the local
+fixture server with --latency seconds of server time per page, then crawls
+them
+
+    sequential  the old bs_scraper loop: requests.get per page (no
+                connection reuse), parse inline, time.sleep(--delay)
+    engine      ScrapeEngine with --concurrency workers, --rate requests
+                per second to the host and a parse pool, into a Parquet store
+    recrawl     the engine with a fetch cache, crawling the catalog twice with
+                --changed products repriced in between; reports the second
+                crawl (conditional requests, only changed rows stored)
+
+and reports seconds, pages/s and the projected time for 5,000 pages.
+
+    python benchmarks/bench_scrape.py --pages 300 --latency 0.1 --delay 1.0
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+for path in (os.path.join(ROOT, "src"), os.path.join(ROOT, "src", "scrapers"), os.path.join(ROOT, "tests")):
+    sys.path.insert(0, path)
+
+import bs_scraper  # noqa: E402
+import db  # noqa: E402
+from cache import FetchCache  # noqa: E402
+from engine import ScrapeEngine  # noqa: E402
+from fixture_server import FixtureServer  # noqa: E402
+
+
+def sequential(urls, delay):
+    import requests
+
+    rows = []
+    for url in urls:
+        r = requests.get(url, headers=bs_scraper.HEADERS, timeout=15)
+        r.raise_for_status()
+        rows.extend(bs_scraper.parse_page(r.text, url))
+        time.sleep(delay)
+    return len(rows)
+
+
+def report(seconds, pages, rows):
+    return {"seconds": round(seconds, 2), "pages_per_s": round(pages / seconds, 1), "rows": rows,
+            "projected_5000_pages_min": round(5000 / (pages / seconds) / 60, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--cards", type=int, default=24)
+    parser.add_argument("--latency", type=float, default=0.1, help="server time per page")
+    parser.add_argument("--delay", type=float, default=1.0, help="sequential sleep between pages")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=20, help="engine requests per second to the host")
+    parser.add_argument("--changed", type=int, default=50, help="products repriced between recrawls")
+    parser.add_argument("--modes", nargs="+", choices=["sequential", "engine", "recrawl"],
+                        default=["sequential", "engine", "recrawl"])
+    args = parser.parse_args()
+
+    out = {}
+    with FixtureServer(pages=args.pages, cards=args.cards, latency=args.latency) as server:
+        urls = bs_scraper.page_urls(args.pages, server.url + "/products")
+        if "sequential" in args.modes:
+            start = time.perf_counter()
+            rows = sequential(urls, args.delay)
+            out["sequential"] = report(time.perf_counter() - start, args.pages, rows)
+        if "engine" in args.modes:
+            workdir = tempfile.mkdtemp()
+            try:
+                engine = ScrapeEngine(bs_scraper.parse_page, sink=db.open_store(os.path.join(workdir, "store")).append,
+                                      concurrency=args.concurrency, per_host_rate=args.rate)
+                stats = asyncio.run(engine.run(urls))
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+            out["engine"] = dict(report(stats["seconds"], stats["pages"], stats["rows"]),
+                                 retries=stats["retries"], failed=stats["failed"])
+        if "recrawl" in args.modes:
+            workdir = tempfile.mkdtemp()
+            try:
+                store = db.open_store(os.path.join(workdir, "store"))
+                cache = FetchCache(os.path.join(workdir, "cache.db"))
+                runs = []
+                for _ in range(2):
+                    engine = ScrapeEngine(bs_scraper.parse_page, sink=store.append, concurrency=args.concurrency,
+                                          per_host_rate=args.rate, cache=cache)
+                    runs.append(asyncio.run(engine.run(urls)))
+                    for i in range(args.changed):
+                        server.prices[(i % args.pages + 1, i // args.pages % args.cards)] = "$0.01"
+                cache.close()
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+            first, stats = runs
+            out["recrawl"] = dict(report(stats["seconds"], stats["pages"], stats["rows"]),
+                                  first_crawl_s=first["seconds"], hit_rate=stats["hit_rate"],
+                                  kib_downloaded=round(stats["bytes"] / 1024), kib_saved=round(stats["bytes_saved"] / 1024),
+                                  rows_skipped=stats["rows_skipped"])
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
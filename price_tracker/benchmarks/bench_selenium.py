@@ -0,0 +1,90 @@
+"""Pages per minute for the Selenium scraper: one browser per page vs the pool.
+
+Serves --pages canned listing pages (--cards products each) from the local
+fixture server with --latency seconds of server time per page, then scrapes
+them
+
+    single    the old selenium_scraper.scrape: start Chrome, get(), wait with
+              WebDriverWait, then find_element/.text/get_attribute for every
+              field of every card (3 round-trips per card), quit
+    pool      BrowserPool(--workers) + crawl(): warm browsers, reused tabs,
+              one script call per page
+    blocked   the same with block_assets=True (no images or fonts)
+
+and reports seconds and pages per minute. Needs Chrome and chromedriver
+(or Selenium Manager) on the machine.
+
+    python benchmarks/bench_selenium.py --pages 200 --workers 4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+for path in (os.path.join(ROOT, "src"), os.path.join(ROOT, "src", "scrapers"), os.path.join(ROOT, "tests")):
+    sys.path.insert(0, path)
+
+from selenium.webdriver.common.by import By  # noqa: E402
+from selenium.webdriver.support import expected_conditions as EC  # noqa: E402
+from selenium.webdriver.support.ui import WebDriverWait  # noqa: E402
+import bs_scraper  # noqa: E402
+import selenium_scraper  # noqa: E402
+from fixture_server import FixtureServer  # noqa: E402
+
+
+def single(urls):
+    rows = 0
+    for url in urls:
+        driver = selenium_scraper.start_driver()
+        try:
+            driver.get(url)
+            WebDriverWait(driver, 10).until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".product-card")))
+            for card in driver.find_elements(By.CSS_SELECTOR, ".product-card"):
+                card.find_element(By.CSS_SELECTOR, ".product-title").text
+                card.find_element(By.CSS_SELECTOR, ".price").text
+                card.find_element(By.CSS_SELECTOR, "a").get_attribute("href")
+                rows += 1
+        finally:
+            driver.quit()
+    return {"pages": len(urls), "rows": rows}
+
+
+def pooled(urls, workers, block_assets):
+    start = time.perf_counter()
+    with selenium_scraper.BrowserPool(workers, block_assets=block_assets) as pool:
+        startup = time.perf_counter() - start
+        stats, _ = selenium_scraper.crawl(urls, pool)
+    return dict(stats, pool_startup_s=round(startup, 2), restarts=pool.restarts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--cards", type=int, default=24)
+    parser.add_argument("--latency", type=float, default=0.1, help="server time per page")
+    parser.add_argument("--workers", type=int, default=selenium_scraper.POOL_SIZE)
+    parser.add_argument("--single-pages", type=int, default=20, help="page cap for the slow baseline")
+    parser.add_argument("--modes", nargs="+", choices=["single", "pool", "blocked"],
+                        default=["single", "pool", "blocked"])
+    args = parser.parse_args()
+
+    out = {}
+    with FixtureServer(pages=args.pages, cards=args.cards, latency=args.latency) as server:
+        urls = bs_scraper.page_urls(args.pages, server.url + "/products")
+        runs = {"single": lambda: single(urls[:args.single_pages]),
+                "pool": lambda: pooled(urls, args.workers, False),
+                "blocked": lambda: pooled(urls, args.workers, True)}
+        for mode in args.modes:
+            start = time.perf_counter()
+            result = runs[mode]()
+            seconds = time.perf_counter() - start
+            out[mode] = dict(result, seconds=round(seconds, 2),
+                             pages_per_min=round(result["pages"] / seconds * 60, 1))
+            print(json.dumps({mode: out[mode]}), file=sys.stderr)
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
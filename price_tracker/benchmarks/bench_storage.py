@@ -0,0 +1,126 @@
+"""Append/scan/latest cost of the price store backends as the data grows.
+
+Simulates hourly scrapes of --products products until --rows rows are
+stored, appending each scrape as one batch, then times
+
+    append    per-batch latency: p50/p99 plus the mean over the first and
+              last 10% of batches (flat for an O(batch) append)
+    scan      one product over a 30-day window, one product over all time
+    latest    newest row per product
+
+for each backend in --backends: parquet and sqlite (src/db.py), csv
+(db.CSVStore, line appends) and rewrite, the old read-concat-rewrite
+append_to_csv, which is quadratic and so stops at --rewrite-rows.
+
+    python benchmarks/bench_storage.py --rows 10000000 --products 2000
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import db  # noqa: E402
+
+
+def rewrite_append(path, rows):
+    """append_to_csv as it was: read everything, concat, write everything."""
+    df_new = pd.DataFrame(rows)
+    if os.path.exists(path):
+        df = pd.concat([pd.read_csv(path), df_new], ignore_index=True)
+    else:
+        df = df_new
+    df.to_csv(path, index=False)
+
+
+def batches(products, count, start="2025-01-01"):
+    titles = np.array([f"Product {i:05d}" for i in range(products)], dtype=object)
+    rng = np.random.default_rng(0)
+    base = 10 + rng.random(products) * 990
+    for i in range(count):
+        ts = pd.Timestamp(start) + pd.Timedelta(hours=i)
+        price = np.round(base * (1 + rng.normal(0, 0.02, products)), 2)
+        yield pd.DataFrame({
+            "title": titles,
+            "price_raw": ["$" + str(p) for p in price],
+            "price": price,
+            "link": "https://example.com/p",
+            "scrape_ts": ts + pd.to_timedelta(rng.integers(0, 600, products), unit="s"),
+        })
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def run(backend, args, workdir):
+    limit = args.rewrite_rows if backend == "rewrite" else args.rows
+    count = max(1, limit // args.products)
+    target = {"parquet": os.path.join(workdir, "store"), "sqlite": os.path.join(workdir, "prices.db"),
+              "csv": os.path.join(workdir, "prices.csv"), "rewrite": os.path.join(workdir, "rewrite.csv")}[backend]
+    store = None if backend == "rewrite" else db.open_store(target)
+    append = (lambda b: rewrite_append(target, b)) if store is None else store.append
+
+    latencies = []
+    for batch in batches(args.products, count):
+        latencies.append(timed(lambda: append(batch))[0])
+    tenth = max(1, count // 10)
+    report = {
+        "rows": count * args.products,
+        "batches": count,
+        "append_ms": {
+            "p50": round(np.percentile(latencies, 50) * 1000, 2),
+            "p99": round(np.percentile(latencies, 99) * 1000, 2),
+            "first_10pct_mean": round(statistics.mean(latencies[:tenth]) * 1000, 2),
+            "last_10pct_mean": round(statistics.mean(latencies[-tenth:]) * 1000, 2),
+        },
+        "total_append_s": round(sum(latencies), 2),
+    }
+    if store is None:
+        return report
+    if backend == "parquet":
+        report["final_compact_s"] = round(timed(store.compact)[0], 2)
+    end = pd.Timestamp("2025-01-01") + pd.Timedelta(hours=count)
+    product = "Product 00042"
+    for name, fn in [("scan_product_30d", lambda: store.scan(product, end - pd.Timedelta(days=30), end)),
+                     ("scan_product_all", lambda: store.scan(product)),
+                     ("latest", store.latest)]:
+        seconds, df = timed(fn)
+        report[name] = {"ms": round(seconds * 1000, 2), "rows": len(df)}
+    size = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(target) for name in names) \
+        if os.path.isdir(target) else os.path.getsize(target)
+    report["disk_mb"] = round(size / 2 ** 20, 1)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--products", type=int, default=2000, help="rows per scrape (one append)")
+    parser.add_argument("--backends", nargs="+", choices=["parquet", "sqlite", "csv", "rewrite"],
+                        default=["parquet", "sqlite", "csv", "rewrite"])
+    parser.add_argument("--rewrite-rows", type=int, default=400_000, help="row cap for the quadratic baseline")
+    args = parser.parse_args()
+
+    report = {}
+    for backend in args.backends:
+        workdir = tempfile.mkdtemp()
+        try:
+            report[backend] = run(backend, args, workdir)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        print(json.dumps({backend: report[backend]}), file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
 # Example commands to run locally after installing requirements
-python src/scrapers/bs_scraper.py
-python src/visualize.py --csv data/sample_prices.csv --out figures/price_trends.png
+python src/scrapers/bs_scraper.py --pages 5 --concurrency 8 --delay 0.5 --store data/store
+python src/scrapers/selenium_scraper.py --urls-file data/urls.txt --workers 4 --block-assets --store data/store
+python src/db.py migrate data/sample_prices.csv --to data/store
+python src/analytics.py --store data/store --state data/analytics --drop 0.10
+python src/visualize.py --store data/store --out figures/price_trends.png
 streamlit run streamlit_app/app.py --server.port 8501
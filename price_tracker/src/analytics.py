@@ -0,0 +1,297 @@
+"""Price analytics over the store's time series: rolling stats, lows, anomalies, alerts.
+
+    stats = compute(store.scan())                   # batch, all history
+    engine = PriceAnalytics(window="7D", drop=0.10, on_alert=print)
+    engine.update(new_rows)                         # incremental, as scrapes land
+
+compute() adds per-product columns to price rows. All of them use
+vectorized groupby / time-based rolling operations:
+
+    roll_min, roll_mean, roll_max   price over the trailing `window` (with this row)
+    pct_change                      vs the product's previous observation
+    all_time_low                    lowest price so far (with this row)
+    prev_low                        lowest price before this row
+    prev_mean                       mean of the trailing window before this row
+    zscore                          distance from prev_mean in that window's
+                                    standard deviations (0 when the window
+                                    is empty or flat)
+
+PriceAnalytics keeps only what the next rows need: each product's rows
+inside the last `window` + `lateness` (so a late row still has its full
+window) and the lowest price of its rows before those. update(rows)
+computes stats for the new rows alone, in time proportional to the new
+rows plus that tail. It emits an Alert for every drop of at least `drop`,
+every new all-time low and every |zscore| >= `zscore`. The state can be
+saved between runs, so that
+
+    python src/analytics.py --store data/store --state data/analytics --drop 0.10
+
+after each scrape reads only the recent rows of the store. It also keeps
+hashes of the rows it folded in over the last `lateness` (default: one
+window) before the newest one. Each run rescans that stretch, and update()
+skips the rows it has already seen. Late observations, and rows stamped
+with the same time as the last one processed, are still picked up;
+nothing is counted twice.
+"""
+import argparse
+import json
+import os
+from typing import Callable, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.api.indexers import BaseIndexer
+
+from db import DEFAULT_STORE, PRODUCT, TS, open_store
+
+PRICE = "price"
+WINDOW = "7D"
+DROP = 0.10
+ZSCORE = 3.0
+STAT_COLUMNS = ["roll_min", "roll_mean", "roll_max", "pct_change", "all_time_low", "prev_low", "prev_mean",
+                "zscore"]
+
+
+class Alert(NamedTuple):
+    kind: str  # "drop", "new_low" or "anomaly"
+    product: str
+    ts: pd.Timestamp
+    price: float
+    reference: float  # previous price, previous low or the window's mean
+    change_pct: float
+
+    def __str__(self):
+        return (f"{self.ts:%Y-%m-%d %H:%M} {self.kind:<8} {self.product}: {self.price:,.2f} "
+                f"({self.change_pct:+.1f}% vs {self.reference:,.2f})")
+
+
+class _Bounds(BaseIndexer):
+    """Precomputed window bounds, so one rolling pass covers every product."""
+
+    def __init__(self, start, end):
+        super().__init__()
+        self.start, self.end = start, end
+
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        return self.start, self.end
+
+
+def _window_bounds(codes, stamps, window):
+    """(start, end) of each row's trailing window with and without the row itself.
+
+    Rows are sorted by product code, then time. Each product's times are moved
+    onto their own stretch of one axis, far enough apart that no window
+    reaches into the previous product, and the bounds are binary searches on
+    that axis (millisecond resolution).
+    """
+    width = int(pd.Timedelta(window) / pd.Timedelta(milliseconds=1))
+    t = stamps.astype("datetime64[ms]").astype("int64")
+    t = t - t.min() if len(t) else t
+    span = (int(t.max()) if len(t) else 0) + width + 1
+    key = codes.astype("int64") * span + t
+    lower = key - width
+    rows = np.arange(len(key))
+    # first row of each run of equal keys (a linear pass; key is sorted)
+    run_start = np.maximum.accumulate(np.where(np.r_[True, key[1:] != key[:-1]], rows, 0)) if len(key) else rows
+    # (t - window, t] up to and including this row; [t - window, t) strictly before it
+    return ((np.searchsorted(key, lower, side="right"), rows + 1),
+            (np.searchsorted(key, lower, side="left"), run_start))
+
+
+def compute(df, window=WINDOW, prior_low=None, product=PRODUCT, ts=TS, price=PRICE):
+    """Rows with a price, sorted by product and time, with STAT_COLUMNS added.
+
+    prior_low maps products to their lowest price before these rows (for
+    continuing a series; see PriceAnalytics).
+    """
+    df = df.dropna(subset=[product, ts, price])
+    stamps = pd.to_datetime(df[ts]).to_numpy()
+    codes, _ = pd.factorize(df[product], sort=True)
+    # sorting integer codes and times is much cheaper than sorting product names
+    order = np.lexsort((stamps, codes))
+    df, stamps, codes = df.iloc[order].reset_index(drop=True), stamps[order], codes[order]
+    values = df[price].astype("float64")
+    keys = df[product]
+    by_product = values.groupby(codes, sort=False)
+    with_row, before_row = _window_bounds(codes, stamps, window)
+    rolling = values.rolling(_Bounds(*with_row), min_periods=1)
+    before = values.rolling(_Bounds(*before_row), min_periods=1)
+    out = df.copy()
+    out["roll_min"] = rolling.min().to_numpy()
+    out["roll_mean"] = rolling.mean().to_numpy()
+    out["roll_max"] = rolling.max().to_numpy()
+    previous = by_product.shift()
+    out["pct_change"] = (values / previous - 1).to_numpy() * 100
+    low = by_product.cummin().to_numpy()
+    prev_low = previous.groupby(codes, sort=False).cummin().to_numpy()
+    if prior_low is not None and len(prior_low):
+        prior = keys.map(prior_low).astype("float64").to_numpy()
+        low, prev_low = np.fmin(low, prior), np.fmin(prev_low, prior)
+    out["all_time_low"], out["prev_low"] = low, prev_low
+    mean, std = before.mean().to_numpy(), before.std().to_numpy()
+    out["prev_mean"] = mean
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (values.to_numpy() - mean) / std
+    out["zscore"] = np.where(np.isfinite(z), z, 0.0)
+    return out
+
+
+def alerts(stats, drop=DROP, zscore=ZSCORE, product=PRODUCT, ts=TS, price=PRICE) -> List[Alert]:
+    """Alert events for the rows of a compute() result, oldest first."""
+    rules = [
+        # rounded so that a drop of exactly `drop` (50 -> 40 for 0.2) counts
+        ("drop", stats["pct_change"].round(9) <= -drop * 100, stats[price] / (1 + stats["pct_change"] / 100)),
+        ("new_low", stats[price] < stats["prev_low"], stats["prev_low"]),
+    ]
+    if zscore:
+        rules.append(("anomaly", stats["zscore"].abs() >= zscore, stats["prev_mean"]))
+    events = []
+    for kind, mask, reference in rules:
+        hits = stats.loc[mask, [product, ts, price]]
+        for row, base in zip(hits.itertuples(index=False), reference[mask]):
+            events.append(Alert(kind, row[0], row[1], float(row[2]), float(base), (row[2] / base - 1) * 100))
+    return sorted(events, key=lambda alert: (alert.ts, alert.product, alert.kind))
+
+
+def summary(stats, product=PRODUCT):
+    """The newest stats row per product."""
+    return stats.groupby(product, sort=True, observed=True).tail(1).set_index(product)
+
+
+def _row_keys(df):
+    """A hash of each row's product, time and price, stable across runs and dtypes."""
+    return pd.util.hash_pandas_object(pd.DataFrame({
+        PRODUCT: df[PRODUCT].astype(str).to_numpy(),
+        TS: pd.to_datetime(df[TS]).to_numpy("datetime64[ns]"),
+        PRICE: df[PRICE].to_numpy("float64"),
+    }), index=False).to_numpy()
+
+
+class PriceAnalytics:
+    def __init__(self, window=WINDOW, drop=DROP, zscore=ZSCORE,
+                 on_alert: Optional[Callable[[Alert], object]] = None, lateness=None):
+        self.window = window
+        self.drop = drop
+        self.zscore = zscore
+        self.on_alert = on_alert
+        self.lateness = pd.Timedelta(lateness or window)
+        self.tail = pd.DataFrame(columns=[PRODUCT, TS, PRICE])
+        self.lows = pd.Series(dtype="float64")
+        # hashes of the rows folded in at or after seen_since (see resume_from)
+        self.seen = pd.DataFrame({TS: pd.Series(dtype="datetime64[ns]"), "key": pd.Series(dtype="uint64")})
+        self.seen_since = None
+
+    @property
+    def last_ts(self):
+        return self.tail[TS].max() if len(self.tail) else None
+
+    @property
+    def resume_from(self):
+        """Where the next read of the store starts; update() skips the rows seen since then."""
+        return self.seen_since
+
+    def update(self, rows, emit=True):
+        """Stats for `rows` (dicts or a DataFrame), continuing each product's series.
+
+        Rows already folded in since resume_from are skipped, so overlapping
+        reads are harmless.
+        """
+        new = rows.copy() if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+        new = new.dropna(subset=[PRODUCT, TS, PRICE])
+        if len(new):
+            new[TS] = pd.to_datetime(new[TS])
+            keys = _row_keys(new)
+            fresh = ~(pd.Series(keys).isin(self.seen["key"]) | pd.Series(keys).duplicated()).to_numpy()
+            new, keys = new[fresh], keys[fresh]
+        if new.empty:
+            return pd.DataFrame(columns=list(new.columns) + STAT_COLUMNS)
+        self._remember(new[TS].to_numpy("datetime64[ns]"), keys)
+        touched = self.tail[PRODUCT].isin(new[PRODUCT].unique()).to_numpy()
+        parts = [self.tail[touched].assign(_new=False)] if touched.any() else []
+        combined = pd.concat(parts + [new.assign(_new=True)], ignore_index=True)
+        # lows holds only rows older than the tail, so a late row's lows never include later prices
+        stats = compute(combined, self.window, prior_low=self.lows)
+        self._advance(stats, self.tail[~touched])
+        stats = stats[stats["_new"]].drop(columns="_new").reset_index(drop=True)
+        if emit and self.on_alert is not None:
+            for alert in alerts(stats, self.drop, self.zscore):
+                self.on_alert(alert)
+        return stats
+
+    def _advance(self, stats, others):
+        """Keep the recent rows of each product in `stats` next to the untouched products' rows.
+
+        A product keeps its rows within `window` + `lateness` of its newest one:
+        a late row's window and every row newer than it are still here. The
+        prices of the rows dropped go into lows.
+        """
+        span = pd.Timedelta(self.window) + self.lateness
+        keep = stats[TS] >= stats.groupby(PRODUCT, sort=False, observed=True)[TS].transform("max") - span
+        # the newest row always stays, for the next pct_change
+        keep |= ~stats[PRODUCT].duplicated(keep="last")
+        fresh = stats.loc[keep, [PRODUCT, TS, PRICE]]
+        self.tail = pd.concat([others, fresh], ignore_index=True) if len(others) else fresh.reset_index(drop=True)
+        lows = stats[~keep].groupby(PRODUCT, sort=False, observed=True)[PRICE].min().astype("float64")
+        self.lows = pd.concat([self.lows, lows]).groupby(level=0).min() if len(self.lows) else lows
+
+    def _remember(self, stamps, keys):
+        """Add the keys of rows just folded in; keep those within `lateness` of the newest row."""
+        seen = pd.concat([self.seen, pd.DataFrame({TS: stamps, "key": keys})], ignore_index=True)
+        cutoff = seen[TS].max() - self.lateness
+        # a shorter lateness than before can move the start forward, never back past what was kept
+        self.seen_since = cutoff if self.seen_since is None else max(self.seen_since, cutoff)
+        self.seen = seen[seen[TS] >= self.seen_since].reset_index(drop=True)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.tail.to_parquet(os.path.join(path, "tail.parquet"), index=False)
+        self.lows.rename("all_time_low").rename_axis(PRODUCT).reset_index().to_parquet(
+            os.path.join(path, "lows.parquet"), index=False)
+        self.seen.to_parquet(os.path.join(path, "seen.parquet"), index=False)
+        with open(os.path.join(path, "state.json"), "w", encoding="utf-8") as f:
+            json.dump({"seen_since": None if self.seen_since is None else self.seen_since.isoformat()}, f)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        engine = cls(**kwargs)
+        tail_path, lows_path = os.path.join(path, "tail.parquet"), os.path.join(path, "lows.parquet")
+        if os.path.exists(tail_path):
+            engine.tail = pd.read_parquet(tail_path)
+            engine.lows = pd.read_parquet(lows_path).set_index(PRODUCT)["all_time_low"]
+        seen_path, meta_path = os.path.join(path, "seen.parquet"), os.path.join(path, "state.json")
+        if os.path.exists(seen_path) and os.path.exists(meta_path):
+            engine.seen = pd.read_parquet(seen_path)
+            with open(meta_path, encoding="utf-8") as f:
+                since = json.load(f)["seen_since"]
+            engine.seen_since = None if since is None else pd.Timestamp(since)
+        elif len(engine.tail):
+            # state saved without row keys: the tail holds every row at the newest time
+            last = engine.tail[engine.tail[TS] == engine.last_ts]
+            engine.seen = pd.DataFrame({TS: last[TS].to_numpy("datetime64[ns]"), "key": _row_keys(last)})
+            engine.seen_since = engine.last_ts
+        return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update price analytics from the store and print alerts.")
+    parser.add_argument("--store", default=DEFAULT_STORE, help="store directory, sqlite:/// URL or CSV file")
+    parser.add_argument("--state", default="data/analytics", help="directory for the incremental state")
+    parser.add_argument("--window", default=WINDOW, help="rolling window (pandas offset, e.g. 7D, 24h)")
+    parser.add_argument("--drop", type=float, default=DROP, help="alert on drops of at least this fraction")
+    parser.add_argument("--zscore", type=float, default=ZSCORE, help="alert on |z| at least this (0: off)")
+    parser.add_argument("--lateness", help="pick up rows stored up to this much older than the newest one "
+                                           "processed (pandas offset; default: the window)")
+    parser.add_argument("--replay", action="store_true", help="on a fresh state, alert on all of history")
+    args = parser.parse_args()
+    engine = PriceAnalytics.load(args.state, window=args.window, drop=args.drop, zscore=args.zscore, on_alert=print,
+                                 lateness=args.lateness)
+    resuming = engine.last_ts is not None
+    # rows already folded in are skipped by update()
+    rows = open_store(args.store).scan(start=engine.resume_from)
+    stats = engine.update(rows, emit=resuming or args.replay)
+    engine.save(args.state)
+    print(f"Processed {len(stats)} new rows for {stats[PRODUCT].nunique()} products")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Data layer behind the Streamlit dashboard, sized for stores of millions of rows.
+
+    data = PriceData(normalize.normalize(df))       # once per file version
+    data.trend(["Lamp", "Chair"], start, end)       # <= POINTS rows, any zoom
+    data.box_stats(["Lamp"], start, end)            # quartiles and fences for go.Box
+
+PriceData does the expensive work once: rows are sorted by product and
+time, and a product index (each product's first and last row) replaces
+isin() filtering with slices plus a binary search on time for the zoom
+range. The column summary is computed once, and price aggregates (sum,
+count, min, max) are precomputed per product over time buckets at a few
+widths, each LEVEL_FACTOR times finer than the last. trend() picks the
+coarsest level that still gives about one bucket per `points` of the
+visible range, rolls it up to exactly that width and returns the mean
+with the min/max of every bucket. Zoomed in past the finest level it
+reads the raw rows of the range, which are few by then. Either way the
+work and the result scale with the chart's width, not with the store.
+
+fingerprint() and digest() give the cache keys: what a store's files
+look like on disk, or a hash of uploaded bytes.
+"""
+import hashlib
+import os
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from normalize import RAW_PRICE
+
+POINTS = 1500  # about one bucket per pixel column of a wide chart
+LEVELS = 4
+LEVEL_FACTOR = 4
+MAX_OUTLIERS = 500
+PSEUDO_DATE = "__pseudo_date__"
+
+
+def detect_columns(df):
+    """(product, price, date) column names, None where the frame has no such column."""
+    product = next((c for c in df.columns if c.lower() in ("product", "item", "name", "title")), None)
+    price = next((c for c in df.columns if ("price" in c.lower() or "amount" in c.lower()) and c != RAW_PRICE),
+                 None)
+    date = next((c for c in df.columns if c.lower() in ("date", "timestamp", "time", "scrape_ts")), None)
+    return product, price, date
+
+
+def fingerprint(target) -> str:
+    """Hash of the names, sizes and modification times of the files behind a store target."""
+    path = str(target)
+    path = path[len("sqlite:///"):] if path.startswith("sqlite:///") else path
+    if os.path.isdir(path):
+        files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    else:
+        files = [path] if os.path.exists(path) else []
+    stamp = [(f, os.stat(f).st_size, os.stat(f).st_mtime_ns) for f in files]
+    return hashlib.sha1(repr((path, stamp)).encode()).hexdigest()
+
+
+def digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class _Level(NamedTuple):
+    """Price aggregates per (product, time bucket), sorted by product then time.
+
+    The raw rows are the level of width 0, with counts None (one row each).
+    """
+    width: int  # bucket width in ns
+    offsets: np.ndarray  # rows of product code i are offsets[i]:offsets[i + 1]
+    times: np.ndarray  # bucket start (ns)
+    sums: np.ndarray
+    counts: Optional[np.ndarray]
+    mins: np.ndarray
+    maxs: np.ndarray
+
+
+def _level(codes, t, y, n_products, t0, width):
+    bucket = (t - t0) // width
+    starts = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (bucket[1:] != bucket[:-1])])
+    offsets = np.searchsorted(codes[starts], np.arange(n_products + 1))
+    return _Level(width, offsets, t0 + bucket[starts] * width, np.add.reduceat(y, starts),
+                  np.diff(np.r_[starts, len(t)]), np.minimum.reduceat(y, starts), np.maximum.reduceat(y, starts))
+
+
+class PriceData:
+    def __init__(self, df, points=POINTS, levels=LEVELS):
+        self.points = points
+        self.product_col, self.price_col, self.date_col = detect_columns(df)
+        if self.price_col is None:
+            raise ValueError("no price column: expected a column with 'price' or 'amount' in its name")
+        self.summary = df.describe(include="all")
+        self.columns = df.columns.tolist()
+        df = df.copy()
+        if self.date_col is None:
+            self.date_col = PSEUDO_DATE
+            df[PSEUDO_DATE] = pd.date_range(end=pd.Timestamp.now(), periods=len(df))
+        dates = pd.to_datetime(df[self.date_col], errors="coerce")
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_convert(None)
+        df[self.date_col] = dates
+        prices = pd.to_numeric(df[self.price_col], errors="coerce")
+        df = df[prices.notna().to_numpy() & dates.notna().to_numpy()]
+        product = df[self.product_col] if self.product_col else pd.Series("all", index=df.index)
+        codes, products = pd.factorize(product, sort=True)
+        t = df[self.date_col].to_numpy("datetime64[ns]").astype("int64")
+        order = np.lexsort((t, codes))
+        self.frame = df.iloc[order].reset_index(drop=True)
+        self.products = [str(p) for p in products]
+        self._code = {name: i for i, name in enumerate(self.products)}
+        codes, t = codes[order], t[order]
+        y = pd.to_numeric(self.frame[self.price_col], errors="coerce").to_numpy("float64")
+        n = len(self.products)
+        self.levels = [_Level(0, np.searchsorted(codes, np.arange(n + 1)), t, y, None, y, y)]
+        if len(t):
+            t0, span = int(t.min()), int(t.max() - t.min()) + 1
+            for k in range(levels):  # coarsest first
+                level = _level(codes, t, y, n, t0, -(-span // (points * LEVEL_FACTOR ** k)))
+                # a level that does not at least halve the raw rows saves little over reading them,
+                # and the finer ones would save even less
+                if len(level.times) > len(t) // 2:
+                    break
+                self.levels.insert(1, level)
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def time_range(self):
+        t = self.levels[0].times
+        return (pd.Timestamp(int(t.min())), pd.Timestamp(int(t.max()))) if len(t) else (None, None)
+
+    def _positions(self, level, products, start=None, end=None):
+        """Positions in `level` of the given products' rows/buckets in [start, end], by product."""
+        lo_t = -np.inf if start is None else pd.Timestamp(start).value
+        hi_t = np.inf if end is None else pd.Timestamp(end).value
+        if level.width:
+            lo_t -= level.width - 1  # buckets overlapping the range
+        parts = []
+        for code in sorted(self._code[p] for p in products if p in self._code):
+            first, last = level.offsets[code], level.offsets[code + 1]
+            times = level.times[first:last]
+            lo, hi = np.searchsorted(times, lo_t, "left"), np.searchsorted(times, hi_t, "right")
+            parts.append(np.arange(first + lo, first + hi))
+        return np.concatenate(parts) if parts else np.array([], dtype="int64")
+
+    def rows(self, products, start=None, end=None):
+        """The frame's rows for `products` in [start, end], sorted by product and time."""
+        return self.frame.iloc[self._positions(self.levels[0], products, start, end)]
+
+    def trend(self, products, start=None, end=None, points=None):
+        """date, mean_price, min_price, max_price of `products` in about `points` equal time buckets."""
+        points = points or self.points
+        columns = ["date", "mean_price", "min_price", "max_price"]
+        first, last = self.time_range
+        if first is None:
+            return pd.DataFrame(columns=columns)
+        start = pd.Timestamp(first if start is None else start).value
+        end = pd.Timestamp(last if end is None else end).value
+        width = max(1, -(-(end - start + 1) // points))
+        level = max((lv for lv in self.levels if lv.width <= width), key=lambda lv: lv.width)
+        pos = self._positions(level, products, start, end)
+        if not len(pos):
+            return pd.DataFrame(columns=columns)
+        bucket = np.maximum(level.times[pos] - start, 0) // width
+        # usually bucket <= points, so plain bincounts over all buckets; the empty ones are dropped
+        size = int(bucket.max()) + 1
+        if size > len(pos):
+            offset, bucket = np.unique(bucket, return_inverse=True)
+            size = len(offset)
+        else:
+            offset = np.arange(size)
+        weights = level.counts[pos] if level.counts is not None else None
+        counts = np.bincount(bucket, weights, minlength=size)
+        mins, maxs = np.full(size, np.inf), np.full(size, -np.inf)
+        np.minimum.at(mins, bucket, level.mins[pos])
+        np.maximum.at(maxs, bucket, level.maxs[pos])
+        used = np.flatnonzero(counts)
+        return pd.DataFrame({
+            "date": pd.to_datetime(start + offset[used] * width),
+            "mean_price": np.bincount(bucket, level.sums[pos], minlength=size)[used] / counts[used],
+            "min_price": mins[used],
+            "max_price": maxs[used],
+        })
+
+    def box_stats(self, products, start=None, end=None, max_outliers=MAX_OUTLIERS):
+        """Quartiles, Tukey fences and (at most `max_outliers` distinct) outliers, for a precomputed go.Box."""
+        y = self.levels[0].sums[self._positions(self.levels[0], products, start, end)]
+        if not len(y):
+            return None
+        q1, median, q3 = np.percentile(y, [25, 50, 75])
+        low, high = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+        inside = y[(y >= low) & (y <= high)]
+        outliers = np.unique(y[(y < low) | (y > high)])
+        if len(outliers) > max_outliers:
+            outliers = outliers[np.linspace(0, len(outliers) - 1, max_outliers).astype("int64")]
+        return {"q1": float(q1), "median": float(median), "q3": float(q3), "mean": float(y.mean()),
+                "lowerfence": float(inside.min()), "upperfence": float(inside.max()), "outliers": outliers,
+                "count": len(y)}
@@ -1,14 +1,336 @@
-"""Simple CSV-based storage helpers (could be swapped for SQLite/Postgres)."""
-import pandas as pd
+"""Price storage: append-only backends behind one small API.
+
+    store = open_store("data/store")                # partitioned Parquet (default)
+    store = open_store("sqlite:///data/prices.db")  # SQLite file
+    store = open_store("data/prices.csv")           # a plain CSV file
+
+Every backend has
+
+    append(rows)                      add scraped rows (dicts or a DataFrame)
+    scan(product, start, end)         matching rows oldest first; all optional,
+                                      start inclusive, end exclusive
+    latest()                          the newest row per product
+
+and appends cost O(len(rows)), not O(rows stored).
+
+ParquetStore keeps one directory per scrape day (dt=YYYY-MM-DD). An append
+writes one new part file per day it touches and never reads old data. A
+day is compacted into a single file sorted by product and time when the
+next day starts or once it has COMPACT_PARTS parts, so scans read few files
+and skip row groups by their min/max statistics. latest.parquet holds the
+newest row per product and is merged with each batch. One writer at a time.
+
+SQLiteStore is one indexed table plus a latest_prices table upserted in the
+same transaction. CSVStore appends lines to the file but has to read all of
+it to scan; migrate() moves such files into one of the other stores:
+
+    python src/db.py migrate data/sample_prices.csv --to data/store
+    python src/db.py compact --store data/store
+"""
+import argparse
 import os
+import sqlite3
+import uuid
+import pandas as pd
+from normalize import parse_prices
+
+COLUMNS = ["title", "price_raw", "price", "link", "scrape_ts"]
+TEXT_COLUMNS = ["title", "price_raw", "link"]
+PRODUCT = "title"
+TS = "scrape_ts"
+TS_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+DEFAULT_STORE = os.environ.get("PRICE_STORE", "data/store")
+COMPACT_PARTS = int(os.environ.get("PRICE_STORE_COMPACT_PARTS", "64"))
+# compacted days are sorted by product, so small row groups let a product scan skip most of a file
+ROW_GROUP_SIZE = 16 * 1024
+
+
+def to_frame(rows):
+    """Scraped rows (dicts or a DataFrame) as COLUMNS with stored types.
+
+    Missing prices are parsed from price_raw (normalize.parse_prices).
+    Timestamps are naive UTC (what the scrapers write); aware ones are converted.
+    """
+    df = rows.copy() if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+    df = df.reindex(columns=COLUMNS)
+    for col in TEXT_COLUMNS:
+        df[col] = df[col].astype("string")
+    df["price"] = pd.to_numeric(df["price"], errors="coerce").astype("float64")
+    missing = df["price"].isna() & df["price_raw"].notna()
+    if missing.any():
+        df.loc[missing, "price"] = parse_prices(df.loc[missing, "price_raw"].astype(object), dtype="float64")["price"]
+    if not pd.api.types.is_datetime64_any_dtype(df[TS]) or getattr(df[TS].dt, "tz", None) is not None:
+        df[TS] = pd.to_datetime(df[TS], errors="coerce", utc=True, format="ISO8601").dt.tz_localize(None)
+    df[TS] = df[TS].astype("datetime64[us]")
+    return df.reset_index(drop=True)
+
+
+def _bound(value):
+    """A scan limit as a naive UTC Timestamp."""
+    if value is None:
+        return None
+    stamp = pd.Timestamp(value)
+    return stamp.tz_convert(None) if stamp.tz is not None else stamp
+
+
+def _filter(df, product=None, start=None, end=None):
+    start, end = _bound(start), _bound(end)
+    mask = pd.Series(True, index=df.index)
+    if product is not None:
+        mask &= df[PRODUCT] == product
+    if start is not None:
+        mask &= df[TS] >= start
+    if end is not None:
+        mask &= df[TS] < end
+    return df[mask.fillna(False)]
+
+
+def _oldest_first(df):
+    return df.sort_values(TS, kind="stable").reset_index(drop=True)
+
+
+def _newest_per_product(df):
+    df = df.dropna(subset=[PRODUCT, TS]).sort_values(TS, kind="stable")
+    return df.drop_duplicates(PRODUCT, keep="last").sort_values(PRODUCT).reset_index(drop=True)
+
+
+class ParquetStore:
+    def __init__(self, root=DEFAULT_STORE, compact_parts=COMPACT_PARTS):
+        import pyarrow as pa
+
+        self.root = str(root)
+        self.compact_parts = compact_parts
+        self.schema = pa.schema([("title", pa.string()), ("price_raw", pa.string()), ("price", pa.float64()),
+                                 ("link", pa.string()), ("scrape_ts", pa.timestamp("us"))])
+        os.makedirs(self.root, exist_ok=True)
+
+    def days(self):
+        """Partition names (YYYY-MM-DD, or "unknown" for rows without a timestamp), oldest first."""
+        return sorted(name[3:] for name in os.listdir(self.root) if name.startswith("dt="))
+
+    def parts(self, day):
+        path = os.path.join(self.root, f"dt={day}")
+        if not os.path.isdir(path):
+            return []
+        return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".parquet"))
+
+    def _write(self, df, path, **kwargs):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        pq.write_table(table, path + ".tmp", **kwargs)
+        os.replace(path + ".tmp", path)  # readers never see a half-written file
+
+    def append(self, rows):
+        df = to_frame(rows)
+        if df.empty:
+            return 0
+        newest = max((day for day in self.days() if day != "unknown"), default=None)
+        days = df[TS].dt.strftime("%Y-%m-%d").fillna("unknown")
+        for day, part in df.groupby(days, sort=True):
+            os.makedirs(os.path.join(self.root, f"dt={day}"), exist_ok=True)
+            self._write(part, os.path.join(self.root, f"dt={day}", f"part-{uuid.uuid4().hex}.parquet"))
+            if len(self.parts(day)) >= self.compact_parts:
+                self.compact(day)
+        dated = days[days != "unknown"]
+        if newest is not None and len(dated) and dated.max() > newest:
+            self.compact(newest)  # that day is over
+        self._merge_latest(df)
+        return len(df)
+
+    def compact(self, day=None):
+        """Merge each day's parts (or just `day`'s) into one sorted file; returns the days compacted.
+
+        Identical rows are dropped, so compacting again after a crash between
+        writing the merged file and removing the parts is harmless.
+        """
+        import pyarrow.parquet as pq
+
+        compacted = []
+        for name in ([day] if day is not None else self.days()):
+            parts = self.parts(name)
+            if len(parts) < 2:
+                continue
+            df = pq.read_table(parts, schema=self.schema).to_pandas()
+            df = df.drop_duplicates().sort_values([PRODUCT, TS], kind="stable")
+            self._write(df, os.path.join(self.root, f"dt={name}", f"compacted-{uuid.uuid4().hex}.parquet"),
+                        row_group_size=ROW_GROUP_SIZE)
+            for path in parts:
+                os.remove(path)
+            compacted.append(name)
+        return compacted
+
+    def scan(self, product=None, start=None, end=None):
+        import pyarrow.dataset as ds
+
+        start, end = _bound(start), _bound(end)
+        files = []
+        for day in self.days():
+            if day == "unknown":
+                keep = start is None and end is None
+            else:
+                stamp = pd.Timestamp(day)
+                keep = (start is None or stamp + pd.Timedelta(days=1) > start) and (end is None or stamp < end)
+            if keep:
+                files.extend(self.parts(day))
+        if not files:
+            return to_frame([])
+        condition = None
+        for term in [ds.field(PRODUCT) == product if product is not None else None,
+                     ds.field(TS) >= start.to_pydatetime() if start is not None else None,
+                     ds.field(TS) < end.to_pydatetime() if end is not None else None]:
+            if term is not None:
+                condition = term if condition is None else condition & term
+        table = ds.dataset(files, schema=self.schema, format="parquet").to_table(filter=condition)
+        return _oldest_first(to_frame(table.to_pandas()))
+
+    def latest(self):
+        import pyarrow.parquet as pq
+
+        path = os.path.join(self.root, "latest.parquet")
+        if not os.path.exists(path):
+            if not self.days():
+                return to_frame([])
+            self._write(_newest_per_product(self.scan()), path)  # made by an older version or copied in
+        return to_frame(pq.read_table(path, schema=self.schema).to_pandas())
+
+    def _merge_latest(self, df):
+        # without latest.parquet, latest() rebuilds it from every part, this batch's included
+        current = self.latest()
+        self._write(_newest_per_product(pd.concat([current, df], ignore_index=True)),
+                    os.path.join(self.root, "latest.parquet"))
+
+
+class SQLiteStore:
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS prices (title TEXT, price_raw TEXT, price REAL, link TEXT, scrape_ts TEXT);
+    CREATE INDEX IF NOT EXISTS ix_prices_title_ts ON prices (title, scrape_ts);
+    CREATE INDEX IF NOT EXISTS ix_prices_ts ON prices (scrape_ts);
+    CREATE TABLE IF NOT EXISTS latest_prices (
+        title TEXT PRIMARY KEY, price_raw TEXT, price REAL, link TEXT, scrape_ts TEXT);
+    """
+    UPSERT_LATEST = """
+    INSERT INTO latest_prices VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (title) DO UPDATE SET price_raw = excluded.price_raw, price = excluded.price,
+        link = excluded.link, scrape_ts = excluded.scrape_ts
+    WHERE excluded.scrape_ts >= latest_prices.scrape_ts
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # one connection per store, so its page cache stays warm between appends
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    @staticmethod
+    def _records(df):
+        df = df.assign(**{TS: df[TS].dt.strftime(TS_FORMAT)})
+        return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+    def append(self, rows):
+        df = to_frame(rows)
+        if df.empty:
+            return 0
+        with self.conn:
+            self.conn.executemany("INSERT INTO prices VALUES (?, ?, ?, ?, ?)", self._records(df))
+            self.conn.executemany(self.UPSERT_LATEST, self._records(_newest_per_product(df)))
+        return len(df)
+
+    def _query(self, sql, params=()):
+        return to_frame(pd.read_sql_query(sql, self.conn, params=params))
+
+    def scan(self, product=None, start=None, end=None):
+        where, params = [], []
+        for clause, value in [("title = ?", product), ("scrape_ts >= ?", _bound(start)), ("scrape_ts < ?", _bound(end))]:
+            if value is not None:
+                where.append(clause)
+                params.append(value.strftime(TS_FORMAT) if isinstance(value, pd.Timestamp) else value)
+        sql = "SELECT * FROM prices" + (" WHERE " + " AND ".join(where) if where else "")
+        return _oldest_first(self._query(sql + " ORDER BY scrape_ts", params))
+
+    def latest(self):
+        return self._query("SELECT * FROM latest_prices ORDER BY title")
+
+
+class CSVStore:
+    """A single CSV file: appends add lines, scans read the whole file."""
+
+    def __init__(self, path):
+        self.path = str(path)
+
+    def append(self, rows):
+        df = to_frame(rows)
+        if df.empty:
+            return 0
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        exists = os.path.exists(self.path) and os.path.getsize(self.path) > 0
+        if exists:  # keep the file's own column order (the Selenium scraper writes no price)
+            df = df.reindex(columns=pd.read_csv(self.path, nrows=0).columns)
+        df.to_csv(self.path, mode="a", header=not exists, index=False, date_format=TS_FORMAT)
+        return len(df)
+
+    def scan(self, product=None, start=None, end=None):
+        if not os.path.exists(self.path):
+            return to_frame([])
+        return _oldest_first(_filter(to_frame(pd.read_csv(self.path)), product, start, end))
+
+    def latest(self):
+        return _newest_per_product(self.scan())
+
+
+def open_store(target=None):
+    """The backend for `target`: sqlite:///path or *.db, *.csv, else a Parquet directory."""
+    target = str(target or DEFAULT_STORE)
+    if target.startswith("sqlite:///"):
+        return SQLiteStore(target[len("sqlite:///"):])
+    if target.endswith((".db", ".sqlite", ".sqlite3")):
+        return SQLiteStore(target)
+    if target.endswith(".csv"):
+        return CSVStore(target)
+    return ParquetStore(target)
+
 
 def append_to_csv(path, rows):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    df_new = pd.DataFrame(rows)
-    if os.path.exists(path):
-        df_old = pd.read_csv(path)
-        df = pd.concat([df_old, df_new], ignore_index=True)
+    """Append rows to a CSV file without rewriting it; returns the number of rows written."""
+    return CSVStore(path).append(rows)
+
+
+def migrate(sources, target, chunksize=500_000):
+    """Copy CSV files into the store at `target` chunk by chunk; returns the number of rows."""
+    store = open_store(target)
+    total = 0
+    for source in sources:
+        for chunk in pd.read_csv(source, chunksize=chunksize):
+            total += store.append(chunk)
+    if isinstance(store, ParquetStore):
+        store.compact()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the price store.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_cmd = commands.add_parser("migrate", help="copy CSV files into a store")
+    migrate_cmd.add_argument("csv", nargs="+")
+    migrate_cmd.add_argument("--to", default=DEFAULT_STORE, help="store path or sqlite:/// URL")
+    compact_cmd = commands.add_parser("compact", help="merge each day's Parquet parts")
+    compact_cmd.add_argument("--store", default=DEFAULT_STORE)
+    args = parser.parse_args()
+    if args.command == "migrate":
+        print(f"Migrated {migrate(args.csv, args.to)} rows into {args.to}")
     else:
-        df = df_new
-    df.to_csv(path, index=False)
-    return df
+        store = open_store(args.store)
+        if not isinstance(store, ParquetStore):
+            parser.error("only Parquet stores are compacted")
+        print(f"Compacted {len(store.compact())} day(s) in {args.store}")
+
+
+if __name__ == "__main__":
+    main()
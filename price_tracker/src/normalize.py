@@ -0,0 +1,184 @@
+"""Batch normalization of scraped price data.
+
+    prices = parse_prices(df["price_raw"])     # DataFrame: price (float32), currency (category)
+    df = normalize(df)                          # whole frame, compact dtypes
+
+Raw prices like "$1,249.00", "1.249,00 €", "CHF 1'249.50", "12,50 EUR" or
+"¥1,000" are parsed with the compiled regexes below. A number's decimal
+separator is the last "." or "," when both appear. When only one appears,
+it is a decimal separator if it appears once and is not followed by exactly
+three digits, and a thousands separator otherwise. A single separator
+followed by three digits is still decimal after a lone leading "0"
+("$0.999"), and for a "." in a $, £ or ¥ price ("$1.249"). Pass decimal=","
+or "." to force a locale. Spaces and apostrophes inside numbers are thousands
+separators. The currency symbol or ISO code goes into its own column.
+
+parse_prices works on whole columns. The distinct raw strings are factorized
+first and only those are parsed, with vectorized string operations on
+Arrow-backed strings. A scrape batch repeats the same few thousand price
+strings, so 10M rows cost roughly what their distinct values cost.
+parse_price is the same rules for one string, for scrapers handling one
+card at a time.
+"""
+import re
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+SYMBOLS = {
+    "US$": "USD", "C$": "CAD", "CA$": "CAD", "A$": "AUD", "AU$": "AUD", "NZ$": "NZD", "HK$": "HKD",
+    "R$": "BRL", "$": "USD", "€": "EUR", "£": "GBP", "¥": "JPY", "₹": "INR", "₩": "KRW", "₽": "RUB",
+    "₺": "TRY", "zł": "PLN",
+}
+CODES = ["USD", "EUR", "GBP", "JPY", "CNY", "INR", "CAD", "AUD", "NZD", "HKD", "CHF", "SEK", "NOK", "DKK",
+         "PLN", "CZK", "HUF", "BRL", "MXN", "KRW", "RUB", "TRY", "ZAR", "SGD"]
+
+CURRENCY_RE = re.compile(
+    "(" + "|".join(re.escape(s) for s in sorted(SYMBOLS, key=len, reverse=True))
+    + r"|\b(?:" + "|".join(CODES) + r")\b)", re.IGNORECASE)
+# digits with separators in between, ending on a digit ("1,234.50", "1 234,5", "99")
+SPACES = "\u00a0\u202f"  # no-break spaces used as thousands separators
+NUMBER_RE = re.compile(r"\d(?:[\d.,'\s" + SPACES + r"]*\d)?")
+GROUPING_RE = re.compile(r"['\s" + SPACES + "]")
+
+# currencies whose prices write "." as the decimal separator
+DOT_DECIMAL = {"USD", "GBP", "JPY"}
+
+PRODUCT_COLUMNS = ("title", "product", "item", "name")
+DATE_COLUMNS = ("scrape_ts", "date", "Date", "timestamp")
+RAW_PRICE = "price_raw"
+
+
+def currency_code(token):
+    if token is None:
+        return None
+    return SYMBOLS.get(token) or SYMBOLS.get(token.upper()) or token.upper()
+
+
+def _separator(number: str, currency: Optional[str] = None) -> str:
+    """The decimal separator of a grouping-free number string ("" if it has none)."""
+    dot, comma = number.rfind("."), number.rfind(",")
+    if dot >= 0 and comma >= 0:
+        return "." if dot > comma else ","
+    sep = "." if dot >= 0 else "," if comma >= 0 else ""
+    if not sep or number.count(sep) > 1:
+        return ""
+    if len(number) - number.rfind(sep) - 1 == 3:
+        leading_zero = number.startswith("0" + sep)
+        return sep if leading_zero or (sep == "." and currency in DOT_DECIMAL) else ""
+    return sep
+
+
+def parse_price(text, decimal: Optional[str] = None) -> Tuple[Optional[float], Optional[str]]:
+    """(price, currency code) from one raw price string; (None, None) when there is no number."""
+    if not isinstance(text, str):
+        return None, None
+    symbol = CURRENCY_RE.search(text)
+    currency = currency_code(symbol.group(0)) if symbol else None
+    match = NUMBER_RE.search(text)
+    if match is None:
+        return None, currency
+    number = GROUPING_RE.sub("", match.group(0))
+    sep = decimal or _separator(number, currency)
+    for other in ".,":
+        if other != sep:
+            number = number.replace(other, "")
+    try:
+        return float(number.replace(",", ".")), currency
+    except ValueError:  # a forced decimal separator that appears twice
+        return None, currency
+
+
+def _parse_unique(values: pd.Series, decimal: Optional[str]) -> pd.DataFrame:
+    """parse_price over a column of distinct strings, with vectorized string operations."""
+    currency = values.str.extract(CURRENCY_RE, expand=False).map(currency_code, na_action="ignore")
+    number = values.str.extract(f"({NUMBER_RE.pattern})", expand=False).astype("string[pyarrow]")
+    number = number.str.replace(GROUPING_RE.pattern, "", regex=True)
+    if decimal is None:
+        dot, comma = number.str.rfind(".").to_numpy(float, na_value=-1), number.str.rfind(",").to_numpy(float, na_value=-1)
+        last = np.maximum(dot, comma)
+        single = (dot < 0) ^ (comma < 0)
+        sep_count = np.where(dot >= 0, number.str.count(r"\.").to_numpy(float, na_value=0),
+                             number.str.count(",").to_numpy(float, na_value=0))
+        trailing = number.str.len().to_numpy(float, na_value=0) - last - 1
+        leading_zero = number.str.match(r"0[.,]").to_numpy(bool, na_value=False)
+        dot_currency = currency.isin(DOT_DECIMAL).to_numpy(bool) & (dot >= 0)
+        thousands = (trailing == 3) & ~leading_zero & ~dot_currency
+        is_decimal = (last >= 0) & ~(single & ((sep_count > 1) | thousands))
+        sep = np.where(is_decimal, np.where(dot > comma, ".", ","), "")
+    else:
+        sep = np.full(len(number), decimal)
+    no_commas = number.str.replace(",", "", regex=False)
+    cleaned = no_commas.str.replace(".", "", regex=False)
+    cleaned = cleaned.mask(sep == ".", no_commas)
+    cleaned = cleaned.mask(sep == ",", number.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    price = pd.to_numeric(cleaned, errors="coerce")
+    return pd.DataFrame({"price": price.to_numpy("float64", na_value=np.nan), "currency": currency.astype(object)})
+
+
+def parse_prices(raw, decimal: Optional[str] = None, dtype="float32") -> pd.DataFrame:
+    """price (float32 unless `dtype` says otherwise) and currency (category) for every raw price string in `raw`."""
+    raw = raw if isinstance(raw, pd.Series) else pd.Series(raw, dtype=object)
+    codes, uniques = pd.factorize(raw)
+    parsed = _parse_unique(pd.Series(uniques, dtype=object), decimal)
+    price = np.full(len(raw), np.nan, dtype=dtype)
+    found = codes >= 0
+    price[found] = parsed["price"].to_numpy()[codes[found]]
+    currencies = pd.Categorical(parsed["currency"])
+    currency = pd.Categorical.from_codes(np.where(found, currencies.codes[np.maximum(codes, 0)], -1),
+                                         categories=currencies.categories)
+    return pd.DataFrame({"price": price, "currency": currency}, index=raw.index)
+
+
+def _is_text(col: pd.Series) -> bool:
+    return col.dtype == object or pd.api.types.is_string_dtype(col.dtype)
+
+
+def _categorical(col: pd.Series) -> pd.Series:
+    """`col` stripped, as a categorical; each distinct value is stripped once."""
+    cat = pd.Categorical(col)
+    labels, uniques = pd.factorize(pd.Series(cat.categories, dtype=object).astype(str).str.strip())
+    codes = np.where(cat.codes >= 0, labels[cat.codes], -1)
+    return pd.Series(pd.Categorical.from_codes(codes, categories=uniques), index=col.index, name=col.name)
+
+
+def normalize(df: pd.DataFrame, decimal: Optional[str] = None) -> pd.DataFrame:
+    """A scraped or uploaded frame with cleaned values and compact dtypes.
+
+    Text columns are stripped (missing values stay missing); product columns
+    and price_raw become categoricals. price_raw is parsed into price
+    (keeping an existing price where the raw text has no number) and a
+    currency column. Other price/amount columns holding text are parsed the
+    same way, and numeric ones become float32. Date columns become datetimes.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if col in PRODUCT_COLUMNS or col == RAW_PRICE:
+            if _is_text(df[col]) or isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = _categorical(df[col])
+        elif _is_text(df[col]):
+            df[col] = df[col].astype("string[pyarrow]").str.strip()
+    price_cols = [c for c in df.columns if ("price" in c.lower() or "amount" in c.lower()) and c != RAW_PRICE]
+    if RAW_PRICE in df.columns:
+        parsed = parse_prices(df[RAW_PRICE], decimal)
+        if "price" in df.columns:
+            existing = parse_prices(df["price"].astype(object), decimal)["price"] if _is_text(df["price"]) \
+                else pd.to_numeric(df["price"], errors="coerce").astype("float32")
+            df["price"] = parsed["price"].fillna(existing)
+        else:
+            df["price"] = parsed["price"]
+        df["currency"] = parsed["currency"]
+        price_cols.remove("price")
+    for col in price_cols:
+        if _is_text(df[col]):
+            parsed = parse_prices(df[col].astype(object), decimal)
+            df[col] = parsed["price"]
+            if "currency" not in df.columns and parsed["currency"].notna().any():
+                df["currency"] = parsed["currency"]
+        else:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float32")
+    for col in DATE_COLUMNS:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], errors="coerce", format="ISO8601" if col == "scrape_ts" else None)
+    return df
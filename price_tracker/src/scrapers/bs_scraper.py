@@ -1,61 +1,97 @@
 """BeautifulSoup-based scraper template.
 Fill TARGET_URL and selectors for the site you have permission to scrape.
+
+Pages are fetched concurrently by engine.ScrapeEngine (pooled connections,
+at most `delay` seconds between requests to one host, retries with backoff),
+parsed on a process pool and appended to the price store as they arrive:
+
+    python src/scrapers/bs_scraper.py --pages 50 --concurrency 8 --delay 0.25 --store data/store
+
+Re-crawls are incremental: the fetch cache (--cache, see cache.py) makes
+requests conditional and only products whose price changed are stored.
 """
-import requests
-from bs4 import BeautifulSoup
-import csv
-import time
-from datetime import datetime
+import argparse
+import asyncio
+import os
+import sys
 from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+from cache import DEFAULT_CACHE, FetchCache
+from engine import ScrapeEngine
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import db  # noqa: E402
+from normalize import parse_price  # noqa: E402
 
 TARGET_URL = "https://example.com/products"  # <<-- change to allowed/test URL
 USER_AGENT = "PriceTrackerBot/1.0 (+https://yoursite.example)"
 
 HEADERS = {"User-Agent": USER_AGENT}
 
-def parse_product_card(card):
+def parse_product_card(card, base_url=TARGET_URL):
     # Example selectors — change to match your target
     title_el = card.select_one(".product-title")
     price_el = card.select_one(".price")
     link_el = card.select_one("a")
     title = title_el.get_text(strip=True) if title_el else None
     price_raw = price_el.get_text(strip=True) if price_el else None
-    link = urljoin(TARGET_URL, link_el['href']) if link_el and link_el.get('href') else None
+    link = urljoin(base_url, link_el['href']) if link_el and link_el.get('href') else None
     return {"title": title, "price_raw": price_raw, "link": link}
 
 def clean_price(price_raw):
-    if not price_raw: 
-        return None
-    # remove common currency symbols and commas
-    cleaned = price_raw.replace(",", "").replace("$", "").replace("USD", "").strip()
+    """The number in one raw price ("$1,249.00", "12,50 €"); see normalize.py for whole columns."""
+    return parse_price(price_raw)[0]
+
+def parse_page(html, url):
+    """Rows for every product card on one listing page (runs in the engine's parse pool)."""
+    soup = BeautifulSoup(html, "lxml")
+    rows = []
+    for card in soup.select(".product-card"):  # change selector
+        parsed = parse_product_card(card, url)
+        parsed['price'] = clean_price(parsed.get('price_raw'))
+        rows.append(parsed)
+    return rows
+
+def page_urls(page_limit, base_url=TARGET_URL):
+    return [f"{base_url}?page={page}" for page in range(1, page_limit + 1)]
+
+def scrape(page_limit=1, delay=1.0, store=None, concurrency=8, base_url=TARGET_URL, parse_workers=None,
+           cache=None):
+    """Crawl `page_limit` listing pages into the store; returns the engine's stats.
+
+    cache is a FetchCache database path; without one every page is downloaded,
+    parsed and stored in full.
+    """
+    target = store or db.DEFAULT_STORE
+    fetch_cache = FetchCache(cache) if cache else None
+    engine = ScrapeEngine(parse_page, sink=db.open_store(target).append, concurrency=concurrency,
+                          per_host_rate=1.0 / delay if delay > 0 else 0, parse_workers=parse_workers,
+                          headers=HEADERS, cache=fetch_cache)
     try:
-        return float(cleaned)
-    except:
-        return None
-
-def scrape(page_limit=1, delay=1.0, out_csv="data/scraped_prices.csv"):
-    results = []
-    for page in range(1, page_limit+1):
-        url = f"{TARGET_URL}?page={page}"
-        print(f"Fetching {url}")
-        r = requests.get(url, headers=HEADERS, timeout=15)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "lxml")
-        cards = soup.select(".product-card")  # change selector
-        for c in cards:
-            parsed = parse_product_card(c)
-            parsed['price'] = clean_price(parsed.get('price_raw'))
-            parsed['scrape_ts'] = datetime.utcnow().isoformat()
-            results.append(parsed)
-        time.sleep(delay)
-    # Save CSV
-    keys = ["title","price_raw","price","link","scrape_ts"]
-    with open(out_csv, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, keys)
-        writer.writeheader()
-        writer.writerows(results)
-    print(f"Wrote {len(results)} rows to {out_csv}")
-    return results
+        stats = asyncio.run(engine.run(page_urls(page_limit, base_url)))
+    finally:
+        if fetch_cache is not None:
+            fetch_cache.close()
+    for url, reason in engine.errors:
+        print(f"Failed {url}: {reason}")
+    print(f"Wrote {stats['rows']} rows from {stats['pages']} pages to {target} in {stats['seconds']}s")
+    if fetch_cache is not None:
+        print(f"Cache hit rate {stats['hit_rate']:.0%} ({stats['not_modified']} not modified, "
+              f"{stats['unchanged']} unchanged), {stats['bytes_saved'] / 1024:.0f} KiB saved, "
+              f"{stats['rows_skipped']} unchanged products skipped")
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape product listing pages into the price store.")
+    parser.add_argument("--pages", type=int, default=1)
+    parser.add_argument("--delay", type=float, default=1.0, help="seconds between requests to one host")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--store", default=db.DEFAULT_STORE, help="store directory, sqlite:/// URL or CSV file")
+    parser.add_argument("--url", default=TARGET_URL)
+    parser.add_argument("--cache", default=DEFAULT_CACHE, help="fetch cache database for incremental crawls")
+    parser.add_argument("--no-cache", action="store_true", help="download, parse and store every page")
+    args = parser.parse_args()
+    scrape(args.pages, args.delay, args.store, args.concurrency, args.url, cache=None if args.no_cache else args.cache)
 
 if __name__ == "__main__":
-    scrape(page_limit=1)
+    main()
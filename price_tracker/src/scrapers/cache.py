@@ -0,0 +1,147 @@
+"""Persistent fetch cache for incremental crawls.
+
+    cache = FetchCache("data/fetch_cache.db")
+    engine = ScrapeEngine(parse_page, sink=store.append, cache=cache)
+
+Per URL it keeps the ETag / Last-Modified the server sent, a hash of the
+body and its size. The engine sends them back as If-None-Match /
+If-Modified-Since; a 304, or a 200 whose body hashes the same as last time,
+means the page is unchanged and it is neither parsed nor stored.
+
+Per product (its link, else its title) it keeps a fingerprint of the
+title and raw price last recorded, so from a page that did change only the
+products whose price changed (or that are new) reach the store. Storage
+grows with price changes, not with how often the catalog is crawled.
+
+What a page's fetch and parse learn is staged (stage()) rather than
+recorded: the engine commit()s a page's entries only once the sink has
+stored its rows, and save() writes committed entries to SQLite. A page
+whose parse or storage failed therefore leaves no trace, and the next
+crawl fetches and stores it again. close() does not save.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+DEFAULT_CACHE = os.environ.get("FETCH_CACHE", "data/fetch_cache.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body_hash TEXT, size INTEGER, checked_ts TEXT
+);
+CREATE TABLE IF NOT EXISTS products (
+    key TEXT PRIMARY KEY, fingerprint TEXT, seen_ts TEXT
+);
+"""
+
+
+def digest(data) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8", "surrogatepass")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def product_key(row: dict) -> Optional[str]:
+    return row.get("link") or row.get("title")
+
+
+def fingerprint(row: dict) -> str:
+    return digest(f"{row.get('title')}\x1f{row.get('price_raw')}")
+
+
+class Staged(NamedTuple):
+    """One page's cache entries, waiting for its rows to be stored."""
+    pages: Dict[str, tuple]
+    products: Dict[str, str]
+
+
+class FetchCache:
+    def __init__(self, path: str = DEFAULT_CACHE):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.pages: Dict[str, tuple] = {
+            url: (etag, last_modified, body_hash, size)
+            for url, etag, last_modified, body_hash, size in self.conn.execute(
+                "SELECT url, etag, last_modified, body_hash, size FROM pages")
+        }
+        self.products: Dict[str, str] = dict(self.conn.execute("SELECT key, fingerprint FROM products"))
+        self._dirty_pages: Dict[str, tuple] = {}
+        self._dirty_products: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def conditional_headers(self, url: str) -> dict:
+        entry = self.pages.get(url)
+        if entry is None:
+            return {}
+        etag, last_modified = entry[0], entry[1]
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def cached_size(self, url: str) -> int:
+        entry = self.pages.get(url)
+        return (entry[3] or 0) if entry else 0
+
+    def stage(self) -> Staged:
+        return Staged({}, {})
+
+    def page_changed(self, url: str, headers, body: bytes, staged: Staged) -> bool:
+        """Stage the 200 for `url`; False when the body is the same as last time."""
+        body_hash = digest(body)
+        old = self.pages.get(url)
+        entry = (headers.get("ETag"), headers.get("Last-Modified"), body_hash, len(body))
+        if entry != old:
+            staged.pages[url] = entry
+        return old is None or old[2] != body_hash
+
+    def new_observations(self, rows: List[dict], staged: Staged) -> List[dict]:
+        """The rows whose product is new or whose title/price differ from the last one recorded."""
+        fresh = []
+        for row in rows:
+            key = product_key(row)
+            if key is None:
+                fresh.append(row)
+                continue
+            fp = fingerprint(row)
+            if self.products.get(key) != fp and staged.products.get(key) != fp:
+                staged.products[key] = fp
+                fresh.append(row)
+        return fresh
+
+    def commit(self, staged: Staged):
+        """Record a page's staged entries (its rows are stored); save() persists them."""
+        with self._lock:
+            self.pages.update(staged.pages)
+            self.products.update(staged.products)
+            self._dirty_pages.update(staged.pages)
+            self._dirty_products.update(staged.products)
+
+    def save(self):
+        with self._lock:
+            pages, self._dirty_pages = self._dirty_pages, {}
+            products, self._dirty_products = self._dirty_products, {}
+        if not pages and not products:
+            return
+        now = datetime.utcnow().isoformat()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, body_hash, size, checked_ts) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(url, *entry, now) for url, entry in pages.items()])
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO products (key, fingerprint, seen_ts) VALUES (?, ?, ?)",
+                [(key, fp, now) for key, fp in products.items()])
+
+    def close(self):
+        """Close the database; entries not yet saved are dropped."""
+        self.conn.close()
@@ -0,0 +1,229 @@
+"""Asyncio crawl engine: pooled HTTP client, bounded concurrency, per-host politeness.
+
+    engine = ScrapeEngine(parse_page, sink=store.append, concurrency=16, per_host_rate=4)
+    stats = asyncio.run(engine.run(urls))
+
+`concurrency` worker coroutines share one httpx.AsyncClient (keep-alive
+connections are reused across pages). Requests to a host are spaced
+1/per_host_rate seconds apart by HostLimiter, which only delays requests
+to that host instead of sleeping the whole crawl. 429/5xx responses and
+transport errors are retried up to `retries` times with jittered
+exponential backoff, or after the server's Retry-After when that is longer,
+and the host's limiter is pushed back by the same amount.
+
+Pages are parsed by `parse(html, url) -> list of row dicts` on a process
+pool (parse_workers; 0 parses inline), so BeautifulSoup does not hold up
+the event loop. Rows are stamped with scrape_ts and streamed to
+`sink(rows)` from a thread, in batches of batch_size or whatever arrived
+within flush_seconds, so a slow crawl still lands in storage as it goes.
+
+With a cache (cache.FetchCache) requests are conditional: a 304, or a body
+identical to last time, skips parsing and storage, and only rows whose
+price changed reach the sink. stats then include the cache hit rate and
+the bytes that 304s saved. A page's cache entries follow its rows through
+the writer and are committed and saved only after the sink has stored
+them; nothing is saved when the sink fails.
+
+A page that still fails after its retries, or whose parse raises, is
+counted in stats["failed"] and listed in `errors` as (url, reason); the
+rest of the crawl carries on.
+"""
+import asyncio
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from cache import FetchCache, Staged
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+UNCHANGED = object()  # fetch() result for a page that is the same as last crawl
+
+
+class HostLimiter:
+    """Spaces requests to each host at least 1/rate seconds apart."""
+
+    def __init__(self, rate: float, clock=time.monotonic):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.clock = clock
+        self._next: Dict[str, float] = {}
+
+    async def wait(self, host: str):
+        now = self.clock()
+        slot = max(now, self._next.get(host, now))
+        self._next[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def defer(self, host: str, seconds: float):
+        """Nothing goes to `host` for the next `seconds` (it asked us to back off)."""
+        self._next[host] = max(self._next.get(host, 0.0), self.clock() + seconds)
+
+
+def retry_after(response: httpx.Response) -> float:
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", "")))
+    except ValueError:
+        return 0.0
+
+
+class ScrapeEngine:
+    def __init__(self, parse: Callable[[str, str], List[dict]], sink: Optional[Callable[[List[dict]], object]] = None,
+                 concurrency: int = 16, per_host_rate: float = 4.0, retries: int = 3, backoff: float = 0.5,
+                 timeout: float = 15.0, parse_workers: Optional[int] = None, batch_size: int = 500,
+                 flush_seconds: float = 5.0, headers: Optional[dict] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None, cache: Optional[FetchCache] = None):
+        self.parse = parse
+        self.sink = sink
+        self.concurrency = concurrency
+        self.limiter = HostLimiter(per_host_rate)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.parse_workers = os.cpu_count() if parse_workers is None else parse_workers
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.headers = headers or {}
+        self.transport = transport
+        self.cache = cache
+        self.stats = {"pages": 0, "failed": 0, "retries": 0, "rows": 0, "not_modified": 0, "unchanged": 0,
+                      "rows_skipped": 0, "bytes": 0, "bytes_saved": 0}
+        self.errors: List[tuple] = []
+
+    async def fetch(self, client: httpx.AsyncClient, url: str, staged: Optional[Staged] = None):
+        """The page's text, UNCHANGED, or None once retries are exhausted."""
+        host = urlsplit(url).netloc
+        headers = self.cache.conditional_headers(url) if self.cache is not None else None
+        for attempt in range(self.retries + 1):
+            await self.limiter.wait(host)
+            wait = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+            try:
+                response = await client.get(url, headers=headers)
+            except httpx.TransportError as exc:
+                reason = type(exc).__name__
+            else:
+                if response.status_code == 304 and headers:
+                    self.stats["not_modified"] += 1
+                    self.stats["bytes_saved"] += self.cache.cached_size(url)
+                    return UNCHANGED
+                if response.status_code == 200:
+                    self.stats["bytes"] += len(response.content)
+                    if self.cache is not None and not self.cache.page_changed(url, response.headers,
+                                                                              response.content, staged):
+                        self.stats["unchanged"] += 1
+                        return UNCHANGED
+                    return response.text
+                reason = f"HTTP {response.status_code}"
+                if response.status_code not in RETRY_STATUSES:
+                    break
+                pause = retry_after(response)
+                if pause:
+                    self.limiter.defer(host, pause)
+                    wait = max(wait, pause)
+            if attempt < self.retries:
+                self.stats["retries"] += 1
+                await asyncio.sleep(wait)
+        self.stats["failed"] += 1
+        self.errors.append((url, reason))
+        return None
+
+    async def crawl_page(self, client: httpx.AsyncClient, url: str, pool, rows: asyncio.Queue):
+        """Fetch and parse one page, queueing its rows (then its staged cache entries) for the sink."""
+        staged = self.cache.stage() if self.cache is not None else None
+        html = await self.fetch(client, url, staged)
+        if html is None:
+            return
+        if html is UNCHANGED:
+            if staged is not None and staged.pages:  # new validators for the same body
+                rows.put_nowait(staged)
+            self.stats["pages"] += 1
+            return
+        if pool is None:
+            parsed = self.parse(html, url)
+        else:
+            parsed = await asyncio.get_running_loop().run_in_executor(pool, self.parse, html, url)
+        if self.cache is not None:
+            fresh = self.cache.new_observations(parsed, staged)
+            self.stats["rows_skipped"] += len(parsed) - len(fresh)
+            parsed = fresh
+        scrape_ts = datetime.utcnow().isoformat()
+        for row in parsed:
+            row.setdefault("scrape_ts", scrape_ts)
+            rows.put_nowait(row)
+        if staged is not None:
+            rows.put_nowait(staged)  # behind the page's rows: committed once they are stored
+        self.stats["pages"] += 1
+
+    async def run(self, urls: Iterable[str]) -> dict:
+        start = time.perf_counter()
+        todo: asyncio.Queue = asyncio.Queue()
+        for url in urls:
+            todo.put_nowait(url)
+        rows: asyncio.Queue = asyncio.Queue()
+        pool = ProcessPoolExecutor(self.parse_workers) if self.parse_workers > 0 else None
+        loop = asyncio.get_running_loop()
+
+        async def worker(client):
+            while True:
+                try:
+                    url = todo.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    await self.crawl_page(client, url, pool, rows)
+                except Exception as exc:  # one bad page must not stop the crawl
+                    self.stats["failed"] += 1
+                    self.errors.append((url, f"{type(exc).__name__}: {exc}"))
+
+        async def writer():
+            batch, staged, deadline, done = [], [], None, False
+            while not done:
+                try:
+                    row = await asyncio.wait_for(rows.get(), None if deadline is None else deadline - loop.time())
+                except asyncio.TimeoutError:
+                    row = ...  # flush_seconds are up
+                if row is None:
+                    done = True
+                elif isinstance(row, Staged):
+                    staged.append(row)
+                elif row is not ...:
+                    if not batch:
+                        deadline = loop.time() + self.flush_seconds
+                    batch.append(row)
+                flushed = False
+                if batch and (done or row is ... or len(batch) >= self.batch_size):
+                    self.stats["rows"] += len(batch)
+                    if self.sink is not None:
+                        await asyncio.to_thread(self.sink, batch)
+                    batch, deadline, flushed = [], None, True
+                if staged and not batch:
+                    # every row queued before these entries has been stored
+                    for entries in staged:
+                        self.cache.commit(entries)
+                    staged = []
+                if flushed and self.cache is not None:
+                    await asyncio.to_thread(self.cache.save)
+
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        sink_task = asyncio.create_task(writer())
+        try:
+            async with httpx.AsyncClient(headers=self.headers, timeout=self.timeout, limits=limits,
+                                         transport=self.transport, follow_redirects=True) as client:
+                await asyncio.gather(*(worker(client) for _ in range(self.concurrency)))
+        finally:
+            try:
+                rows.put_nowait(None)
+                await sink_task
+            finally:
+                if pool is not None:
+                    pool.shutdown()
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.save)
+        hits = self.stats["not_modified"] + self.stats["unchanged"]
+        return dict(self.stats, hit_rate=round(hits / self.stats["pages"], 3) if self.stats["pages"] else 0.0,
+                    seconds=round(time.perf_counter() - start, 3))
@@ -1,64 +1,240 @@
 """Selenium scraper template for JS-heavy pages.
 Requires a compatible webdriver (e.g., chromedriver) in PATH.
+
+A BrowserPool keeps N headless Chromes warm; crawl() hands a queue of URLs
+to one worker thread per browser, and each worker reuses its browser's tab
+from page to page. A page costs two WebDriver round-trips: get() (returning
+at DOMContentLoaded) and one async script that waits in the page for the
+cards to render and returns all of them. block_assets=True stops Chrome
+from downloading images and fonts. A browser that crashes is replaced and
+its page retried.
+
+    python src/scrapers/selenium_scraper.py --url https://example.com/a --url https://example.com/b --workers 4
 """
+import argparse
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import csv
-from datetime import datetime
-import time
-import os
+from selenium.webdriver.chrome.service import Service
+from bs_scraper import clean_price
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import db  # noqa: E402
 
-CHROME_DRIVER_PATH = os.environ.get("CHROMEDRIVER_PATH", "chromedriver")  # put chromedriver in PATH or set env
+CHROME_DRIVER_PATH = os.environ.get("CHROMEDRIVER_PATH")  # None: chromedriver from PATH / Selenium Manager
 START_URL = "https://example.com"  # change to allowed/test URL
+POOL_SIZE = int(os.environ.get("SELENIUM_POOL_SIZE", "4"))
 
-def start_driver(headless=True):
+SELECTORS = {"card": ".product-card", "title": ".product-title", "price": ".price", "link": "a"}
+BLOCKED_URLS = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+                "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"]
+
+# Waits (polling inside the page, not over WebDriver) until a card exists or
+# the timeout passes, then returns every card's fields in one response.
+EXTRACT_CARDS_JS = """
+var sel = arguments[0], deadline = Date.now() + arguments[1], done = arguments[arguments.length - 1];
+function text(card, s) { var el = card.querySelector(s); return el ? el.textContent.trim() : null; }
+function extract(cards) {
+  return Array.prototype.map.call(cards, function (card) {
+    var link = card.querySelector(sel.link);
+    return {title: text(card, sel.title), price_raw: text(card, sel.price), link: link ? link.href : null};
+  });
+}
+(function poll() {
+  var cards = document.querySelectorAll(sel.card);
+  if (cards.length || Date.now() > deadline) { done(extract(cards)); } else { setTimeout(poll, 50); }
+})();
+"""
+
+def start_driver(headless=True, block_assets=False, timeout=10):
     opts = Options()
     if headless:
         opts.add_argument("--headless=new")
     opts.add_argument("--no-sandbox")
     opts.add_argument("--disable-dev-shm-usage")
-    driver = webdriver.Chrome(CHROME_DRIVER_PATH, options=opts)
+    # get() returns at DOMContentLoaded; EXTRACT_CARDS_JS does the waiting
+    opts.page_load_strategy = "eager"
+    if block_assets:
+        opts.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    service = Service(CHROME_DRIVER_PATH) if CHROME_DRIVER_PATH else Service()
+    driver = webdriver.Chrome(service=service, options=opts)
+    driver.set_page_load_timeout(timeout * 3)
+    driver.set_script_timeout(timeout + 5)
+    if block_assets:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
     return driver
 
-def scrape(out_csv="data/scraped_prices_selenium.csv"):
-    driver = start_driver(headless=True)
-    driver.get(START_URL)
-    wait = WebDriverWait(driver, 10)
-    # Example: wait for product cards to load
-    wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".product-card")))
-    cards = driver.find_elements(By.CSS_SELECTOR, ".product-card")
-    results = []
-    for c in cards:
+class BrowserPool:
+    """`size` browsers started in parallel up front; borrow one with acquire()/release()."""
+
+    def __init__(self, size=POOL_SIZE, headless=True, block_assets=False, factory=None):
+        self.size = size
+        self.factory = factory or partial(start_driver, headless, block_assets)
+        self.restarts = 0
+        self._idle = queue.Queue()
+        with ThreadPoolExecutor(size) as executor:
+            futures = [executor.submit(self.factory) for _ in range(size)]
+        for future in futures:
+            if future.exception() is None:
+                self._idle.put(future.result())
+        failed = next((f.exception() for f in futures if f.exception() is not None), None)
+        if failed is not None:
+            self.close()  # don't leave the browsers that did start running
+            raise failed
+
+    def acquire(self):
+        return self._idle.get()
+
+    def release(self, driver):
+        self._idle.put(driver)
+
+    def restart(self, driver):
+        """A fresh browser in place of one that crashed or hung."""
         try:
-            title = c.find_element(By.CSS_SELECTOR, ".product-title").text
-        except:
-            title = None
+            driver.quit()
+        except WebDriverException:
+            pass
+        self.restarts += 1
+        return self.factory()
+
+    def close(self):
+        for _ in range(self.size):
+            try:
+                self._idle.get_nowait().quit()
+            except queue.Empty:
+                break
+            except WebDriverException:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def scrape_page(driver, url, timeout=10):
+    """All product cards on `url`, in two WebDriver round-trips."""
+    driver.get(url)
+    rows = driver.execute_async_script(EXTRACT_CARDS_JS, SELECTORS, timeout * 1000)
+    scrape_ts = datetime.utcnow().isoformat()
+    for row in rows:
+        row["price"] = clean_price(row["price_raw"])
+        row["scrape_ts"] = scrape_ts
+    return rows
+
+def crawl(urls, pool, sink=None, timeout=10, retries=1, batch_size=500):
+    """Scrape `urls` on every browser in `pool` at once.
+
+    Rows go to sink(rows) in batches of about batch_size as pages finish,
+    from one writer thread, so page workers never wait on storage. Returns
+    stats and the (url, error) pairs of pages that failed.
+    A worker whose browser cannot be restarted stops; the others finish its
+    share of the URLs.
+    """
+    todo = queue.Queue()
+    for url in urls:
+        todo.put(url)
+    lock = threading.Lock()
+    pending, errors = [], []
+    batches = queue.Queue()
+    stats = {"pages": 0, "failed": 0, "rows": 0}
+
+    def flush(force=False):
+        # called with `lock` held; only hands the batch over, the writer stores it
+        if pending and (force or len(pending) >= batch_size):
+            batches.put(pending[:])
+            stats["rows"] += len(pending)
+            pending.clear()
+
+    def write():
+        while True:
+            batch = batches.get()
+            if batch is None:
+                return
+            if sink is not None:
+                sink(batch)
+
+    def fail(url, error):
+        with lock:
+            stats["failed"] += 1
+            errors.append((url, error))
+
+    def work():
+        driver = pool.acquire()
         try:
-            price_raw = c.find_element(By.CSS_SELECTOR, ".price").text
-        except:
-            price_raw = None
+            while driver is not None:
+                try:
+                    url = todo.get_nowait()
+                except queue.Empty:
+                    return
+                rows = None
+                for attempt in range(retries + 1):
+                    try:
+                        rows = scrape_page(driver, url, timeout)
+                        break
+                    except WebDriverException as exc:
+                        error = exc.msg or type(exc).__name__
+                    try:
+                        driver = pool.restart(driver)
+                    except Exception as exc:  # the old browser is gone and no new one started
+                        driver = None
+                        error = f"{error} (browser restart failed: {type(exc).__name__}: {exc})"
+                        break
+                if rows is None:
+                    fail(url, error)
+                    continue
+                with lock:
+                    stats["pages"] += 1
+                    pending.extend(rows)
+                    flush()
+        finally:
+            if driver is not None:
+                pool.release(driver)
+
+    with ThreadPoolExecutor(pool.size + 1) as executor:
+        writer = executor.submit(write)
         try:
-            link = c.find_element(By.CSS_SELECTOR, "a").get_attribute("href")
-        except:
-            link = None
-        results.append({
-            "title": title,
-            "price_raw": price_raw,
-            "link": link,
-            "scrape_ts": datetime.utcnow().isoformat()
-        })
-    # save
-    keys = ["title","price_raw","link","scrape_ts"]
-    with open(out_csv, "w", newline='', encoding="utf-8") as f:
-        writer = csv.DictWriter(f, keys)
-        writer.writeheader()
-        writer.writerows(results)
-    driver.quit()
-    print(f"Wrote {len(results)} rows to {out_csv}")
-    return results
+            for future in [executor.submit(work) for _ in range(pool.size)]:
+                future.result()
+        finally:
+            while not todo.empty():  # every browser was lost
+                fail(todo.get_nowait(), "no browser left in the pool")
+            with lock:
+                flush(force=True)
+            batches.put(None)
+        writer.result()
+    return stats, errors
+
+def scrape(urls=None, store=None, workers=POOL_SIZE, headless=True, block_assets=False):
+    target = store or db.DEFAULT_STORE
+    with BrowserPool(workers, headless=headless, block_assets=block_assets) as pool:
+        stats, errors = crawl(urls or [START_URL], pool, sink=db.open_store(target).append)
+    for url, error in errors:
+        print(f"Failed {url}: {error}")
+    print(f"Wrote {stats['rows']} rows from {stats['pages']} pages to {target}")
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape JS-rendered product pages into the price store.")
+    parser.add_argument("--url", action="append", help="page to scrape (repeatable)")
+    parser.add_argument("--urls-file", help="file with one URL per line")
+    parser.add_argument("--workers", type=int, default=POOL_SIZE, help="browsers in the pool")
+    parser.add_argument("--block-assets", action="store_true", help="do not load images and fonts")
+    parser.add_argument("--store", default=db.DEFAULT_STORE)
+    args = parser.parse_args()
+    urls = list(args.url or [])
+    if args.urls_file:
+        with open(args.urls_file, encoding="utf-8") as f:
+            urls += [line.strip() for line in f if line.strip()]
+    scrape(urls or None, args.store, args.workers, block_assets=args.block_assets)
 
 if __name__ == "__main__":
-    scrape()
\ No newline at end of file
+    main()
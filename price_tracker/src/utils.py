@@ -1,15 +1,15 @@
-"""Utility helpers for reading/saving CSV and basic cleaning."""
-import pandas as pd
+"""Utility helpers for reading/saving price data and basic cleaning."""
+from db import open_store
+from normalize import normalize
 
-def load_csv(path):
-    return pd.read_csv(path)
+def load_csv(path, product=None, start=None, end=None):
+    """Price rows from a CSV file or any store db.open_store understands, oldest first."""
+    return open_store(path).scan(product, start, end)
 
 def basic_clean(df, price_col="price"):
-    df = df.copy()
+    # parse prices/currencies, strip text, compact dtypes, datetimes
+    df = normalize(df)
     # drop rows without price
     if price_col in df.columns:
         df = df.dropna(subset=[price_col])
-    # convert datetime if present
-    if 'scrape_ts' in df.columns:
-        df['scrape_ts'] = pd.to_datetime(df['scrape_ts'], errors='coerce')
-    return df
\ No newline at end of file
+    return df
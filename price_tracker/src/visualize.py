@@ -1,17 +1,32 @@
-"""Create simple trend visualizations from CSV data using Matplotlib & Plotly.
+"""Create simple trend visualizations from the price store using Matplotlib & Plotly.
 Usage:
-    python src/visualize.py --csv data/sample_prices.csv --out figures/price_trends.png
+    python src/visualize.py --store data/store --out figures/price_trends.png
+    python src/visualize.py --csv data/sample_prices.csv --product "Acme Phone X" --out figures/phone.png
+
+The HTML output (and the Streamlit app's "Advanced analytics" panel) is
+advanced_plot: prices with their rolling mean and min/max band, and the
+drops / new lows / anomalies found by analytics.py marked on the lines.
 """
 import argparse
 import os
-import pandas as pd
 import matplotlib.pyplot as plt
-import plotly.express as px
+import plotly.graph_objects as go
+from plotly.colors import DEFAULT_PLOTLY_COLORS
+from analytics import DROP, WINDOW, ZSCORE, alerts, compute, summary
+from db import DEFAULT_STORE, PRODUCT, TS
+from downsample import downsample
+from utils import load_csv
+
+ALERT_MARKERS = {"drop": ("triangle-down", "crimson"), "new_low": ("star", "darkgreen"),
+                 "anomaly": ("x", "darkorange")}
 
 def plot_matplotlib(df, out_path):
     df = df.sort_values('scrape_ts')
     plt.figure(figsize=(10,5))
-    plt.plot(df['scrape_ts'], df['price'], marker='o')
+    for title, group in df.groupby('title', observed=True):
+        plt.plot(group['scrape_ts'], group['price'], marker='o', label=title)
+    if df['title'].nunique() <= 10:
+        plt.legend()
     plt.title('Price over time')
     plt.xlabel('Time')
     plt.ylabel('Price')
@@ -20,19 +35,65 @@ def plot_matplotlib(df, out_path):
     plt.savefig(out_path)
     print(f"Saved matplotlib plot to {out_path}")
 
+def advanced_plot(df, price_col='price', date_col='scrape_ts', product_col=None, window=WINDOW, drop=DROP,
+                  zscore=ZSCORE, max_points=None, method='lttb'):
+    """Plotly figure of each product's price, rolling mean and min/max band, with alerts marked.
+
+    With max_points, each product's lines are downsampled to about that many
+    points (see downsample.py) after the stats are computed; alert markers
+    are always all drawn.
+    """
+    if product_col is None:
+        product_col = next((c for c in df.columns if c.lower() in ('title', 'product', 'item', 'name')), None)
+    frame = df.rename(columns={price_col: 'price', date_col: TS})
+    frame[PRODUCT] = frame[product_col].astype(str) if product_col else 'all'
+    stats = compute(frame[[PRODUCT, TS, 'price']], window)
+    fig = go.Figure()
+    for i, (product, group) in enumerate(stats.groupby(PRODUCT, sort=True)):
+        color = DEFAULT_PLOTLY_COLORS[i % len(DEFAULT_PLOTLY_COLORS)]
+        if max_points and len(group) > max_points:
+            group = group.iloc[downsample(group[TS].to_numpy(), group['price'].to_numpy(), max_points, method)]
+        fig.add_trace(go.Scatter(x=group[TS], y=group['roll_max'], line=dict(width=0), showlegend=False,
+                                 legendgroup=product, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=group[TS], y=group['roll_min'], line=dict(width=0), fill='tonexty',
+                                 fillcolor=color.replace('rgb', 'rgba').replace(')', ', 0.12)'), showlegend=False,
+                                 legendgroup=product, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=group[TS], y=group['price'], name=product, legendgroup=product,
+                                 mode='lines+markers', line=dict(color=color)))
+        fig.add_trace(go.Scatter(x=group[TS], y=group['roll_mean'], name=f'{product} ({window} mean)',
+                                 legendgroup=product, mode='lines', line=dict(color=color, dash='dot')))
+    events = alerts(stats, drop, zscore)
+    for kind, (symbol, color) in ALERT_MARKERS.items():
+        hits = [e for e in events if e.kind == kind]
+        if hits:
+            fig.add_trace(go.Scatter(x=[e.ts for e in hits], y=[e.price for e in hits], name=kind, mode='markers',
+                                     marker=dict(symbol=symbol, size=11, color=color),
+                                     text=[str(e) for e in hits], hoverinfo='text'))
+    fig.update_layout(title=f'Price over time ({window} rolling mean and range)', xaxis_title='Time',
+                      yaxis_title='Price', hovermode='closest')
+    return fig
+
 def plot_plotly(df, out_path):
-    fig = px.line(df.sort_values('scrape_ts'), x='scrape_ts', y='price', title='Price over time')
+    fig = advanced_plot(df)
     fig.write_html(out_path)
     print(f"Saved interactive plot to {out_path}")
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--csv", required=True)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--store", default=DEFAULT_STORE, help="store directory, sqlite:/// URL or CSV file")
+    source.add_argument("--csv", dest="store", help="same as --store, for a CSV file")
+    parser.add_argument("--product", help="only this product (title)")
+    parser.add_argument("--start", help="from this time (inclusive)")
+    parser.add_argument("--end", help="up to this time (exclusive)")
     parser.add_argument("--out", required=True)
     args = parser.parse_args()
-    df = pd.read_csv(args.csv, parse_dates=['scrape_ts'])
-    # basic aggregation: latest price per title
+    df = load_csv(args.store, args.product, args.start, args.end)
     df = df.dropna(subset=['price'])
+    # basic aggregation: latest price per title, with its rolling stats
+    latest = summary(compute(df))
+    print(latest[['scrape_ts', 'price', 'roll_mean', 'roll_min', 'roll_max', 'all_time_low', 'pct_change']]
+          .round(2).to_string())
     # Save a matplotlib PNG and a Plotly HTML
     plot_matplotlib(df, args.out)
     plot_plotly(df, args.out.replace('.png', '.html'))
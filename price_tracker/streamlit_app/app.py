@@ -1,9 +1,20 @@
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import plotly.graph_objects as go
+import io
 from pathlib import Path
 import os
+import sys
+
+# price data is read through the project's storage backends (src/db.py)
+SRC = Path(__file__).resolve().parents[1] / 'src'
+if str(SRC) not in sys.path:
+    sys.path.append(str(SRC))
+import dashboard  # noqa: E402
+import db  # noqa: E402
+import downsample  # noqa: E402
+import normalize  # noqa: E402
 
 # try to import project modules if present (use friendly fallbacks)
 try:
@@ -19,120 +30,157 @@ except Exception:
 st.set_page_config(page_title='Price Tracker — Client Ready', page_icon='💸', layout='wide')
 
 # --- helper functions
+def load_store_data(target, product=None, start=None, end=None):
+    """Rows from a price store (or CSV) named for this app's column detection."""
+    df = db.open_store(target).scan(product, start, end)
+    return df.drop(columns=['price_raw']).rename(columns={'title': 'product', 'scrape_ts': 'date'})
+
+def sample_path():
+    return Path(__file__).resolve().parents[1] / 'data' / 'sample_prices.csv'
+
 def load_sample_data():
-    sample = Path(__file__).resolve().parents[1] / 'data' / 'sample_prices.csv'
+    sample = sample_path()
     if sample.exists():
-        return pd.read_csv(sample)
+        return load_store_data(sample)
     return pd.DataFrame()
 
 def clean_df(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    for c in df.columns:
-        if df[c].dtype == object:
-            df[c] = df[c].astype(str).str.strip()
-    for col in ['date', 'Date', 'timestamp']:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors='coerce')
-    for col in df.columns:
-        if 'price' in col.lower() or 'amount' in col.lower():
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-    return df
+    # whole-column cleaning: "$1,299.00" / "1.299,00 €" prices, currency column, compact dtypes
+    return normalize.normalize(df)
+
+# --- cached data layer
+# The prepared dataset (sorted frame, product index, aggregates) is a cache
+# *resource*: st.cache_data would pickle and copy millions of rows on every
+# rerun. It is keyed by a fingerprint of the source, so a rewritten store or a
+# different upload is loaded again and every widget change reuses it. The
+# small results derived from it (trend buckets, box stats, the analytics
+# figure) are cache_data, keyed by the same fingerprint plus the selection.
+@st.cache_resource(max_entries=2, show_spinner='Loading and indexing prices…')
+def prepared_store(target, fingerprint):
+    return dashboard.PriceData(clean_df(load_store_data(target)))
+
+@st.cache_resource(max_entries=2, show_spinner='Loading and indexing prices…')
+def prepared_upload(digest, _data: bytes):
+    return dashboard.PriceData(clean_df(pd.read_csv(io.BytesIO(_data))))
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def sample_csv(fingerprint):
+    return load_sample_data().to_csv(index=False)
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def cached_trend(key, _data, products, start, end):
+    return _data.trend(list(products), start, end)
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def cached_box(key, _data, products, start, end):
+    return _data.box_stats(list(products), start, end)
+
+@st.cache_data(max_entries=32, show_spinner='Computing analytics…')
+def cached_advanced(key, _data, products, start, end, method):
+    rows = _data.rows(list(products), start, end)
+    return visualize_mod.advanced_plot(rows, price_col=_data.price_col, date_col=_data.date_col,
+                                       product_col=_data.product_col, max_points=dashboard.POINTS, method=method)
 
 with st.sidebar:
     st.title('Price Tracker')
     st.markdown('A polished client-ready demo of the Price Tracker project.')
     st.info('Upload a CSV with columns: product, price, date (optional).')
     st.divider()
+    store_path = st.text_input('Price store', value=db.DEFAULT_STORE,
+                               help='Store directory, sqlite:/// URL or CSV file written by the scrapers')
+    use_store = st.checkbox('Load from price store', value=os.path.exists(store_path.replace('sqlite:///', '')))
     show_sample = st.checkbox('Load sample dataset', value=True)
     upload = st.file_uploader('Upload CSV', type=['csv'])
+    method = st.selectbox('Line downsampling', options=list(downsample.METHODS)[::-1],
+                          help='lttb keeps the shape of each line; minmax keeps every spike and dip')
     st.divider()
     st.markdown('**Export**')
-    st.download_button('Download sample CSV', data=load_sample_data().to_csv(index=False), file_name='sample_prices.csv', mime='text/csv')
+    st.download_button('Download sample CSV', data=sample_csv(dashboard.fingerprint(sample_path())),
+                       file_name='sample_prices.csv', mime='text/csv')
     st.caption('Contact: you@yourcompany.com')
 
 st.title('Price Tracker — Client-Ready Demo')
 st.subheader('Clean UI • Better UX • Ready for handoff')
 
-if upload is not None:
-    try:
-        df = pd.read_csv(upload)
+data, key = None, None
+try:
+    if upload is not None:
+        # hash the upload once, not on every rerun
+        upload_key = f'upload-digest:{upload.name}:{upload.size}'
+        if upload_key not in st.session_state:
+            st.session_state[upload_key] = dashboard.digest(upload.getvalue())
+        key = st.session_state[upload_key]
+        data = prepared_upload(key, upload.getvalue())
         st.success('CSV loaded successfully')
-    except Exception as e:
-        st.error(f'Unable to read uploaded file: {e}')
-        df = pd.DataFrame()
-elif show_sample:
-    df = load_sample_data()
-else:
-    df = pd.DataFrame()
+    elif use_store:
+        key = dashboard.fingerprint(store_path)
+        data = prepared_store(store_path, key)
+    elif show_sample:
+        key = dashboard.fingerprint(sample_path())
+        data = prepared_store(str(sample_path()), key)
+except ValueError as e:
+    st.error(f'{e}. Please ensure your CSV contains a price or amount column.')
+    st.stop()
+except Exception as e:
+    st.error(f'Unable to read the data: {e}')
+    st.stop()
 
-if df.empty:
+if data is None or len(data) == 0:
     st.warning('No data available. Please upload a CSV or enable the sample dataset in the sidebar.')
     st.stop()
 
-df = clean_df(df)
-
 with st.expander('Dataset preview & summary', expanded=True):
     st.write('**Preview (first 10 rows)**')
-    st.dataframe(df.head(10), use_container_width=True)
-    st.write('**Columns**: ' + ', '.join(df.columns.tolist()))
+    st.dataframe(data.frame.head(10), use_container_width=True)
+    st.write('**Columns**: ' + ', '.join(data.columns))
     st.write('**Basic stats**')
-    st.write(df.describe(include='all'))
-
-product_col = None
-for col in df.columns:
-    if col.lower() in ('product', 'item', 'name'):
-        product_col = col
-        break
-
-price_col = None
-for col in df.columns:
-    if 'price' in col.lower() or 'amount' in col.lower():
-        price_col = col
-        break
-
-date_col = None
-for col in df.columns:
-    if col.lower() in ('date', 'timestamp', 'time'):
-        date_col = col
-        break
-
-if not price_col:
-    st.error('Could not detect a price column. Please ensure your CSV contains a price or amount column.')
-    st.stop()
+    st.write(data.summary)
 
-if product_col:
-    products = df[product_col].dropna().unique().tolist()
-    selected = st.multiselect('Select product(s) to visualize', options=products, default=products[:3])
-    plot_df = df[df[product_col].isin(selected)]
+if data.product_col:
+    selected = st.multiselect('Select product(s) to visualize', options=data.products, default=data.products[:3])
 else:
-    plot_df = df.copy()
+    selected = data.products
 
-if date_col and pd.api.types.is_datetime64_any_dtype(plot_df[date_col]):
-    ts_df = plot_df.sort_values(by=date_col)
-elif date_col:
-    ts_df = plot_df.copy()
-    ts_df[date_col] = pd.to_datetime(ts_df[date_col], errors='coerce')
-else:
-    ts_df = plot_df.copy()
-    ts_df['__pseudo_date__'] = pd.date_range(end=pd.Timestamp.now(), periods=len(ts_df))
-    date_col = '__pseudo_date__'
+# plotly_chart reports no zoom events back to the app, so the zoom is a range slider;
+# every chart below is rebuilt for the chosen range at full resolution
+first, last = data.time_range
+start, end = first, last
+if first < last:
+    step = max(pd.Timedelta(minutes=1), (last - first) / 1000).to_pytimedelta()
+    zoom = st.slider('Time range', min_value=first.to_pydatetime(), max_value=last.to_pydatetime(),
+                     value=(first.to_pydatetime(), last.to_pydatetime()), step=step, format='YYYY-MM-DD HH:mm')
+    start, end = pd.Timestamp(zoom[0]), pd.Timestamp(zoom[1])
+products = tuple(selected)
 
-agg_df = ts_df.groupby([date_col]).agg({price_col: ['mean', 'min', 'max']})
-agg_df.columns = ['mean_price', 'min_price', 'max_price']
-agg_df = agg_df.reset_index()
+agg_df = cached_trend(key, data, products, start, end)
 
 st.subheader('Price Trends')
-fig = px.line(agg_df, x=date_col, y='mean_price', labels={'mean_price':'Average price', date_col:'Date'}, title='Average Price Over Time')
+fig = go.Figure([
+    go.Scatter(x=agg_df['date'], y=agg_df['max_price'], line=dict(width=0), showlegend=False, hoverinfo='skip'),
+    go.Scatter(x=agg_df['date'], y=agg_df['min_price'], line=dict(width=0), fill='tonexty', name='Min–max range',
+               fillcolor='rgba(31, 119, 180, 0.15)'),
+    go.Scatter(x=agg_df['date'], y=agg_df['mean_price'], name='Average price', line=dict(color='rgb(31, 119, 180)')),
+])
+fig.update_layout(title='Average Price Over Time', xaxis_title='Date', yaxis_title='Average price')
 st.plotly_chart(fig, use_container_width=True)
 
 st.subheader('Price Distribution')
-fig2 = px.box(plot_df, y=price_col, points='suspectedoutliers', title='Price Distribution (boxplot)')
-st.plotly_chart(fig2, use_container_width=True)
+box = cached_box(key, data, products, start, end)
+if box is not None:
+    # quartiles computed here; only they and the outliers go to the browser
+    fig2 = go.Figure(go.Box(q1=[box['q1']], median=[box['median']], q3=[box['q3']], mean=[box['mean']],
+                            lowerfence=[box['lowerfence']], upperfence=[box['upperfence']], x0=data.price_col,
+                            name=data.price_col, boxpoints=False))
+    if len(box['outliers']):
+        fig2.add_trace(go.Scatter(x=[data.price_col] * len(box['outliers']), y=box['outliers'], mode='markers',
+                                  name='outliers', marker=dict(size=5, color='rgba(31, 119, 180, 0.6)')))
+    fig2.update_layout(title=f"Price Distribution (boxplot, {box['count']:,} prices)", showlegend=False)
+    st.plotly_chart(fig2, use_container_width=True)
 
 if visualize_mod is not None and hasattr(visualize_mod, 'advanced_plot'):
     try:
         st.subheader('Advanced analytics (project module)')
-        advanced_fig = visualize_mod.advanced_plot(plot_df, price_col=price_col, date_col=date_col)
+        advanced_fig = cached_advanced(key, data, products, start, end, method)
         st.plotly_chart(advanced_fig, use_container_width=True)
     except Exception as e:
         st.warning('Advanced plotting failed: ' + str(e))
@@ -0,0 +1,93 @@
+"""A local HTTP server with canned product listing pages, for scraper tests and benchmarks.
+
+    with FixtureServer(pages=20, cards=10, faults={3: [503, 503]}) as server:
+        scrape(20, store=..., base_url=server.url + "/products")
+
+GET /products?page=N returns `cards` .product-card elements titled
+"Product N-i" priced $N.i0. faults maps a page to the statuses its first
+requests get (503/429 come with Retry-After: 0) before it succeeds;
+missing pages are 404. Every request is logged as (monotonic time, path).
+
+Pages carry an ETag (a hash of the body) and answer If-None-Match with 304
+unless validators=False. Set server.prices[(page, i)] = "$9.99" to change a
+product's price between crawls.
+"""
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+def product_page(page, cards, prices=None):
+    prices = prices or {}
+    items = "".join(
+        f'<div class="product-card"><a href="/item/{page}-{i}"><h2 class="product-title">Product {page}-{i}</h2></a>'
+        f'<span class="price">{prices.get((page, i), f"${page:,}.{i}0")}</span></div>'
+        for i in range(cards)
+    )
+    return f"<html><body><main>{items}</main></body></html>"
+
+
+class FixtureServer:
+    def __init__(self, pages=10, cards=5, faults=None, latency=0.0, validators=True):
+        self.pages = pages
+        self.cards = cards
+        self.faults = {page: list(statuses) for page, statuses in (faults or {}).items()}
+        self.latency = latency
+        self.validators = validators
+        self.prices = {}
+        self.log = []
+        self._lock = threading.Lock()
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like a real site
+
+            def do_GET(self):
+                fixture.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def handle(self, request):
+        with self._lock:
+            self.log.append((time.monotonic(), request.path))
+        if self.latency:
+            time.sleep(self.latency)
+        parts = urlsplit(request.path)
+        page = int(parse_qs(parts.query).get("page", ["1"])[0])
+        status, body, headers = 200, "", {}
+        if parts.path != "/products" or not 1 <= page <= self.pages:
+            status, body = 404, "not found"
+        else:
+            with self._lock:
+                queued = self.faults.get(page)
+                status = queued.pop(0) if queued else 200
+            body = product_page(page, self.cards, self.prices) if status == 200 else "try again"
+            if status in (429, 503):
+                headers["Retry-After"] = "0"
+            if status == 200 and self.validators:
+                headers["ETag"] = '"%s"' % hashlib.sha1(body.encode()).hexdigest()
+                if request.headers.get("If-None-Match") == headers["ETag"]:
+                    status, body = 304, ""
+        data = body.encode()
+        request.send_response(status)
+        request.send_header("Content-Type", "text/html; charset=utf-8")
+        request.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(data)
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+from analytics import STAT_COLUMNS, PriceAnalytics, alerts, compute
+
+T0 = pd.Timestamp("2025-03-01")
+
+
+def series(prices, product="Lamp", hours=24):
+    return pd.DataFrame({"title": product, "price": prices,
+                         "scrape_ts": [T0 + pd.Timedelta(hours=hours * i) for i in range(len(prices))]})
+
+
+def history(products=30, scrapes=120, seed=1):
+    rng = np.random.default_rng(seed)
+    walk = 100 * np.exp(np.cumsum(rng.normal(0, 0.04, (scrapes, products)), axis=0))
+    walk[rng.random(walk.shape) < 0.01] *= 0.8  # occasional sales
+    return pd.DataFrame({
+        "title": np.tile([f"P{i:02d}" for i in range(products)], scrapes),
+        "scrape_ts": np.repeat([T0 + pd.Timedelta(hours=6 * i) for i in range(scrapes)], products),
+        "price": np.round(walk.ravel(), 2),
+    }).sample(frac=1, random_state=seed)  # arrival order is not time order
+
+
+def test_rolling_stats_changes_and_lows_per_product():
+    df = pd.concat([series([10, 12, 9, 11, 8.5], "Lamp"), series([50, 50, 40], "Chair")])
+    stats = compute(df, window="3D")
+    lamp = stats[stats["title"] == "Lamp"]
+    assert lamp["roll_min"].tolist() == [10, 10, 9, 9, 8.5]
+    assert lamp["roll_max"].tolist() == [10, 12, 12, 12, 11]
+    assert lamp["roll_mean"].tolist() == pytest.approx([10, 11, 31 / 3, 32 / 3, 28.5 / 3])
+    assert lamp["pct_change"].round(1).tolist()[1:] == [20.0, -25.0, 22.2, -22.7]
+    assert lamp["all_time_low"].tolist() == [10, 10, 9, 9, 8.5]
+    chair = stats[stats["title"] == "Chair"]
+    assert chair["roll_max"].tolist() == [50, 50, 50]  # windows never reach into the lamp's rows
+    kinds = [(a.kind, a.product, a.price) for a in alerts(stats, drop=0.2)]
+    assert ("drop", "Lamp", 9.0) in kinds and ("drop", "Chair", 40.0) in kinds
+    assert ("new_low", "Lamp", 8.5) in kinds and ("new_low", "Chair", 40.0) in kinds
+
+
+def test_anomaly_score_uses_the_window_before_the_row():
+    stats = compute(series([100, 101, 100.5, 100, 101, 100.5, 100, 60]), window="30D")
+    assert stats["zscore"].iloc[:2].tolist() == [0.0, 0.0]
+    assert stats["zscore"].iloc[-1] < -30
+    assert [a.kind for a in alerts(stats, drop=0.5, zscore=3)] == ["anomaly", "new_low"]
+
+
+def test_incremental_updates_match_a_full_recompute(tmp_path):
+    df = history()
+    full = compute(df, window="2D")
+    cut = [T0 + pd.Timedelta(hours=6 * i) for i in (40, 41, 90)]
+    chunks = [df[df["scrape_ts"] < cut[0]], df[(df["scrape_ts"] >= cut[0]) & (df["scrape_ts"] < cut[1])],
+              df[(df["scrape_ts"] >= cut[1]) & (df["scrape_ts"] < cut[2])], df[df["scrape_ts"] >= cut[2]]]
+    events = []
+    engine = PriceAnalytics(window="2D", drop=0.1, on_alert=events.append)
+    parts = [engine.update(chunks[0], emit=False)]
+    for chunk in chunks[1:]:
+        engine.save(tmp_path / "state")  # a new process picks up where the last one stopped
+        engine = PriceAnalytics.load(tmp_path / "state", window="2D", drop=0.1, on_alert=events.append)
+        parts.append(engine.update(chunk))
+    got = pd.concat(parts).sort_values(["title", "scrape_ts"]).reset_index(drop=True)
+    for col in STAT_COLUMNS:
+        np.testing.assert_allclose(got[col], full[col], equal_nan=True, err_msg=col)
+    assert len(engine.tail) <= 30 * 17  # window + lateness (four days) of 6-hourly rows per product
+    later = full[full["scrape_ts"] >= cut[0]]
+    expected = sorted(alerts(later, drop=0.1))
+    assert [e[:4] for e in sorted(events)] == [e[:4] for e in expected]
+    assert [e.reference for e in sorted(events)] == pytest.approx([e.reference for e in expected])
+    assert {e.kind for e in events} == {"drop", "new_low", "anomaly"}
+
+
+def test_resumed_runs_pick_up_late_and_same_time_rows_exactly_once(tmp_path):
+    df = history(products=4, scrapes=40).sort_values("scrape_ts")
+    last = df["scrape_ts"].max()
+    # stored after the first run: a late scrape of one product, and another product at the newest time
+    late = (df["title"] == "P01") & (df["scrape_ts"] == last - pd.Timedelta(hours=18))
+    same = (df["title"] == "P02") & (df["scrape_ts"] == last)
+    stored, results = df[~late & ~same], []
+    for batch in [stored, df, df]:  # the last run finds nothing new
+        engine = PriceAnalytics.load(tmp_path / "state", window="2D")
+        since = engine.resume_from
+        rows = batch if since is None else batch[batch["scrape_ts"] >= since]  # what store.scan(start=since) reads
+        results.append(engine.update(rows, emit=False))
+        engine.save(tmp_path / "state")
+    assert [len(r) for r in results] == [len(df) - 2, 2, 0]
+    got = results[1].set_index("title")
+    assert got.loc["P01", "scrape_ts"] == last - pd.Timedelta(hours=18) and got.loc["P02", "scrape_ts"] == last
+    # both rows continue their series exactly as a full recompute would
+    full = compute(df, window="2D").set_index(["title", "scrape_ts"])
+    for product in ["P01", "P02"]:
+        for col in STAT_COLUMNS:
+            expected = full.loc[(product, got.loc[product, "scrape_ts"]), col]
+            assert got.loc[product, col] == pytest.approx(expected, nan_ok=True), (product, col)
+
+
+def test_late_row_lows_only_count_older_rows():
+    engine = PriceAnalytics(window="7D", drop=0.5, zscore=0)
+    engine.update(series([10, 10, 5], hours=1).assign(scrape_ts=[T0, T0 + pd.Timedelta(hours=1),
+                                                                 T0 + pd.Timedelta(hours=3)]), emit=False)
+    events = []
+    engine.on_alert = events.append
+    late = engine.update(series([8]).assign(scrape_ts=T0 + pd.Timedelta(hours=2)))
+    assert late[["prev_low", "all_time_low"]].iloc[0].tolist() == [10.0, 8.0]
+    assert [(e.kind, e.price, e.reference) for e in events] == [("new_low", 8.0, 10.0)]
+    # the late row does not change the low later rows continue from
+    assert engine.update(series([6]).assign(scrape_ts=T0 + pd.Timedelta(hours=4)))["prev_low"].tolist() == [5.0]
+
+
+def test_advanced_plot_marks_alerts():
+    visualize = pytest.importorskip("visualize")
+    df = series([10, 12, 9, 11, 8.5]).rename(columns={"title": "product", "scrape_ts": "date"})
+    fig = visualize.advanced_plot(df, price_col="price", date_col="date")
+    names = [trace.name for trace in fig.data]
+    assert "Lamp" in names and "drop" in names and "new_low" in names
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+from dashboard import PriceData, fingerprint
+from downsample import downsample
+
+T0 = pd.Timestamp("2025-03-01")
+
+
+def history(products=5, scrapes=4000, seed=2):
+    rng = np.random.default_rng(seed)
+    walk = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (scrapes, products)), axis=0))
+    return pd.DataFrame({
+        "product": np.tile([f"P{i}" for i in range(products)], scrapes),
+        "date": np.repeat(T0 + pd.to_timedelta(np.arange(scrapes), unit="h"), products),
+        "price": np.round(walk.ravel(), 2),
+    }).sample(frac=1, random_state=seed)
+
+
+@pytest.mark.parametrize("method", ["minmax", "lttb"])
+def test_downsample_keeps_ends_and_spikes(method):
+    x = pd.date_range(T0, periods=20000, freq="min").to_numpy()
+    y = np.sin(np.arange(20000) / 500)
+    y[12345] = 40  # a single spike
+    keep = downsample(x, y, 1000, method)
+    assert len(keep) <= 1000 and keep[0] == 0 and keep[-1] == 19999
+    assert np.all(np.diff(keep) > 0)
+    assert 12345 in keep
+    assert downsample(x[:500], y[:500], 1000, method).tolist() == list(range(500))
+    with pytest.raises(ValueError):
+        downsample(x, y, 1000, "every_nth")
+
+
+def test_rows_use_the_product_index_and_range():
+    df = history()
+    data = PriceData(df, points=100)
+    assert len(data.levels) > 1  # aggregates were precomputed
+    start, end = T0 + pd.Timedelta(days=10), T0 + pd.Timedelta(days=20)
+    rows = data.rows(["P3", "P1", "missing"], start, end)
+    expected = df[df["product"].isin(["P1", "P3"]) & df["date"].between(start, end)]
+    assert len(rows) == len(expected)
+    assert rows["product"].tolist() == sorted(rows["product"])
+    assert rows.groupby("product")["date"].is_monotonic_increasing.all()
+    assert rows["price"].sum() == pytest.approx(expected["price"].sum())
+
+
+def test_trend_matches_a_full_groupby_at_any_zoom():
+    df = history()
+    data = PriceData(df, points=100)
+    selected = ["P0", "P2"]
+    chosen = df[df["product"].isin(selected)]
+    exact = data.trend(selected, points=10 ** 6)  # finer than the data: one bucket per timestamp
+    expected = chosen.groupby("date")["price"].agg(["mean", "min", "max"])
+    assert exact["mean_price"].to_numpy() == pytest.approx(expected["mean"].to_numpy())
+    assert exact["max_price"].tolist() == expected["max"].tolist()
+
+    overview = data.trend(selected)  # from the aggregates
+    assert len(overview) <= 100
+    assert overview["min_price"].min() == chosen["price"].min()
+    assert overview["max_price"].max() == chosen["price"].max()
+    weights = chosen.groupby(np.searchsorted(overview["date"], chosen["date"], "right") - 1)["price"].mean()
+    assert overview["mean_price"].to_numpy() == pytest.approx(weights.to_numpy())
+
+    start, end = T0 + pd.Timedelta(days=50), T0 + pd.Timedelta(days=52)
+    zoomed = data.trend(selected, start, end)  # 48 hourly scrapes: from the raw rows
+    assert len(zoomed) == 49 and zoomed["date"].iloc[0] == start
+
+
+def test_box_stats_and_fingerprint(tmp_path):
+    df = pd.DataFrame({"item": ["a"] * 8, "amount": [10, 11, 12, 12, 13, 14, 15, 90.0]})
+    data = PriceData(df)
+    box = data.box_stats(["a"])
+    assert (box["q1"], box["median"], box["q3"]) == (11.75, 12.5, 14.25)
+    assert box["upperfence"] == 15 and box["outliers"].tolist() == [90]
+    assert data.box_stats(["b"]) is None
+
+    store = tmp_path / "prices.csv"
+    store.write_text("product,price\na,1\n")
+    before = fingerprint(store)
+    assert fingerprint(store) == before
+    store.write_text("product,price\na,1\na,2\n")
+    assert fingerprint(store) != before
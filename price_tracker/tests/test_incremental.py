@@ -0,0 +1,55 @@
+import asyncio
+import pytest
+import bs_scraper
+import db
+from cache import FetchCache
+from engine import ScrapeEngine
+from fixture_server import FixtureServer
+
+
+def crawl(server, tmp_path, pages=10):
+    return bs_scraper.scrape(pages, delay=0, store=str(tmp_path / "store"), base_url=server.url + "/products",
+                             parse_workers=0, cache=str(tmp_path / "cache.db"))
+
+
+def test_recrawl_sends_conditional_requests_and_stores_only_price_changes(tmp_path):
+    with FixtureServer(pages=10, cards=4) as server:
+        first = crawl(server, tmp_path)
+        second = crawl(server, tmp_path)
+        server.prices[(3, 1)] = "$7.77"
+        server.prices[(3, 2)] = "$8.88"
+        third = crawl(server, tmp_path)
+    assert (first["pages"], first["rows"], first["hit_rate"]) == (10, 40, 0.0)
+    assert (second["pages"], second["not_modified"], second["rows"], second["hit_rate"]) == (10, 10, 0, 1.0)
+    assert second["bytes"] == 0 and second["bytes_saved"] == first["bytes"]
+    assert (third["not_modified"], third["rows"], third["rows_skipped"]) == (9, 2, 2)
+    df = db.open_store(str(tmp_path / "store")).scan("Product 3-1")
+    assert list(df["price"]) == [3.1, 7.77]
+    assert len(db.open_store(str(tmp_path / "store")).scan()) == 42
+
+
+def test_identical_body_without_validators_is_not_parsed_again(tmp_path):
+    with FixtureServer(pages=5, cards=3, validators=False) as server:
+        crawl(server, tmp_path, pages=5)
+        server.prices[(2, 0)] = "$0.99"
+        again = crawl(server, tmp_path, pages=5)
+    assert (again["not_modified"], again["unchanged"], again["rows"], again["rows_skipped"]) == (0, 4, 1, 2)
+    assert again["hit_rate"] == 0.8 and again["bytes_saved"] == 0
+
+
+def test_pages_whose_rows_were_not_stored_are_fetched_again(tmp_path):
+    cache = str(tmp_path / "cache.db")
+
+    def broken_sink(rows):
+        raise OSError("disk full")
+
+    with FixtureServer(pages=4, cards=2) as server:
+        urls = bs_scraper.page_urls(4, server.url + "/products")
+        engine = ScrapeEngine(bs_scraper.parse_page, sink=broken_sink, per_host_rate=0, parse_workers=0,
+                              cache=FetchCache(cache))
+        with pytest.raises(OSError):
+            asyncio.run(engine.run(urls))
+        engine.cache.close()
+        stats = crawl(server, tmp_path, pages=4)
+    assert (stats["not_modified"], stats["unchanged"], stats["rows"]) == (0, 0, 8)
+    assert len(db.open_store(str(tmp_path / "store")).scan()) == 8
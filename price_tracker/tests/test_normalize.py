@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+import db
+from normalize import normalize, parse_price, parse_prices
+
+CASES = [
+    ("$1,249.00", 1249.0, "USD"),
+    ("1.249,00 €", 1249.0, "EUR"),
+    ("CHF 1'249.50", 1249.5, "CHF"),
+    ("12,50 EUR", 12.5, "EUR"),
+    ("¥1,000", 1000.0, "JPY"),
+    ("US$ 5", 5.0, "USD"),
+    ("£0.99", 0.99, "GBP"),
+    ("1 234,56 €", 1234.56, "EUR"),
+    ("R$ 1.234,5", 1234.5, "BRL"),
+    ("19.99 usd", 19.99, "USD"),
+    ("$10 - $20", 10.0, "USD"),
+    ("2.500", 2500.0, None),
+    ("1,5", 1.5, None),
+    ("$0.999", 0.999, "USD"),
+    ("0,999 €", 0.999, "EUR"),
+    ("£1.249", 1.249, "GBP"),
+    ("1.249 €", 1249.0, "EUR"),
+    ("$1,249", 1249.0, "USD"),
+    ("Sold out", None, None),
+    ("", None, None),
+    (None, None, None),
+]
+
+
+@pytest.mark.parametrize("raw, price, currency", CASES)
+def test_parse_price(raw, price, currency):
+    assert parse_price(raw) == (pytest.approx(price) if price is not None else None, currency)
+
+
+def test_column_parse_matches_the_scalar_rules_and_is_compact():
+    raw = pd.Series([case[0] for case in CASES] * 50, dtype=object)
+    parsed = parse_prices(raw)
+    assert parsed["price"].dtype == np.float32 and isinstance(parsed["currency"].dtype, pd.CategoricalDtype)
+    expected = [parse_price(text) for text in raw]
+    np.testing.assert_allclose(parsed["price"], [np.nan if p is None else p for p, _ in expected], rtol=1e-6)
+    assert [None if pd.isna(c) else c for c in parsed["currency"]] == [c for _, c in expected]
+    assert parse_prices(pd.Series(["1.500", "1,500"]), decimal=",")["price"].tolist() == [1500.0, 1.5]
+
+
+def test_normalize_frame():
+    df = pd.DataFrame({
+        "title": [" Desk Lamp ", "Desk Lamp", None],
+        "price_raw": ["24,99 €", "$25.49", "call us"],
+        "price": [None, None, 30.0],
+        "link": [" https://shop/1 ", None, "https://shop/3"],
+        "scrape_ts": ["2025-01-01T10:00:00", "2025-01-02T10:00:00", "bad"],
+    })
+    out = normalize(df)
+    assert out["title"].dtype == "category" and list(out["title"].cat.categories) == ["Desk Lamp"]
+    assert out["title"].isna().tolist() == [False, False, True]
+    assert out["price"].dtype == np.float32
+    np.testing.assert_allclose(out["price"], [24.99, 25.49, 30.0], rtol=1e-6)
+    assert out["currency"].tolist()[:2] == ["EUR", "USD"] and pd.isna(out["currency"][2])
+    assert out["link"].tolist()[0] == "https://shop/1" and pd.isna(out["link"][1])
+    assert out["scrape_ts"].isna().tolist() == [False, False, True]
+
+
+def test_store_fills_missing_prices_from_raw_text():
+    df = db.to_frame([{"title": "A", "price_raw": "1.249,00 €", "scrape_ts": "2025-01-01T00:00:00"},
+                      {"title": "B", "price_raw": "$3", "price": 2.5, "scrape_ts": "2025-01-01T00:00:00"}])
+    assert df["price"].tolist() == [1249.0, 2.5]
@@ -0,0 +1,57 @@
+import asyncio
+import bs_scraper
+import db
+from engine import ScrapeEngine
+from fixture_server import FixtureServer
+
+
+def test_crawl_streams_every_product_into_the_store(tmp_path):
+    store = str(tmp_path / "store")
+    with FixtureServer(pages=30, cards=4) as server:
+        stats = bs_scraper.scrape(30, delay=0, store=store, concurrency=8, base_url=server.url + "/products",
+                                  parse_workers=2)
+    assert (stats["pages"], stats["failed"], stats["rows"]) == (30, 0, 120)
+    df = db.open_store(store).scan()
+    assert len(df) == 120 and df["scrape_ts"].notna().all()
+    row = df[df["title"] == "Product 12-3"].iloc[0]
+    assert (row["price"], row["link"]) == (12.3, server.url + "/item/12-3")
+
+
+def test_retries_with_backoff_and_gives_up_on_bad_pages():
+    with FixtureServer(pages=4, cards=1, faults={2: [503, 429], 3: [500] * 10}) as server:
+        urls = bs_scraper.page_urls(5, server.url + "/products")  # page 5 is a 404
+        batches = []
+        engine = ScrapeEngine(bs_scraper.parse_page, sink=batches.append, concurrency=4, per_host_rate=0,
+                              retries=3, backoff=0.01, parse_workers=0)
+        stats = asyncio.run(engine.run(urls))
+        requests = [path for _, path in server.log]
+    assert (stats["pages"], stats["failed"], stats["rows"]) == (3, 2, 3)
+    assert sorted(row["title"] for batch in batches for row in batch) == ["Product 1-0", "Product 2-0", "Product 4-0"]
+    assert sorted(url.rsplit("=", 1)[1] for url, _ in engine.errors) == ["3", "5"]
+    assert requests.count("/products?page=2") == 3
+    assert requests.count("/products?page=3") == 4  # first try plus 3 retries
+    assert requests.count("/products?page=5") == 1  # 404 is not retried
+
+
+def test_per_host_rate_spaces_requests_without_serializing_the_crawl():
+    with FixtureServer(pages=12, cards=1, latency=0.05) as server:
+        engine = ScrapeEngine(bs_scraper.parse_page, concurrency=6, per_host_rate=40, parse_workers=0)
+        stats = asyncio.run(engine.run(bs_scraper.page_urls(12, server.url + "/products")))
+        times = sorted(t for t, _ in server.log)
+    assert stats["pages"] == 12
+    assert times[-1] - times[0] >= 11 / 40 * 0.9  # 1/40s apart (arrival times jitter a little)
+    assert stats["seconds"] < 12 * 0.05  # overlapping, not one page after another
+
+
+def test_a_page_that_fails_to_parse_is_recorded_and_the_crawl_goes_on():
+    def parse(html, url):
+        if url.endswith("=3"):
+            raise ValueError("unexpected markup")
+        return bs_scraper.parse_page(html, url)
+
+    with FixtureServer(pages=6, cards=2) as server:
+        batches = []
+        engine = ScrapeEngine(parse, sink=batches.append, concurrency=3, per_host_rate=0, parse_workers=0)
+        stats = asyncio.run(engine.run(bs_scraper.page_urls(6, server.url + "/products")))
+    assert (stats["pages"], stats["failed"], stats["rows"]) == (5, 1, 10)
+    assert engine.errors == [(server.url + "/products?page=3", "ValueError: unexpected markup")]
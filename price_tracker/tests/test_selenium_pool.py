@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+import pytest
+
+pytest.importorskip("selenium")
+from selenium.common.exceptions import WebDriverException  # noqa: E402
+import selenium_scraper  # noqa: E402
+from selenium_scraper import BrowserPool, crawl  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class FakeDriver:
+    """Stands in for a Chrome session: get() + execute_async_script() over canned pages."""
+
+    started = 0
+
+    def __init__(self, crash_on=()):
+        FakeDriver.started += 1
+        self.crash_on = set(crash_on)
+        self.visited = []
+        self.url = None
+        self.quit_called = False
+
+    def get(self, url):
+        if url in self.crash_on:
+            raise WebDriverException("tab crashed")
+        self.visited.append(url)
+        self.url = url
+
+    def execute_async_script(self, script, selectors, timeout_ms):
+        page = self.url.rsplit("/", 1)[1]
+        return [{"title": f"{page} card {i}", "price_raw": f"${i}.50", "link": f"{self.url}/{i}"} for i in range(3)]
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_workers_share_the_url_queue_reuse_their_browser_and_replace_crashed_ones():
+    FakeDriver.started = 0
+    drivers = []
+
+    def factory():
+        # the first browser crashes on page 5; its replacement does not
+        drivers.append(FakeDriver(crash_on={"http://shop/5"} if not drivers else ()))
+        return drivers[-1]
+
+    urls = [f"http://shop/{i}" for i in range(20)]
+    batches = []
+    with BrowserPool(3, factory=factory) as pool:
+        stats, errors = crawl(urls, pool, sink=batches.append, batch_size=10)
+    assert (stats, errors) == ({"pages": 20, "failed": 0, "rows": 60}, [])
+    assert FakeDriver.started == 4 and pool.restarts == 1
+    assert drivers[0].quit_called and all(d.quit_called for d in drivers)
+    visited = [url for d in drivers for url in d.visited]
+    assert sorted(visited) == sorted(urls)
+    assert max(len(d.visited) for d in drivers) > 1  # one browser, many pages
+    rows = [row for batch in batches for row in batch]
+    assert len(rows) == 60 and all(len(batch) <= 12 for batch in batches)
+    assert {row["price"] for row in rows} == {0.5, 1.5, 2.5} and all(row["scrape_ts"] for row in rows)
+
+
+def test_page_that_keeps_crashing_is_reported_not_retried_forever():
+    pool = BrowserPool(2, factory=lambda: FakeDriver(crash_on={"http://shop/bad"}))
+    stats, errors = crawl(["http://shop/a", "http://shop/bad", "http://shop/b"], pool, retries=2)
+    pool.close()
+    assert stats == {"pages": 2, "failed": 1, "rows": 6}
+    assert errors == [("http://shop/bad", "tab crashed")] and pool.restarts == 3
+
+
+def test_browser_that_cannot_be_restarted_is_dropped_not_reused():
+    started = []
+
+    def factory():
+        if len(started) == 2:
+            raise WebDriverException("chrome failed to start")
+        started.append(FakeDriver(crash_on={"http://shop/bad"}))
+        return started[-1]
+
+    pool = BrowserPool(2, factory=factory)
+    urls = ["http://shop/bad"] + [f"http://shop/{i}" for i in range(6)]
+    stats, errors = crawl(urls, pool, retries=1)
+    assert stats == {"pages": 6, "failed": 1, "rows": 18}
+    [(url, error)] = errors
+    assert url == "http://shop/bad" and "browser restart failed" in error
+    assert pool._idle.qsize() == 1 and not pool._idle.get_nowait().quit_called  # the dead one is gone
+
+
+def test_page_workers_keep_going_while_the_sink_is_busy():
+    drivers = []
+    busy = threading.Event()
+
+    def factory():
+        drivers.append(FakeDriver())
+        return drivers[-1]
+
+    def slow_sink(rows):
+        # the first write holds up storage until every page has been scraped
+        if not busy.is_set():
+            busy.set()
+            deadline = time.monotonic() + 2
+            while sum(len(d.visited) for d in drivers) < 12 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            caught_up.append(sum(len(d.visited) for d in drivers) == 12)
+        written.append(rows)
+
+    written, caught_up = [], []
+    with BrowserPool(2, factory=factory) as pool:
+        stats, errors = crawl([f"http://shop/{i}" for i in range(12)], pool, sink=slow_sink, batch_size=3)
+    assert caught_up == [True]
+    assert stats == {"pages": 12, "failed": 0, "rows": 36} and len(written) == 12
+
+
+@pytest.fixture(scope="module")
+def chrome():
+    try:
+        pool = BrowserPool(2, block_assets=True)
+    except Exception as exc:  # no Chrome / chromedriver on this machine
+        pytest.skip(f"headless Chrome unavailable: {exc}")
+    yield pool
+    pool.close()
+
+
+def test_static_and_js_rendered_fixtures_in_real_chrome(chrome):
+    urls = ["file://" + os.path.join(FIXTURES, name) for name in ("listing.html", "listing_js.html")]
+    stats, errors = crawl(urls * 3, chrome)
+    assert (stats, errors) == ({"pages": 6, "failed": 0, "rows": 21}, [])
+    driver = chrome.acquire()
+    try:
+        rows = {row["title"]: row for row in selenium_scraper.scrape_page(driver, urls[0])}
+        js_rows = selenium_scraper.scrape_page(driver, urls[1])
+    finally:
+        chrome.release(driver)
+    assert rows["Office Chair"]["price"] == 1249.0
+    assert rows["Desk Lamp"]["link"] == "file://" + os.path.join(FIXTURES, "item", "1.html")
+    assert rows["Gift Card"]["price_raw"] is None and rows["Gift Card"]["link"] is None
+    assert [row["title"] for row in js_rows] == ["Keyboard", "Mouse", "Monitor"]
@@ -0,0 +1,151 @@
+import os
+
+import pandas as pd
+import pytest
+from db import CSVStore, ParquetStore, SQLiteStore, migrate, open_store
+
+
+def rows(ts, n=3, price=1.0):
+    return [{"title": f"Item {i}", "price_raw": f"${price:.2f}", "price": price, "link": None, "scrape_ts": ts}
+            for i in range(n)]
+
+
+def history():
+    # two days, two products, out of order; B's price only as text
+    return [
+        {"title": "A", "price_raw": "$10.00", "price": 10.0, "link": "a", "scrape_ts": "2025-05-01T10:00:00"},
+        {"title": "B", "price_raw": "$5.00", "price": None, "link": "b", "scrape_ts": "2025-05-01T11:00:00"},
+        {"title": "A", "price_raw": "$9.00", "price": 9.0, "link": "a", "scrape_ts": "2025-05-02T06:00:00"},
+        {"title": "A", "price_raw": "$11.00", "price": 11.0, "link": "a", "scrape_ts": "2025-05-01T12:00:00"},
+    ]
+
+
+@pytest.fixture(params=["parquet", "sqlite", "csv"])
+def store(request, tmp_path):
+    target = {"parquet": tmp_path / "store", "sqlite": f"sqlite:///{tmp_path / 'prices.db'}",
+              "csv": tmp_path / "prices.csv"}[request.param]
+    return open_store(target)
+
+
+def test_open_store_picks_the_backend(tmp_path):
+    assert isinstance(open_store(tmp_path / "store"), ParquetStore)
+    assert isinstance(open_store(f"sqlite:///{tmp_path / 'a.db'}"), SQLiteStore)
+    assert isinstance(open_store(tmp_path / "b.sqlite"), SQLiteStore)
+    assert isinstance(open_store(tmp_path / "c.csv"), CSVStore)
+
+
+def test_append_scan_and_latest(store):
+    assert store.append(history()) == 4
+    assert store.append([]) == 0
+    df = store.scan()
+    assert df["scrape_ts"].is_monotonic_increasing and len(df) == 4
+    # a missing price is parsed from price_raw
+    assert df.loc[df["title"] == "B", "price"].tolist() == [5.0]
+    assert store.scan("A")["price"].tolist() == [10.0, 11.0, 9.0]
+
+    latest = store.latest()
+    assert latest["title"].tolist() == ["A", "B"]
+    assert latest["price"].tolist() == [9.0, 5.0]
+    # aware timestamps are stored as naive UTC
+    store.append([{"title": "B", "price_raw": "$6.00", "scrape_ts": "2025-05-02T09:00:00+02:00"}])
+    assert store.scan("B", start="2025-05-02")["scrape_ts"].tolist() == [pd.Timestamp("2025-05-02T07:00:00")]
+    # an older row for A does not replace the newest one
+    store.append([{"title": "A", "price_raw": "$1.00", "price": 1.0, "link": "a", "scrape_ts": "2025-04-30"}])
+    assert store.latest()["price"].tolist() == [9.0, 6.0]
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    ("2025-05-01T11:00:00", None, [5.0, 11.0, 9.0]),  # start inclusive
+    (None, "2025-05-01T12:00:00", [10.0, 5.0]),  # end exclusive
+    ("2025-05-01T13:30:00+02:00", "2025-05-02T07:00:00Z", [11.0, 9.0]),  # aware bounds are UTC-converted
+    (pd.Timestamp("2025-05-02"), None, [9.0]),
+    ("2025-06-01", None, []),
+])
+def test_scan_bounds(store, start, end, expected):
+    store.append(history())
+    assert store.scan(start=start, end=end)["price"].tolist() == expected
+
+
+def test_sqlite_latest_upsert_keeps_the_newest_row(tmp_path):
+    store = SQLiteStore(tmp_path / "prices.db")
+    store.append(rows("2025-05-01T10:00:00", n=2, price=2.0))
+    store.append(rows("2025-05-01T09:00:00", n=3, price=3.0))  # older, except for the new Item 2
+    store.append(rows("2025-05-01T11:00:00", n=1, price=4.0))
+    latest = store.latest()
+    assert latest["title"].tolist() == ["Item 0", "Item 1", "Item 2"]
+    assert latest["price"].tolist() == [4.0, 2.0, 3.0]
+    assert store.conn.execute("SELECT COUNT(*) FROM prices").fetchone() == (6,)
+    # the same file opened again sees everything
+    assert len(SQLiteStore(tmp_path / "prices.db").scan()) == 6
+
+
+def test_csv_store_appends_without_rewriting(tmp_path):
+    path = tmp_path / "prices.csv"
+    # an existing file in the Selenium scraper's layout: no price column
+    path.write_text("title,price_raw,link,scrape_ts\nOld,$3.00,,2025-04-30T00:00:00\n")
+    store = CSVStore(path)
+    store.append(rows("2025-05-01T10:00:00", n=2))
+    lines = path.read_text().splitlines()
+    assert lines[0] == "title,price_raw,link,scrape_ts" and lines[1].startswith("Old,") and len(lines) == 4
+    assert store.scan()["price"].tolist() == [3.0, 1.0, 1.0]
+    assert CSVStore(tmp_path / "missing.csv").scan().empty
+
+
+def test_compact_merges_sorted_and_drops_duplicates(tmp_path):
+    store = ParquetStore(str(tmp_path), compact_parts=1000)
+    store.append(rows("2025-05-02T10:00:00", n=1))
+    store.append(rows("2025-05-01T11:00:00"))  # late rows for an earlier day
+    store.append(rows("2025-05-01T10:00:00"))
+    store.append(rows("2025-05-01T10:00:00"))  # a re-run of the same batch
+    assert len(store.parts("2025-05-01")) == 3
+    assert store.compact() == ["2025-05-01"]  # 05-02 has one part, nothing to merge
+    parts = store.parts("2025-05-01")
+    assert len(parts) == 1 and os.path.basename(parts[0]).startswith("compacted-")
+    day = pd.read_parquet(parts[0])
+    assert len(day) == 6 and day["title"].is_monotonic_increasing
+    assert store.compact("2025-05-01") == []
+
+
+def test_compacts_a_day_with_too_many_parts(tmp_path):
+    store = ParquetStore(str(tmp_path), compact_parts=3)
+    for hour in range(4):
+        store.append(rows(f"2025-05-01T{hour:02d}:00:00", n=1))
+    assert len(store.parts("2025-05-01")) == 2  # compacted at the third part, then one more
+    assert len(store.scan()) == 4
+
+
+def test_unparseable_timestamps_do_not_compact_the_current_day(tmp_path):
+    store = ParquetStore(str(tmp_path))
+    store.append(rows("2025-05-01T10:00:00"))
+    store.append(rows("2025-05-01T11:00:00"))
+    # same day plus one bad timestamp: "unknown" sorts after every date but is no new day
+    store.append(rows("2025-05-01T12:00:00") + rows("not a time", 1))
+    assert store.days() == ["2025-05-01", "unknown"]
+    assert len(store.parts("2025-05-01")) == 3
+
+    store.append(rows("2025-05-02T09:00:00"))  # the day really is over now
+    assert len(store.parts("2025-05-01")) == 1
+    assert len(store.scan()) == 13
+
+
+def test_missing_latest_file_is_rebuilt_from_all_parts(tmp_path):
+    store = ParquetStore(str(tmp_path))
+    store.append([{"title": "A", "price": 1.0, "scrape_ts": "2025-05-01T10:00:00"},
+                  {"title": "B", "price": 2.0, "scrape_ts": "2025-05-01T10:00:00"}])
+    os.remove(tmp_path / "latest.parquet")  # a store from an older version, or copied without it
+    store.append([{"title": "A", "price": 3.0, "scrape_ts": "2025-05-01T11:00:00"}])
+    latest = store.latest()
+    assert latest["title"].tolist() == ["A", "B"] and latest["price"].tolist() == [3.0, 2.0]
+
+
+def test_migrate_copies_csv_in_chunks(tmp_path):
+    old, older = tmp_path / "old.csv", tmp_path / "older.csv"
+    pd.DataFrame(history()).to_csv(old, index=False)
+    pd.DataFrame(rows("2025-04-30T10:00:00")).to_csv(older, index=False)
+    assert migrate([older, old], tmp_path / "store", chunksize=3) == 7
+    store = ParquetStore(str(tmp_path / "store"))
+    assert store.days() == ["2025-04-30", "2025-05-01", "2025-05-02"]
+    assert all(len(store.parts(day)) == 1 for day in store.days())
+    assert len(store.scan()) == 7 and store.latest()["price"].tolist() == [9.0, 5.0, 1.0, 1.0, 1.0]
+    assert migrate([old], f"sqlite:///{tmp_path / 'prices.db'}") == 4
+    assert len(open_store(tmp_path / "prices.db").scan()) == 4